@@ -0,0 +1,102 @@
+import numpy as np
+
+_INF = np.int64(1) << 62
+
+def solve_assignment(cost):
+    """
+    Minimum-cost assignment on a rectangular cost matrix (Hungarian algorithm
+    with shortest augmenting paths, O(n^2 m) with the inner loop in NumPy).
+
+    cost: (rows, cols) integer matrix; negative entries mark forbidden pairs
+    returns: list of (row, col). As many rows as possible are assigned, and
+    among those assignments the total cost is minimal.
+    """
+    cost = np.asarray(cost, dtype=np.int64)
+    if cost.ndim != 2 or cost.size == 0:
+        return []
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+
+    forbidden = cost < 0
+    finite_max = int(cost[~forbidden].max()) if (~forbidden).any() else 0
+    # a forbidden pair costs more than any complete assignment of allowed pairs,
+    # so the optimum uses as few of them as possible; they are dropped at the end
+    big = (finite_max + 1) * n + 1
+    c = np.where(forbidden, big, cost)
+
+    u = np.zeros(n + 1, dtype=np.int64)
+    v = np.zeros(m + 1, dtype=np.int64)
+    p = np.zeros(m + 1, dtype=np.int64)    # p[j]: row (1-based) matched to column j, 0 = free
+    way = np.zeros(m + 1, dtype=np.int64)
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, _INF, dtype=np.int64)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            cur = np.empty(m + 1, dtype=np.int64)
+            cur[0] = _INF
+            cur[1:] = c[i0 - 1] - u[i0] - v[1:]
+            free = ~used
+            better = free & (cur < minv)
+            minv[better] = cur[better]
+            way[better] = j0
+
+            masked = np.where(free, minv, _INF)
+            j1 = int(masked.argmin())
+            delta = masked[j1]
+
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+
+        # flip the augmenting path
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    pairs = []
+    for j in range(1, m + 1):
+        i = p[j]
+        if i and not forbidden[i - 1, j - 1]:
+            pairs.append((j - 1, int(i) - 1) if transposed else (int(i) - 1, j - 1))
+    pairs.sort()
+    return pairs
+
+def assign_goals(distances):
+    """
+    Exclusive agent-to-goal assignment shared by both simulators.
+
+    distances: (agents, goals) true step distances, negative = unreachable
+    Agents already standing on a goal keep it; the others are matched so that
+    the most agents get a reachable goal with the least total distance.
+    returns: dict agent index -> goal index
+    """
+    d = np.asarray(distances, dtype=np.int64)
+    if d.size == 0:
+        return {}
+
+    result = {}
+    taken = set()
+    for a, g in zip(*np.nonzero(d == 0)):
+        a, g = int(a), int(g)
+        if a not in result and g not in taken:
+            result[a] = g
+            taken.add(g)
+
+    rows = [a for a in range(d.shape[0]) if a not in result]
+    cols = [g for g in range(d.shape[1]) if g not in taken]
+    if rows and cols:
+        sub = d[np.ix_(rows, cols)]
+        for r, c in solve_assignment(sub):
+            result[rows[r]] = cols[c]
+    return result
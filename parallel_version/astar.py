@@ -1,13 +1,77 @@
-import heapq
-from config import GRID_SIZE_X, GRID_SIZE_Y
+from astar_engine import GridAStar, flatten_walls
+from jps import JumpPointSearch
+
+_ENGINES = {}  # (width, height) -> GridAStar, so buffers are reused across calls
+_JPS = {}      # (width, height) -> JumpPointSearch, so jump tables are reused while the walls stay the same
+_FLAT = {}     # (width, height) -> (walls, version, flat bytes) of the last versioned flatten
 
 def heuristic(a, b):
     return abs(a[0] - b[0]) + abs(a[1] - b[1])  # Manhattan Distance
 
-def astar(walls, start, goal):
+def get_engine(width, height):
+    """Return the shared GridAStar for a grid size, creating it on first use."""
+    engine = _ENGINES.get((width, height))
+    if engine is None:
+        engine = _ENGINES[(width, height)] = GridAStar(width, height)
+    return engine
+
+def get_jps(width, height):
+    """Return the shared JumpPointSearch for a grid size, creating it on first use."""
+    engine = _JPS.get((width, height))
+    if engine is None:
+        engine = _JPS[(width, height)] = JumpPointSearch(width, height)
+    return engine
+
+def flat_walls(walls, version=None):
+    """
+    flatten_walls(walls), kept per grid size while the same map object is
+    passed with the same version (wall generation), so repeated searches on
+    one map do not flatten it again. Without a version it is flattened on
+    every call: a nested list may have been edited in place.
+    """
+    if version is None:
+        return flatten_walls(walls)
+    size = (len(walls), len(walls[0]))
+    cached = _FLAT.get(size)
+    if cached is not None and cached[0] is walls and cached[1] == version:
+        return cached[2]
+    flat = flatten_walls(walls)
+    _FLAT[size] = (walls, version, flat)
+    return flat
+
+def astar(walls, start, goal, stats=None, version=None):
     """
     walls: 2D array. Indexing: walls[x][y]
     start/goal: (x, y)
+    stats: optional dict; stats["expanded"] and stats["pushed"] are incremented by the
+        number of expanded nodes and heap pushes
+    version: optional wall generation; the flattened map is reused while it
+        and the walls object stay the same (see flat_walls)
+    returns: list of (x,y) from start's next step till goal
+    """
+    if start == goal:
+        return []
+
+    sx, sy = start
+    gx, gy = goal
+    if walls[gx][gy] or walls[sx][sy]:
+        return []
+
+    engine = get_engine(len(walls), len(walls[0]))
+    path = engine.search_xy(flat_walls(walls, version), start, goal)
+    if stats is not None:
+        stats["expanded"] = stats.get("expanded", 0) + engine.expanded
+        stats["pushed"] = stats.get("pushed", 0) + engine.pushed
+    return path
+
+def jps(walls, start, goal, stats=None, version=None):
+    """
+    Drop-in for astar() using jump point search (see jps.JumpPointSearch):
+    the same path lengths with far fewer heap operations on open maps.
+    walls, start, goal, stats: as for astar()
+    version: optional wall generation; the jump tables are rebuilt and the
+        walls flattened again when it changes (without one, the walls are
+        flattened and compared on every call)
     returns: list of (x,y) from start's next step till goal
     """
     if start == goal:
@@ -18,39 +82,10 @@ def astar(walls, start, goal):
     if walls[gx][gy] or walls[sx][sy]:
         return []
 
-    open_heap = []
-    g_val = {start: 0}
-    f_val = {start: heuristic(start, goal)}
-    heapq.heappush(open_heap, (f_val[start], start))
-    came_from = {}
-    closed = set()
-
-    while open_heap:
-        _, current = heapq.heappop(open_heap)
-        if current in closed:
-            continue
-        if current == goal:
-            path = []
-            cur = current
-            while cur in came_from:
-                path.append(cur)
-                cur = came_from[cur]
-            path.reverse()
-            return path
-
-        closed.add(current)
-        cx, cy = current
-        for dx, dy in ((0,1),(1,0),(-1,0),(0,-1)):
-            nx, ny = cx + dx, cy + dy
-            if not (0 <= nx < GRID_SIZE_X and 0 <= ny < GRID_SIZE_Y):
-                continue
-            if walls[nx][ny]:
-                continue
-            neigh = (nx, ny)
-            tentative_g = g_val[current] + 1
-            if tentative_g < g_val.get(neigh, float('inf')):
-                came_from[neigh] = current
-                g_val[neigh] = tentative_g
-                heapq.heappush(open_heap, (tentative_g + heuristic(neigh, goal), neigh))
-
-    return []  # no path found
+    height = len(walls[0])
+    engine = get_jps(len(walls), height)
+    path = engine.search(flat_walls(walls, version), sx * height + sy, gx * height + gy, version)
+    if stats is not None:
+        stats["expanded"] = stats.get("expanded", 0) + engine.expanded
+        stats["pushed"] = stats.get("pushed", 0) + engine.pushed
+    return [divmod(cell, height) for cell in path]
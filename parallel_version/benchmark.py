@@ -0,0 +1,229 @@
+"""
+Benchmark suite for the parallel version.
+
+Generates seeded scenarios (see scenarios.py) and measures:
+  - astar() and jps(): per-query latency percentiles, node expansions/sec and heap pushes
+  - Simulation.plan() with every worker task run in-process (the serial baseline)
+  - Simulation.plan() on the worker pool for each worker count, with
+    speedup/efficiency against the serial baseline
+  - Simulation.step(): movement tick latency and ticks/sec, plus stuck-agent
+    replans and makespan per path planner (PLANNER in config.py)
+
+Results are written as JSON, e.g.
+    python parallel_version/benchmark.py --sizes 120x60 --agents 64 --workers 1 2 4 8 --out bench.json
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import platform
+import time
+import numpy as np
+import multiprocessing_worker
+from astar import astar, jps, flat_walls, get_jps
+from scenarios import GENERATORS, generate
+from maps import load_scenario
+from simulation import Simulation
+
+_VERSIONS = itertools.count()  # wall versions for bench_astar(), one per call so no cached map or jump table carries over
+
+def summarize(samples):
+    """Latency summary in seconds."""
+    if not samples:
+        return {"count": 0}
+    arr = np.asarray(samples, dtype=float)
+    return {
+        "count": int(arr.size),
+        "mean": float(arr.mean()),
+        "p50": float(np.percentile(arr, 50)),
+        "p90": float(np.percentile(arr, 90)),
+        "p99": float(np.percentile(arr, 99)),
+        "max": float(arr.max()),
+    }
+
+def bench_astar(scenario, queries, rng, search=astar):
+    walls = scenario["walls"].astype(bool)
+    # the walls never change: flatten them once, before the clock starts, and let every query reuse it
+    version = next(_VERSIONS)
+    flat = flat_walls(walls, version)
+    if search is jps:
+        # likewise the jump tables, so JPS and A* are timed on the searches alone
+        get_jps(*walls.shape).sync(flat, version)
+    agents, goals = scenario["agents"], scenario["goals"]
+    latencies = []
+    stats = {"expanded": 0, "pushed": 0}
+    found = 0
+    for _ in range(queries):
+        start = agents[int(rng.integers(len(agents)))]
+        goal = goals[int(rng.integers(len(goals)))]
+        t0 = time.perf_counter()
+        path = search(walls, start, goal, stats=stats, version=version)
+        latencies.append(time.perf_counter() - t0)
+        found += bool(path)
+    total = sum(latencies)
+    return {
+        "latency": summarize(latencies),
+        "found": found,
+        "expanded": stats["expanded"],
+        "pushed": stats["pushed"],
+        "expansions_per_sec": stats["expanded"] / total if total > 0 else 0.0,
+    }
+
+def bench_serial_planner(scenario, repeats):
+    """Run the same plan with num_workers=0, i.e. every worker task inline in this process."""
+    sim = Simulation(num_workers=0, grid_size_x=scenario["width"], grid_size_y=scenario["height"])
+    plan_times = []
+    expanded = fields = 0
+    try:
+        for _ in range(repeats):
+            sim.load(scenario["walls"], scenario["agents"], scenario["goals"])
+            multiprocessing_worker._STATS.update(expanded=0, fields=0)
+            sim.plan()
+            plan_times.append(sim.total_time_taken)
+            if not expanded:
+                expanded = multiprocessing_worker._STATS["expanded"]
+                fields = multiprocessing_worker._STATS["fields"]
+    finally:
+        sim.close()
+
+    p50 = float(np.percentile(plan_times, 50))
+    return {
+        "plan": summarize(plan_times),
+        "expanded_per_plan": expanded,
+        "fields_per_plan": fields,
+        "expansions_per_sec": expanded / p50 if p50 > 0 else 0.0,
+    }
+
+def bench_pool(scenario, workers, repeats, expanded_per_plan, serial_p50):
+    """Time Simulation.plan() on a pool of the given size (pool start-up excluded)."""
+    sim = Simulation(num_workers=workers, grid_size_x=scenario["width"], grid_size_y=scenario["height"])
+    try:
+        sim.load(scenario["walls"], scenario["agents"], scenario["goals"])
+        sim.plan()  # warm-up: imports and worker start-up
+        sim.metrics.reset()
+        plan_times = []
+        for _ in range(repeats):
+            sim.load(scenario["walls"], scenario["agents"], scenario["goals"])
+            sim.plan()
+            plan_times.append(sim.total_time_taken)
+        scheduler = sim.scheduler
+        schedule = {
+            "overhead_per_chunk": scheduler.overhead,
+            "seconds_per_unit": dict(scheduler.unit_time),
+            "last_job": scheduler.last,
+        }
+        metrics = sim.metrics.report()
+    finally:
+        sim.close()
+
+    p50 = float(np.percentile(plan_times, 50))
+    speedup = serial_p50 / p50 if p50 > 0 else 0.0
+    return {
+        "workers": workers,
+        "plan": summarize(plan_times),
+        "expansions_per_sec": expanded_per_plan / p50 if p50 > 0 else 0.0,
+        "speedup": speedup,
+        "efficiency": speedup / workers,
+        "schedule": schedule,
+        "metrics": metrics,
+    }
+
+def bench_ticks(scenario, workers, max_ticks, planner):
+    sim = Simulation(num_workers=workers, grid_size_x=scenario["width"], grid_size_y=scenario["height"],
+                     planner=planner)
+    tick_times = []
+    try:
+        sim.load(scenario["walls"], scenario["agents"], scenario["goals"])
+        sim.plan()
+        while sim.moving and len(tick_times) < max_ticks:
+            t0 = time.perf_counter()
+            sim.step()
+            tick_times.append(time.perf_counter() - t0)
+    finally:
+        sim.close()
+
+    total = sum(tick_times)
+    return {
+        "workers": workers,
+        "tick": summarize(tick_times),
+        "ticks_per_run": len(tick_times),
+        "ticks_per_sec": len(tick_times) / total if total > 0 else 0.0,
+        "replans": sim.replans,
+        "makespan": sim.makespan,
+        "finished": not sim.moving,
+        "metrics": sim.metrics.report(),
+    }
+
+def iter_scenarios(args):
+    """Generated scenarios for every kind, size and seed, then the map files."""
+    for kind in args.kinds:
+        for width, height in args.sizes:
+            for seed in args.seeds:
+                yield generate(kind, width, height, args.agents, args.goals, seed=seed)
+    for path in args.maps:
+        for seed in args.seeds:
+            yield load_scenario(path, n_agents=args.agents, n_goals=args.goals, seed=seed)
+
+def parse_size(text):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+def main(argv=None):
+    default_workers = sorted({1, 2, max(1, multiprocessing.cpu_count() - 1)})
+    parser = argparse.ArgumentParser(description="Parallel planner benchmarks")
+    parser.add_argument("--kinds", nargs="*", default=list(GENERATORS), choices=list(GENERATORS))
+    parser.add_argument("--maps", nargs="+", default=[],
+                        help="MovingAI .map or binary map files; agents come from MAP.scen if present")
+    parser.add_argument("--sizes", nargs="+", default=[(60, 30)], type=parse_size, help="WIDTHxHEIGHT")
+    parser.add_argument("--agents", type=int, default=20)
+    parser.add_argument("--goals", type=int, default=20)
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0])
+    parser.add_argument("--workers", nargs="+", type=int, default=default_workers, help="pool sizes to scale over")
+    parser.add_argument("--queries", type=int, default=200, help="random astar queries per scenario")
+    parser.add_argument("--repeats", type=int, default=3, help="plan repetitions per scenario and pool size")
+    parser.add_argument("--max-ticks", type=int, default=10000)
+    parser.add_argument("--planners", nargs="+", default=["astar", "cooperative"], choices=["astar", "cooperative", "cbs"])
+    parser.add_argument("--out", default=None, help="JSON output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    results = []
+    for scenario in iter_scenarios(args):
+        rng = np.random.default_rng(scenario["seed"])
+        serial = bench_serial_planner(scenario, args.repeats)
+        serial_p50 = serial["plan"]["p50"]
+        results.append({
+            "scenario": scenario["name"],
+            "kind": scenario["kind"],
+            "width": scenario["width"],
+            "height": scenario["height"],
+            "seed": scenario["seed"],
+            "agents": len(scenario["agents"]),
+            "goals": len(scenario["goals"]),
+            "astar": bench_astar(scenario, args.queries, rng),
+            # same queries again
+            "jps": bench_astar(scenario, args.queries, np.random.default_rng(scenario["seed"]), jps),
+            "serial_planner": serial,
+            "scaling": [bench_pool(scenario, w, args.repeats, serial["expanded_per_plan"], serial_p50)
+                        for w in args.workers],
+            "movement": {planner: bench_ticks(scenario, max(args.workers), args.max_ticks, planner)
+                         for planner in args.planners},
+        })
+
+    report = {
+        "version": "parallel",
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": multiprocessing.cpu_count(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    multiprocessing.set_start_method("spawn", force=True)
+    main()
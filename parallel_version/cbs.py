@@ -0,0 +1,327 @@
+import heapq
+import time
+from itertools import count
+
+class ConflictTable:
+    """
+    Where other agents' paths are over time, used by the low-level search to
+    count the conflicts of a candidate move (the conflict avoidance table of
+    CBS/ECBS). States are encoded as t * size + cell.
+    """
+
+    def __init__(self, size, trajectories):
+        """trajectories: iterable of (start, path) with path as cells from t=1."""
+        self.size = size
+        self.occupied = {}  # state -> agents holding it
+        self.entered = {}   # state -> agents that moved into the cell at t
+        self.parked = {}    # cell -> first time an agent holds it for good (after its path)
+        for start, path in trajectories:
+            self.add(start, path)
+
+    def add(self, start, path):
+        size = self.size
+        occupied, entered = self.occupied, self.entered
+        prev = start
+        states = [start] + path
+        for t, cell in enumerate(states):
+            key = t * size + cell
+            occupied[key] = occupied.get(key, 0) + 1
+            if cell != prev:
+                entered[key] = entered.get(key, 0) + 1
+            prev = cell
+        end, after = states[-1], len(states)
+        if after < self.parked.get(end, after + 1):
+            self.parked[end] = after
+
+    def _held(self, cell, t):
+        n = self.occupied.get(t * self.size + cell, 0)
+        park = self.parked.get(cell)
+        if park is not None and t >= park:
+            n += 1
+        return n
+
+    def move_conflicts(self, cell, t, nxt):
+        """Conflicts caused by moving (or waiting, if nxt == cell) from cell at t to nxt at t + 1."""
+        n = self._held(nxt, t + 1)
+        if nxt != cell:
+            n += self._held(nxt, t)                                    # we follow someone into nxt
+            n += self.entered.get((t + 1) * self.size + cell, 0)       # someone follows us into cell
+        return n
+
+def constrained_search(walls, neighbors, field, start, goal, constraints=(), table=None, w=1.0):
+    """
+    Space-time A* for one agent under CBS vertex constraints.
+
+    walls: flat bytes-like wall map
+    neighbors: flat neighbor table with 4 entries per cell, -1 for off-grid
+    field: distance field of goal (the heuristic)
+    constraints: set of states (t * size + cell) the agent must not be in
+    table: optional ConflictTable; among candidates the search prefers the
+        fewest conflicts with it
+    w: suboptimality bound. w > 1 expands from the focal list of states with
+        f <= w * f_min (ECBS), so the path is at most w times longer than
+        the shortest one that meets the constraints.
+    returns: (path, lower_bound, expanded). path is a list of cells from t=1
+        to the goal (repeated cells are waits), or None if there is none;
+        lower_bound is a lower bound on the optimal path length.
+    """
+    size = len(walls)
+    if field[start] < 0:
+        return None, 0, 0
+    goal_t = -1   # the agent may only stop on its goal after its last constraint there
+    horizon = 0
+    for key in constraints:
+        t, cell = divmod(key, size)
+        if cell == goal and t > goal_t:
+            goal_t = t
+        if t > horizon:
+            horizon = t
+    horizon += size + 1  # past the last constraint any agent can walk straight home
+
+    # open states are bucketed by f; each bucket is a heap of (conflicts, -t, state)
+    buckets = {field[start]: [(0, 0, start)]}
+    fs = [field[start]]  # heap of bucket keys; f is in fs iff it is in buckets
+    fewest = {start: 0}
+    parent = {start: -1}
+    closed = set()
+    expanded = 0
+    heappush, heappop = heapq.heappush, heapq.heappop
+
+    while fs:
+        f_lo = fs[0]
+        bucket = buckets[f_lo]
+        while bucket and bucket[0][2] in closed:
+            heappop(bucket)
+        if not bucket:
+            heappop(fs)
+            del buckets[f_lo]
+            continue
+
+        # pick the least-conflicting state among f <= w * f_min
+        best_f, best = f_lo, bucket[0]
+        for f in range(f_lo + 1, int(f_lo * w) + 1):
+            other = buckets.get(f)
+            if not other:
+                continue
+            while other and other[0][2] in closed:
+                heappop(other)
+            if other and (other[0][0], other[0][1]) < (best[0], best[1]):
+                best_f, best = f, other[0]
+        conflicts, neg_t, key = heappop(buckets[best_f])
+        closed.add(key)
+        expanded += 1
+        t = -neg_t
+        cell = key - t * size
+
+        if cell == goal and t > goal_t:
+            path = []
+            while key != start:
+                path.append(key % size)
+                key = parent[key]
+            path.reverse()
+            return path, (f_lo if w > 1 else t), expanded
+
+        nt = t + 1
+        if nt > horizon:
+            continue
+        base = cell * 4
+        for k in range(base - 1, base + 4):
+            nxt = cell if k < base else neighbors[k]  # k == base - 1 is the wait move
+            if nxt < 0 or walls[nxt]:
+                continue
+            h = field[nxt]
+            if h < 0:
+                continue
+            nkey = nt * size + nxt
+            if nkey in closed or nkey in constraints:
+                continue
+            c = conflicts + table.move_conflicts(cell, t, nxt) if table is not None else 0
+            if c >= fewest.get(nkey, c + 1):
+                continue
+            fewest[nkey] = c
+            parent[nkey] = key
+            f = nt + h
+            if f not in buckets:
+                buckets[f] = []
+                heappush(fs, f)
+            heappush(buckets[f], (c, -nt, nkey))
+
+    return None, 0, expanded
+
+def find_conflicts(starts, paths):
+    """
+    Conflicts between agent paths, where agents stay on their last cell once
+    their path ends. Two agents conflict when they hold the same cell at the
+    same time, or when one moves into a cell another held the step before
+    (this covers swaps; the movement tick cannot execute it either).
+    returns: (number of conflicts, first conflict or None); a conflict is
+        (kind, a, b, cell, t) with kind "vertex" or "follow" (a entered cell
+        at t, b held it at t - 1).
+    """
+    states = [[s] + p for s, p in zip(starts, paths)]
+    horizon = max((len(s) for s in states), default=0)
+    total, first = 0, None
+    prev = None
+    for t in range(horizon):
+        holder = {}
+        for a, st in enumerate(states):
+            cell = st[t] if t < len(st) else st[-1]
+            b = holder.get(cell)
+            if b is not None:
+                total += 1
+                if first is None:
+                    first = ("vertex", b, a, cell, t)
+            else:
+                holder[cell] = a
+            if prev is not None and t < len(st) and cell != st[t - 1]:
+                b = prev.get(cell)
+                if b is not None and b != a:
+                    total += 1
+                    if first is None:
+                        first = ("follow", a, b, cell, t)
+        prev = holder
+    return total, first
+
+def local_search_many(walls, neighbors, fields):
+    """Low-level search runner that works through tasks in this process (see CBS)."""
+    def search_many(tasks):
+        return [run_task(task, walls, neighbors, fields) for task in tasks]
+    return search_many
+
+def run_task(task, walls, neighbors, fields):
+    """task: (start, goal, constraints, trajectories of the other agents or None, w)"""
+    start, goal, constraints, others, w = task
+    table = ConflictTable(len(walls), others) if others else None
+    return constrained_search(walls, neighbors, fields.field(goal), start, goal, constraints, table, w)
+
+class _Node:
+    __slots__ = ("id", "constraints", "paths", "bounds", "cost", "lower_bound", "conflicts", "first")
+
+class CBS:
+    """
+    Conflict-Based Search (Sharon et al. 2015) for sum-of-costs optimal,
+    collision-free paths, or ECBS (Barer et al. 2014) bounded-suboptimal
+    paths when suboptimality > 1.
+
+    The high level grows a constraint tree: each node holds vertex
+    constraints per agent and one path per agent that satisfies them, and a
+    conflict between two paths splits a node into two children that each
+    forbid it for one of the agents. Only the constrained agent is replanned
+    in a child, and the two siblings' low-level searches are handed to
+    search_many together, so a pool can run them in parallel.
+    """
+
+    def __init__(self, size, starts, goals, search_many, suboptimality=1.0):
+        """
+        size: number of grid cells
+        starts/goals: flat cells per agent (an agent that should stay put has goal == start)
+        search_many: callable taking a list of run_task() tasks and returning
+            their results in order (see local_search_many)
+        """
+        self.size = size
+        self.starts = list(starts)
+        self.goals = list(goals)
+        self.search_many = search_many
+        self.w = max(1.0, float(suboptimality))
+        self._ids = count()
+
+    def _node(self, constraints, paths, bounds):
+        node = _Node()
+        node.id = next(self._ids)
+        node.constraints = constraints
+        node.paths = paths
+        node.bounds = bounds
+        node.cost = sum(len(p) for p in paths)
+        node.lower_bound = sum(bounds)
+        node.conflicts, node.first = find_conflicts(self.starts, paths)
+        return node
+
+    def _task(self, agent, constraints, paths):
+        others = [(s, p) for i, (s, p) in enumerate(zip(self.starts, paths)) if i != agent] if paths else None
+        return (self.starts[agent], self.goals[agent], constraints, others, self.w)
+
+    def solve(self, time_limit=None, node_limit=None):
+        """
+        time_limit: seconds, node_limit: high-level nodes to expand (None = no limit)
+        returns: dict with
+          status: "optimal" (or "bounded" for ECBS), "unsolvable", "time_limit" or "node_limit"
+          paths: per agent, cells from t=1 (repeated cells are waits); None unless solved
+          cost: sum of path lengths, lower_bound: proven lower bound on the optimal cost
+          expanded/generated: high-level nodes, low_level_expanded: low-level states
+          elapsed: seconds
+        """
+        t0 = time.perf_counter()
+        n = len(self.starts)
+        stats = {"expanded": 0, "generated": 0, "low_level_expanded": 0}
+
+        def result(status, node=None, lower_bound=0):
+            return dict(stats, status=status,
+                        paths=node.paths if node is not None else None,
+                        cost=node.cost if node is not None else None,
+                        lower_bound=lower_bound,
+                        elapsed=time.perf_counter() - t0)
+
+        empty = frozenset()
+        root_results = self.search_many([self._task(a, empty, None) for a in range(n)])
+        for path, _, expanded in root_results:
+            stats["low_level_expanded"] += expanded
+        if any(path is None for path, _, _ in root_results):
+            return result("unsolvable")
+        root = self._node((empty,) * n, [r[0] for r in root_results], [r[1] for r in root_results])
+        stats["generated"] = 1
+
+        # CBS pops the cheapest node from a heap; ECBS scans its open list for the focal choice
+        heap = [(root.cost, root.conflicts, root.id, root)] if self.w == 1.0 else None
+        open_nodes = [root] if self.w > 1.0 else None
+        lower_bound = root.lower_bound
+        while heap or open_nodes:
+            if time_limit is not None and time.perf_counter() - t0 > time_limit:
+                return result("time_limit", lower_bound=lower_bound)
+            if node_limit is not None and stats["expanded"] >= node_limit:
+                return result("node_limit", lower_bound=lower_bound)
+
+            if self.w == 1.0:
+                node = heapq.heappop(heap)[3]
+                lower_bound = node.cost
+            else:
+                # focal list: nodes within w of the lower bound, fewest conflicts first
+                lower_bound = min(nd.lower_bound for nd in open_nodes)
+                bound = lower_bound * self.w
+                node = min((nd for nd in open_nodes if nd.cost <= bound),
+                           key=lambda nd: (nd.conflicts, nd.cost, nd.id))
+                open_nodes.remove(node)
+
+            if node.first is None:
+                return result("optimal" if self.w == 1.0 else "bounded", node, lower_bound)
+            stats["expanded"] += 1
+
+            kind, a, b, cell, t = node.first
+            # a vertex conflict is forbidden for either agent at t; for a follow
+            # conflict either a may not enter at t or b may not hold the cell at t - 1
+            branches = ((a, t * self.size + cell), (b, (t if kind == "vertex" else t - 1) * self.size + cell))
+            tasks = []
+            child_constraints = []
+            branches = tuple((agent, key) for agent, key in branches if key >= self.size)  # t=0 is fixed
+            for agent, key in branches:
+                constraints = list(node.constraints)
+                constraints[agent] = constraints[agent] | {key}
+                child_constraints.append(constraints)
+                tasks.append(self._task(agent, constraints[agent], node.paths))
+
+            for (agent, _), constraints, (path, bound, expanded) in zip(
+                    branches, child_constraints, self.search_many(tasks)):
+                stats["low_level_expanded"] += expanded
+                if path is None:
+                    continue
+                paths = list(node.paths)
+                paths[agent] = path
+                bounds = list(node.bounds)
+                bounds[agent] = bound
+                child = self._node(tuple(constraints), paths, bounds)
+                stats["generated"] += 1
+                if heap is not None:
+                    heapq.heappush(heap, (child.cost, child.conflicts, child.id, child))
+                else:
+                    open_nodes.append(child)
+
+        return result("unsolvable", lower_bound=lower_bound)
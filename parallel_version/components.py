@@ -0,0 +1,200 @@
+from array import array
+from collections import deque
+import numpy as np
+from astar_engine import build_neighbor_table
+
+WALL = -1
+PATCH_LIMIT = 64  # changed cells patched one at a time by sync(); more than that relabels the map
+
+class ComponentIndex:
+    """
+    Connected components of the free cells of a wall map (4-connected,
+    x * height + y), so whether a path between two cells exists at all is
+    one comparison: labels[a] == labels[b]. Planners ask connected() before
+    searching and drop unreachable goals up front, instead of flooding a
+    start's whole area to find out that a walled-off goal is not in it.
+
+    The map is labelled once with a vectorized union-find. After that,
+    sync() patches the labels cell by cell as walls are edited:
+
+      - an opened cell joins the components around it (merged into one label)
+      - a closed cell may cut its component apart: one BFS per free neighbor
+        runs in lockstep, searches that meet are merged, and a group of
+        searches that runs out of cells has seen a whole piece that was cut
+        off and gives it a new label. The remaining piece keeps the old
+        label, so the work is bounded by the smaller pieces.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.neighbors = array("i")
+        self.neighbors.frombytes(build_neighbor_table(width, height).tobytes())
+        self.key = None
+        self.walls = None       # private bytearray copy of the walls the labels describe
+        self.labels = None      # int32 component label per cell, WALL on walls
+        self.next_label = 0
+        self.relabeled = 0      # full labellings since creation
+        self.patched = 0        # cells patched incrementally since creation
+
+    def sync(self, key, walls):
+        """
+        Bring the labels up to date with a wall map. key identifies the wall
+        state (a version number, or the wall bytes themselves); nothing is
+        done while it stays the same. Otherwise the walls are compared with
+        the previous ones and a few changed cells are patched in place.
+        walls: flat bytes-like wall map (1 = wall)
+        """
+        if key == self.key and self.labels is not None:
+            return
+        self.key = key
+        current = np.frombuffer(walls, dtype=np.uint8)
+        if self.labels is not None:
+            changed = np.flatnonzero(current != np.frombuffer(self.walls, dtype=np.uint8))
+            if changed.size <= PATCH_LIMIT:
+                for cell in changed.tolist():
+                    if current[cell]:
+                        self._close(cell)
+                    else:
+                        self._open(cell)
+                self.patched += changed.size
+                return
+        self.walls = bytearray(current.tobytes())
+        self._relabel()
+
+    # --- Queries ---
+    def label(self, cell):
+        """Component of a cell, WALL if it is a wall."""
+        return int(self.labels[cell])
+
+    def connected(self, a, b):
+        """True if a path between cells a and b exists (walls only; agents are not obstacles here)."""
+        labels = self.labels
+        return labels[a] == labels[b] and labels[a] != WALL
+
+    def reachable(self, start, cells):
+        """The cells (in their order) that start can reach."""
+        label = self.labels[start]
+        if label == WALL:
+            return []
+        labels = self.labels
+        return [cell for cell in cells if labels[cell] == label]
+
+    # --- Labelling ---
+    def _relabel(self):
+        """Label every cell from scratch: hook roots of neighboring free cells together until none differ."""
+        w, h = self.width, self.height
+        free = np.frombuffer(self.walls, dtype=np.uint8).reshape(w, h) == 0
+        cells = np.arange(self.size, dtype=np.int64).reshape(w, h)
+        # one edge per pair of neighboring free cells, along x and along y
+        along_x = free[:-1, :] & free[1:, :]
+        along_y = free[:, :-1] & free[:, 1:]
+        a = np.concatenate((cells[:-1, :][along_x], cells[:, :-1][along_y]))
+        b = np.concatenate((cells[1:, :][along_x], cells[:, 1:][along_y]))
+
+        parent = np.arange(self.size, dtype=np.int64)
+        while a.size:
+            ra, rb = parent[a], parent[b]
+            differ = ra != rb
+            a, b, ra, rb = a[differ], b[differ], ra[differ], rb[differ]
+            if not a.size:
+                break
+            # hook the larger root under the smaller one (a root hooked twice keeps one: the
+            # other edge still differs next round), then jump pointers until all point at roots
+            parent[np.maximum(ra, rb)] = np.minimum(ra, rb)
+            while True:
+                grand = parent[parent]
+                if np.array_equal(grand, parent):
+                    break
+                parent = grand
+
+        # the roots (smallest cell of each component) become labels 0, 1, ...
+        roots, labels = np.unique(parent, return_inverse=True)
+        labels = labels.astype(np.int32).reshape(-1)
+        labels[~free.reshape(-1)] = WALL
+        self.labels = labels
+        self.next_label = roots.size
+        self.relabeled += 1
+
+    def _new_label(self):
+        self.next_label += 1
+        return self.next_label - 1
+
+    def _open(self, cell):
+        """cell stopped being a wall: it joins (and merges) the components around it."""
+        self.walls[cell] = 0
+        labels = self.labels
+        around = []
+        for n in self.neighbors[cell * 4:cell * 4 + 4]:
+            if n >= 0 and not self.walls[n]:
+                label = int(labels[n])
+                if label not in around:
+                    around.append(label)
+        if not around:
+            labels[cell] = self._new_label()
+            return
+        keep = around[0]
+        if len(around) > 1:
+            labels[np.isin(labels, around[1:])] = keep
+        labels[cell] = keep
+
+    def _close(self, cell):
+        """cell became a wall: give every piece its component falls apart into its own label."""
+        walls, neighbors, labels = self.walls, self.neighbors, self.labels
+        walls[cell] = 1
+        labels[cell] = WALL
+        starts = [n for n in neighbors[cell * 4:cell * 4 + 4] if n >= 0 and not walls[n]]
+        if len(starts) < 2:
+            return
+
+        k = len(starts)
+        group = list(range(k))      # union-find over the searches; searches that met share a group
+        owner = {}                  # cell -> search that reached it first
+        queues = []
+        for i, start in enumerate(starts):
+            if start in owner:      # two neighbors can only coincide if the grid is 1 wide
+                group[i] = owner[start]
+                queues.append(deque())
+            else:
+                owner[start] = i
+                queues.append(deque((start,)))
+
+        def find(i):
+            while group[i] != i:
+                i = group[i]
+            return i
+
+        while True:
+            groups = {find(i) for i in range(k)}
+            if len(groups) == 1:
+                return      # every neighbor is still connected: nothing was cut off
+            active = {find(i) for i in range(k) if queues[i]}
+            if len(active) <= 1:
+                break
+            for i in range(k):
+                queue = queues[i]
+                if not queue:
+                    continue
+                current = queue.popleft()
+                for n in neighbors[current * 4:current * 4 + 4]:
+                    if n < 0 or walls[n]:
+                        continue
+                    other = owner.get(n)
+                    if other is None:
+                        owner[n] = i
+                        queue.append(n)
+                    else:
+                        a, b = find(i), find(other)
+                        if a != b:
+                            group[max(a, b)] = min(a, b)
+
+        # every group that ran dry is a piece of its own; one still searching keeps the old label
+        closed = groups - active
+        if not active:
+            closed.discard(min(closed))
+        fresh = {g: self._new_label() for g in closed}
+        pieces = [(cell, fresh[find(i)]) for cell, i in owner.items() if find(i) in fresh]
+        if pieces:
+            cells, new = zip(*pieces)
+            labels[np.fromiter(cells, dtype=np.int64, count=len(cells))] = new
@@ -1,12 +1,24 @@
+import argparse
+
 # Constants
 CLOCK_RATE = 60
-MOVE_DELAY = 10  # frames
+MOVE_DELAY = 10  # frames between ticks when replaying a trace
+TICK_RATE = 6.0  # movement ticks per second, independent of the frame rate (UP/DOWN change it)
+TURBO_RENDER_EVERY = 10  # in fast-forward (turbo) mode only one frame in this many is drawn
 MAX_WAIT = 2   # frames
+REPLAN_MODE = "astar"  # stuck-agent replanning: "astar" (full search on the pool) or "dstar" (incremental D* Lite)
+PLANNER = "astar"  # initial paths: "astar" (independent shortest paths), "cooperative" (space-time reservations) or "cbs"
+COOP_WINDOW = 16  # steps reserved ahead by the cooperative planner; it replans every COOP_WINDOW // 2 ticks
+CBS_SUBOPTIMALITY = 1.0  # 1.0 = optimal CBS, > 1 = ECBS with paths at most this factor above optimal
+CBS_TIME_LIMIT = 5.0  # seconds
+CBS_NODE_LIMIT = 10000  # constraint tree nodes expanded
+HPA_CLUSTER = 16  # cluster side of the HPA* abstraction used on large maps
+HPA_MIN_CELLS = 250000  # maps with at least this many cells plan through HPA* instead of distance fields
+PATH_CACHE_SIZE = 4096  # searched paths kept per process by the LRU path cache (0 = off)
+SHARED_PATH_CACHE = 4096  # slots of the path cache tier shared by the pool workers (0 = off)
 WIDTH, HEIGHT = 1600, 720
 GRID_SIZE_X = 60
 GRID_SIZE_Y = 30
-CELL_SIZE_X = WIDTH // GRID_SIZE_X
-CELL_SIZE_Y = HEIGHT // GRID_SIZE_Y
 
 # Colors
 WHITE = (255, 255, 255)
@@ -15,4 +27,95 @@ BLUE = (0, 0, 255)
 GREEN = (0, 255, 0)
 RED = (255, 0, 0)
 YELLOW = (255, 255, 0)
-GRAY = (128, 128, 128)
\ No newline at end of file
+GRAY = (128, 128, 128)
+
+def parse_size(text):
+    """"WxH" -> (W, H)"""
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+class Config:
+    """
+    Settings chosen at runtime. Defaults are the constants above; override
+    them with keyword arguments or from the command line (from_args).
+    Cell sizes follow from the window and grid sizes.
+    """
+
+    def __init__(self, **overrides):
+        self.grid_size_x = GRID_SIZE_X
+        self.grid_size_y = GRID_SIZE_Y
+        self.width = WIDTH      # grid area of the window, in pixels
+        self.height = HEIGHT
+        self.clock_rate = CLOCK_RATE
+        self.move_delay = MOVE_DELAY
+        self.tick_rate = TICK_RATE
+        self.turbo = False       # start in fast-forward mode (toggle with F)
+        self.turbo_render_every = TURBO_RENDER_EVERY
+        self.planner = PLANNER
+        self.replan_mode = REPLAN_MODE
+        self.coop_window = COOP_WINDOW
+        self.path_cache = PATH_CACHE_SIZE
+        self.shared_path_cache = SHARED_PATH_CACHE
+        self.map_file = None     # MovingAI .map or binary map to start with (sets the grid size)
+        self.scen_file = None    # MovingAI .scen with the agents' starts and goals
+        self.agents = None       # scenario entries (or random agents) to use
+        self.hud = False         # show the performance HUD at start (toggle with H)
+        self.metrics_file = None # write the run's timers and counters here on exit (.csv or JSON)
+        self.record_file = None  # record every movement tick to this trace file (see trace_log.py)
+        self.replay_file = None  # play this trace back instead of simulating
+        self.replay_start = 0    # trace frame the replay starts at
+        self.workers = None  # pool size, None = one less than the CPU count
+        for key, value in overrides.items():
+            if not hasattr(self, key):
+                raise TypeError(f"unknown setting {key!r}")
+            setattr(self, key, value)
+
+    @property
+    def cell_size_x(self):
+        return max(1, self.width // self.grid_size_x)
+
+    @property
+    def cell_size_y(self):
+        return max(1, self.height // self.grid_size_y)
+
+    def simulation_args(self):
+        """Keyword arguments for Simulation()."""
+        return {"num_workers": self.workers, "grid_size_x": self.grid_size_x, "grid_size_y": self.grid_size_y,
+                "replan_mode": self.replan_mode, "planner": self.planner, "window": self.coop_window,
+                "path_cache": self.path_cache, "shared_path_cache": self.shared_path_cache}
+
+    @classmethod
+    def from_args(cls, argv=None):
+        """Parse command line options (argv=None reads sys.argv)."""
+        args = build_parser().parse_args(argv)
+        overrides = {key: value for key, value in vars(args).items() if value is not None}
+        if "grid" in overrides:
+            overrides["grid_size_x"], overrides["grid_size_y"] = overrides.pop("grid")
+        if "window" in overrides:
+            overrides["width"], overrides["height"] = overrides.pop("window")
+        return cls(**overrides)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Interactive multi-agent pathfinding simulator")
+    parser.add_argument("--grid", type=parse_size, help=f"grid size in cells, WIDTHxHEIGHT (default {GRID_SIZE_X}x{GRID_SIZE_Y})")
+    parser.add_argument("--window", type=parse_size, help=f"grid area in pixels, WIDTHxHEIGHT (default {WIDTH}x{HEIGHT})")
+    parser.add_argument("--clock-rate", type=int, help="frames per second")
+    parser.add_argument("--move-delay", type=int, help="frames between ticks when replaying a trace")
+    parser.add_argument("--tick-rate", type=float, help=f"movement ticks per second (default {TICK_RATE:g})")
+    parser.add_argument("--turbo", action="store_true", default=None, help="start in fast-forward mode (toggle with F)")
+    parser.add_argument("--turbo-render-every", type=int, help=f"frames per drawn frame in fast-forward mode (default {TURBO_RENDER_EVERY})")
+    parser.add_argument("--planner", choices=["astar", "cooperative", "cbs"])
+    parser.add_argument("--replan-mode", choices=["astar", "dstar"])
+    parser.add_argument("--coop-window", type=int, help="steps reserved ahead by the cooperative planner")
+    parser.add_argument("--path-cache", type=int, help=f"paths kept by the LRU path cache, 0 = off (default {PATH_CACHE_SIZE})")
+    parser.add_argument("--shared-path-cache", type=int, help=f"slots of the path cache shared by the workers, 0 = off (default {SHARED_PATH_CACHE})")
+    parser.add_argument("--map", dest="map_file", help="MovingAI .map or binary map file (see maps.py)")
+    parser.add_argument("--scen", dest="scen_file", help="MovingAI .scen file for --map (default: MAP.scen if present)")
+    parser.add_argument("--agents", type=int, help="agents to take from the scenario, or to place at random")
+    parser.add_argument("--hud", action="store_true", default=None, help="show the performance HUD (toggle with H)")
+    parser.add_argument("--metrics", dest="metrics_file", help="write timers and counters to this .csv or .json file on exit")
+    parser.add_argument("--record", dest="record_file", help="record every movement tick to this trace file")
+    parser.add_argument("--replay", dest="replay_file", help="play back a trace file instead of simulating")
+    parser.add_argument("--replay-start", type=int, help="trace frame to start the replay at")
+    parser.add_argument("--workers", type=int, help="worker pool size (0 = plan in this process)")
+    return parser
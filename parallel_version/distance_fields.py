@@ -0,0 +1,145 @@
+from array import array
+import numpy as np
+from astar_engine import build_neighbor_table
+
+UNREACHABLE = -1
+
+def bfs_distance_fields(walls, neighbors, goals):
+    """
+    Reverse BFS from several goals at once, one wavefront per distance level
+    for all goals together.
+
+    walls: flat uint8 numpy array (1 = wall)
+    neighbors: (cells, 4) int32 neighbor table, -1 for off-grid
+    goals: sequence of flat goal cells
+    returns: (len(goals), cells) int32 array of step distances, UNREACHABLE where no path exists
+    """
+    n = walls.size
+    fields = np.full((len(goals), n), UNREACHABLE, dtype=np.int32)
+    flat_fields = fields.reshape(-1)
+
+    goals = np.asarray(goals, dtype=np.int64)
+    rows = np.arange(len(goals), dtype=np.int64)
+    open_goals = walls[goals] == 0
+    # frontier entries are encoded as row * cells + cell
+    frontier = rows[open_goals] * n + goals[open_goals]
+    flat_fields[frontier] = 0
+
+    free = walls == 0
+    d = 0
+    while frontier.size:
+        d += 1
+        row, cell = np.divmod(frontier, n)
+        cand = neighbors[cell]                            # (F, 4)
+        keys = row[:, None] * n + cand
+        keys = keys[(cand >= 0)]
+        keys = keys[free[keys % n] & (flat_fields[keys] == UNREACHABLE)]
+        keys = np.unique(keys)
+        flat_fields[keys] = d
+        frontier = keys
+    return fields
+
+def descend(field, neighbors, start):
+    """
+    Walk down a distance field from start to its goal (A* with a perfect
+    heuristic never leaves this path). Returns flat cells from start's next
+    step to the goal, or [] if the goal is unreachable.
+    """
+    d = field[start]
+    if d <= 0:
+        return []
+    path = []
+    cur = start
+    while d > 0:
+        base = cur * 4
+        for k in range(base, base + 4):
+            neigh = neighbors[k]
+            if neigh >= 0 and field[neigh] == d - 1:
+                cur = neigh
+                break
+        path.append(cur)
+        d -= 1
+    return path
+
+class DistanceFieldCache:
+    """
+    Per-goal reverse BFS distance fields for one wall map.
+
+    Fields are computed lazily (all missing goals of a request in one batched
+    BFS) and kept until sync() is called with a different wall key, so every
+    agent planning against the same walls shares them. Each field is an
+    array('i') indexed by flat cell (x * height + y); it gives the exact
+    distance to its goal in O(1) and doubles as a perfect heuristic for
+    GridAStar.search().
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        table = build_neighbor_table(width, height)
+        self.neighbors_np = table.reshape(-1, 4)
+        self.neighbors = array("i")
+        self.neighbors.frombytes(table.tobytes())
+        self.key = None
+        self.walls = None
+        self.fields = {}  # goal cell -> array('i')
+        self.computed = 0  # number of fields computed since creation
+
+    def sync(self, key, walls):
+        """
+        Bind the cache to a wall map. key identifies the wall state (a version
+        number, or the wall bytes themselves); fields are only dropped when it changes.
+        walls: flat bytes-like or numpy wall map (1 = wall)
+        """
+        if key == self.key:
+            return
+        self.key = key
+        self.walls = np.frombuffer(bytes(walls), dtype=np.uint8) if not isinstance(walls, np.ndarray) \
+            else np.ascontiguousarray(walls, dtype=np.uint8).reshape(-1)
+        self.fields.clear()
+
+    def ensure(self, goals):
+        """Compute fields for any of the given goal cells that are not cached yet."""
+        missing = [g for g in dict.fromkeys(goals) if g not in self.fields]
+        if not missing:
+            return
+        stacked = bfs_distance_fields(self.walls, self.neighbors_np, missing)
+        for goal, row in zip(missing, stacked):
+            field = array("i")
+            field.frombytes(row.tobytes())
+            self.fields[goal] = field
+        self.computed += len(missing)
+
+    def field(self, goal):
+        self.ensure((goal,))
+        return self.fields[goal]
+
+    def distance(self, start, goal):
+        """Exact step distance from start to goal, or UNREACHABLE."""
+        return self.field(goal)[start]
+
+    def distances(self, starts, goals):
+        """(len(starts), len(goals)) int32 matrix of exact distances, UNREACHABLE where no path exists."""
+        self.ensure(goals)
+        starts = np.asarray(starts, dtype=np.int64)
+        matrix = np.empty((len(starts), len(goals)), dtype=np.int32)
+        for j, goal in enumerate(goals):
+            matrix[:, j] = np.frombuffer(self.fields[goal], dtype=np.int32)[starts]
+        return matrix
+
+    def nearest(self, start, goals):
+        """
+        Closest reachable goal from start (first one wins ties).
+        returns: (goal cell, distance) or (None, UNREACHABLE)
+        """
+        self.ensure(goals)
+        best_goal, best_dist = None, UNREACHABLE
+        for goal in goals:
+            d = self.fields[goal][start]
+            if d >= 0 and (best_goal is None or d < best_dist):
+                best_goal, best_dist = goal, d
+        return best_goal, best_dist
+
+    def path(self, start, goal):
+        """Shortest path as flat cells from start's next step to goal ([] if unreachable)."""
+        return descend(self.field(goal), self.neighbors, start)
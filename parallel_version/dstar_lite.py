@@ -0,0 +1,159 @@
+import heapq
+
+INF = float("inf")
+
+class DStarLite:
+    """
+    Incremental planner for one agent (D* Lite, Koenig & Likhachev 2002) on a
+    4-connected grid of flat cell indices (x * height + y).
+
+    The search runs backward from the goal and keeps its g/rhs values between
+    calls. When cells change (wall edits, or other agents appearing in the
+    way) only the vertices whose values depend on them are re-expanded, so a
+    replan costs roughly as much as the change rather than a full search.
+    """
+
+    def __init__(self, walls, neighbors, height, start, goal):
+        """
+        walls: flat bytes-like wall map, read live (the owner updates it in place
+            and reports edits through update_cells)
+        neighbors: flat neighbor table with 4 entries per cell, -1 for off-grid
+        start/goal: flat cell indices
+        """
+        self.walls = walls
+        self.neighbors = neighbors
+        self.height = height
+        self.start = start
+        self.last = start
+        self.goal = goal
+        self.km = 0
+        self.g = {}
+        self.rhs = {goal: 0}
+        self.blocked = set()  # temporary obstacles, e.g. cells held by other agents
+        self.queue = []       # heap of (k1, k2, cell); stale entries are skipped
+        self.queued = {}      # cell -> its current key
+        self.expanded = 0     # vertices expanded by the last plan()
+        self._push(goal)
+
+    def _h(self, a, b):
+        ax, ay = divmod(a, self.height)
+        bx, by = divmod(b, self.height)
+        return abs(ax - bx) + abs(ay - by)
+
+    def _key(self, cell):
+        m = min(self.g.get(cell, INF), self.rhs.get(cell, INF))
+        return (m + self._h(self.start, cell) + self.km, m)
+
+    def _push(self, cell):
+        key = self._key(cell)
+        self.queued[cell] = key
+        heapq.heappush(self.queue, (key[0], key[1], cell))
+
+    def passable(self, cell):
+        return not self.walls[cell] and cell not in self.blocked
+
+    def _update_vertex(self, cell):
+        if cell != self.goal:
+            best = INF
+            if self.passable(cell):
+                g = self.g
+                base = cell * 4
+                for k in range(base, base + 4):
+                    neigh = self.neighbors[k]
+                    if neigh >= 0 and self.passable(neigh):
+                        cost = g.get(neigh, INF) + 1
+                        if cost < best:
+                            best = cost
+            self.rhs[cell] = best
+        if self.g.get(cell, INF) != self.rhs.get(cell, INF):
+            self._push(cell)
+        else:
+            self.queued.pop(cell, None)
+
+    def _update_around(self, cell):
+        self._update_vertex(cell)
+        base = cell * 4
+        for k in range(base, base + 4):
+            neigh = self.neighbors[k]
+            if neigh >= 0:
+                self._update_vertex(neigh)
+
+    def move_start(self, start):
+        """Tell the planner the agent is now at start (call before reporting changes)."""
+        if start != self.start:
+            self.km += self._h(self.last, start)
+            self.last = start
+            self.start = start
+
+    def update_cells(self, cells):
+        """Repair the search after the passability of the given cells changed."""
+        for cell in cells:
+            self._update_around(cell)
+
+    def set_blocked(self, cells):
+        """Replace the temporary obstacle set, repairing only the cells that changed."""
+        cells = set(cells)
+        changed = cells ^ self.blocked
+        self.blocked = cells
+        self.update_cells(changed)
+
+    def _compute_shortest_path(self):
+        g, rhs, queue, queued = self.g, self.rhs, self.queue, self.queued
+        start = self.start
+        expanded = 0
+        while queue:
+            k1, k2, cell = queue[0]
+            if queued.get(cell) != (k1, k2):
+                heapq.heappop(queue)  # stale entry
+                continue
+            g_start, rhs_start = g.get(start, INF), rhs.get(start, INF)
+            if (k1, k2) >= self._key(start) and rhs_start == g_start:
+                break
+            heapq.heappop(queue)
+            del queued[cell]
+
+            k_new = self._key(cell)
+            if (k1, k2) < k_new:
+                self._push(cell)
+                continue
+
+            expanded += 1
+            if g.get(cell, INF) > rhs.get(cell, INF):
+                g[cell] = rhs[cell]
+            else:
+                g[cell] = INF
+                self._update_vertex(cell)
+            base = cell * 4
+            for k in range(base, base + 4):
+                neigh = self.neighbors[k]
+                if neigh >= 0:
+                    self._update_vertex(neigh)
+        self.expanded = expanded
+
+    def plan(self):
+        """Returns flat cells from start's next step to the goal, or [] if there is no path."""
+        if self.start == self.goal or not self.passable(self.goal):
+            self.expanded = 0
+            return []
+        self._compute_shortest_path()
+
+        g = self.g
+        if g.get(self.start, INF) == INF:
+            return []
+        path = []
+        cur = self.start
+        limit = len(self.walls)
+        while cur != self.goal and len(path) < limit:
+            best, best_cost = -1, INF
+            base = cur * 4
+            for k in range(base, base + 4):
+                neigh = self.neighbors[k]
+                if neigh >= 0 and self.passable(neigh):
+                    cost = g.get(neigh, INF)
+                    if cost < best_cost:
+                        best, best_cost = neigh, cost
+            if best < 0:
+                return []
+            path.append(best)
+            cur = best
+        return path if cur == self.goal else []
@@ -0,0 +1,224 @@
+import heapq
+import numpy as np
+
+class JumpPointSearch:
+    """
+    Jump point search for the 4-connected grid (x * height + y, uniform cost).
+
+    Among the many equally short paths of an open area only one canonical
+    path is searched: a move along y may only turn onto the x axis at a
+    forced point (next to the corner of a wall that makes the turn
+    necessary), a move along x may turn onto y anywhere. Straight runs are
+    jumped over instead of pushing every cell into the heap, so only jump
+    points (turns, forced points and the goal) are ever queued.
+
+    Jumps are looked up in JPS+ tables of jump distances per direction,
+    built with NumPy once per wall map: a positive entry is the distance to
+    the next jump point, a zero or negative one the number of free cells
+    before the run ends at a wall. The goal is handled at query time. The
+    tables are rebuilt when sync() sees another wall generation.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.version = None     # wall generation the tables were built for
+        self.source = None      # wall map object passed with that version
+        self.walls = None
+        # jump tables as lists of ints (faster to index than arrays from Python), see _build
+        self.jump_y = None      # {+1: table, -1: table} for moves along y
+        self.jump_x = None      # {+1: table, -1: table} for moves along x
+        self.expanded = 0       # jump points expanded by the last search
+        self.pushed = 0         # heap pushes of the last search
+
+    def sync(self, walls, version=None):
+        """
+        Rebuild the jump tables if the walls changed. With a version (e.g. the
+        simulation's wall generation), the tables are kept while the same wall
+        map object comes with the same version; without one, the walls are compared.
+        walls: flat bytes-like wall map (see astar_engine.flatten_walls)
+        returns: True if the tables were rebuilt
+        """
+        if version is not None:
+            if version == self.version and walls is self.source:
+                return False
+            source, walls = walls, bytes(walls)
+        else:
+            source, walls = None, bytes(walls)
+            if walls == self.walls:
+                return False
+        self.walls = walls
+        self.version = version
+        self.source = source
+        self._build()
+        return True
+
+    def _build(self):
+        w, h = self.width, self.height
+        wall = np.frombuffer(self.walls, dtype=np.uint8).reshape(w, h).astype(bool)
+        padded = np.ones((w + 2, h + 2), dtype=bool)   # off the grid counts as wall
+        padded[1:-1, 1:-1] = wall
+
+        def at(dx, dy):
+            """wall[x + dx, y + dy] for every cell"""
+            return padded[1 + dx:1 + dx + w, 1 + dy:1 + dy + h]
+
+        self.jump_y = {}
+        for s in (1, -1):
+            # arriving at a cell from y - s: turning onto x is forced where the cell
+            # beside the previous one is a wall and the one beside this cell is free
+            forced = (~at(1, 0) & at(1, -s)) | (~at(-1, 0) & at(-1, -s))
+            self.jump_y[s] = self._scan(wall, forced, s)
+
+        stops = (self.jump_y[1] > 0) | (self.jump_y[-1] > 0)
+        self.jump_x = {}
+        for t in (1, -1):
+            # a move along x stops where a jump along y from the cell finds a jump point
+            self.jump_x[t] = self._scan(wall.T, stops.T, t).T
+
+        self.jump_y = {s: table.reshape(-1).tolist() for s, table in self.jump_y.items()}
+        self.jump_x = {t: table.reshape(-1).tolist() for t, table in self.jump_x.items()}
+
+    @staticmethod
+    def _scan(wall, stop, step):
+        """
+        Jump distances along the second axis in direction step for every row of wall.
+        stop: cells a jump ends on
+        """
+        rows, n = wall.shape
+        table = np.zeros((rows, n), dtype=np.int32)
+        order = range(n - 2, -1, -1) if step > 0 else range(1, n)
+        for y in order:
+            nxt = y + step
+            ahead = table[:, nxt]
+            run = np.where(ahead > 0, ahead + 1, ahead - 1)
+            table[:, y] = np.where(wall[:, nxt], 0, np.where(stop[:, nxt], 1, run))
+        return table
+
+    def search(self, walls, start, goal, version=None):
+        """
+        walls: flat bytes-like wall map (see astar_engine.flatten_walls)
+        start/goal: flat cell indices
+        version: optional wall generation, see sync()
+        returns: list of cell indices from start's next step to goal ([] if none)
+        """
+        self.expanded = self.pushed = 0
+        if start == goal or walls[start] or walls[goal]:
+            return []
+        self.sync(walls, version)
+
+        h = self.height
+        jump_y, jump_x = self.jump_y, self.jump_x
+        walls = self.walls
+        gx, gy = divmod(goal, h)
+        size = self.size
+
+        g = {start: 0}
+        parent = {start: -1}
+        arrivals = {start: 0}   # cell -> directions it was reached from at its best g (bitmask, see _DIRS)
+        closed = set()
+        heap = [(abs(start // h - gx) + abs(start % h - gy)) * size + start]
+        expanded, pushed = 0, 1
+
+        while heap:
+            current = heapq.heappop(heap) % size
+            if current in closed:
+                continue
+            closed.add(current)
+            expanded += 1
+            if current == goal:
+                self.expanded, self.pushed = expanded, pushed
+                return self._unfold(parent, start, goal)
+
+            cx, cy = divmod(current, h)
+            mask = arrivals[current]
+            moves = set()
+            if mask == 0:
+                moves.update(_DIRS)     # start: every direction
+            for bit, (axis, s) in _BITS:
+                if not mask & bit:
+                    continue
+                if axis == 1:
+                    # along y: keep going, turn onto x only where forced
+                    moves.add((1, s))
+                    for t in (1, -1):
+                        nx = cx + t
+                        if 0 <= nx < self.width and not walls[nx * h + cy] and \
+                                (not 0 <= cy - s < h or walls[nx * h + cy - s]):
+                            moves.add((0, t))
+                else:
+                    # along x: keep going or turn onto y either way
+                    moves.add((0, s))
+                    moves.add((1, 1))
+                    moves.add((1, -1))
+
+            base = g[current]
+            for axis, s in moves:
+                if axis == 1:
+                    reach = jump_y[s][current]
+                    if cx == gx and 0 < (gy - cy) * s <= abs(reach):
+                        dist = abs(gy - cy)
+                    elif reach > 0:
+                        dist = reach
+                    else:
+                        continue
+                    target = current + s * dist
+                else:
+                    reach = jump_x[s][current]
+                    extent = abs(reach)
+                    dist = 0
+                    k = (gx - cx) * s
+                    if 0 < k <= extent:
+                        # the jump crosses the goal's column: stop there if the goal is in line from it
+                        if cy == gy:
+                            dist = k
+                        else:
+                            u = 1 if gy > cy else -1
+                            if abs(gy - cy) <= abs(jump_y[u][current + s * k * h]):
+                                dist = k
+                    if not dist:
+                        if reach <= 0:
+                            continue
+                        dist = reach
+                    target = current + s * dist * h
+                tentative = base + dist
+                best = g.get(target)
+                if best is None or tentative < best:
+                    g[target] = tentative
+                    parent[target] = current
+                    arrivals[target] = _DIR_BIT[axis, s]
+                elif tentative == best:
+                    bit = _DIR_BIT[axis, s]
+                    if arrivals[target] & bit:
+                        continue
+                    # an equally short arrival from another direction may allow other moves,
+                    # so the cell is expanded again (even if it was closed already)
+                    arrivals[target] |= bit
+                    closed.discard(target)
+                else:
+                    continue
+                tx, ty = divmod(target, h)
+                heapq.heappush(heap, (tentative + abs(tx - gx) + abs(ty - gy)) * size + target)
+                pushed += 1
+
+        self.expanded, self.pushed = expanded, pushed
+        return []
+
+    def _unfold(self, parent, start, goal):
+        """Fill in the straight runs between the jump points from goal back to start."""
+        h = self.height
+        points = [goal]
+        while points[-1] != start:
+            points.append(parent[points[-1]])
+        points.reverse()
+        path = []
+        for a, b in zip(points, points[1:]):
+            step = (1 if b > a else -1) * (1 if a // h == b // h else h)
+            path.extend(range(a + step, b + step, step))
+        return path
+
+# arrival directions as (axis, step), axis 0 = x and 1 = y
+_DIRS = ((1, 1), (0, 1), (0, -1), (1, -1))
+_DIR_BIT = {d: 1 << i for i, d in enumerate(_DIRS)}
+_BITS = [(bit, d) for d, bit in _DIR_BIT.items()]
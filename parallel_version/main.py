@@ -1,7 +1,12 @@
 import multiprocessing
-from sim import run_simulation
+from config import Config
+from sim import run_simulation, replay
 
 if __name__ == "__main__":
     multiprocessing.freeze_support()
     multiprocessing.set_start_method("spawn", force=True)
-    run_simulation()
\ No newline at end of file
+    config = Config.from_args()
+    if config.replay_file:
+        replay(config)
+    else:
+        run_simulation(config)
@@ -0,0 +1,76 @@
+import numpy as np
+
+def resolve_moves(pos, nxt, occupancy, blocked=None):
+    """
+    Decide which agents move this tick, for all agents at once.
+
+    The result is the same as the per-agent loop the simulators used to run
+    (agents handled in list order, each moving if its next cell is free at
+    that point): an agent is blocked if its next cell
+      - is held by an agent later in the list (it has not moved yet),
+      - is held by an earlier agent that did not move,
+      - was taken this tick by an earlier agent,
+      - is in `blocked`, or
+      - holds an agent that wants to step into ours (swap conflict).
+    An earlier agent that moves away frees its cell for a later one, so
+    agents can follow each other in a line.
+
+    pos: int array, flat cell per agent
+    nxt: int array, flat cell the agent wants to enter, -1 if it stays put
+    occupancy: int32 scratch array over all cells, all -1 (left as it was found)
+    blocked: optional bool array over cells nobody may enter this tick
+    returns: (moved, conflict) bool arrays; conflict marks agents that
+        wanted to move but were blocked
+    """
+    pos = np.asarray(pos, dtype=np.int64)
+    nxt = np.asarray(nxt, dtype=np.int64)
+    n = pos.size
+    moved = np.zeros(n, dtype=bool)
+    wants = nxt >= 0
+    if not wants.any():
+        return moved, moved.copy()
+
+    idx = np.arange(n)
+    occupancy[pos] = idx
+    try:
+        target = np.where(wants, nxt, 0)
+        holder = np.where(wants, occupancy[target], -1)
+    finally:
+        occupancy[pos] = -1
+
+    has_holder = holder >= 0
+    safe_holder = np.where(has_holder, holder, 0)
+    swap = has_holder & (nxt[safe_holder] == pos)
+    conflict = wants & (swap | (holder > idx))
+    if blocked is not None:
+        conflict |= wants & blocked[target]
+
+    # the rest depend only on earlier agents: the one holding their cell, and
+    # earlier agents wanting the same cell. Settle them in rounds, earliest first.
+    state = np.where(wants & ~conflict, 0, -1).astype(np.int8)  # 0 undecided, 1 moves, -1 stays
+    cand = np.flatnonzero(state == 0)
+    if cand.size:
+        # previous candidate (in list order) that wants the same cell, -1 if none
+        order = cand[np.lexsort((cand, nxt[cand]))]
+        prev = np.full(n, -1, dtype=np.int64)
+        same = nxt[order[1:]] == nxt[order[:-1]]
+        prev[order[1:][same]] = order[:-1][same]
+        taken = np.zeros(n, dtype=bool)  # an earlier agent already moved into this agent's next cell
+
+        pending = cand
+        while pending.size:
+            p = prev[pending]
+            h = holder[pending]
+            safe_p = np.maximum(p, 0)
+            claim_ready = (p < 0) | (state[safe_p] != 0)
+            holder_state = np.where(h < 0, 1, state[np.maximum(h, 0)])
+            ready = claim_ready & (holder_state != 0)
+            i = pending[ready]
+            lost = (p[ready] >= 0) & (taken[safe_p[ready]] | (state[safe_p[ready]] == 1))
+            taken[i] = lost
+            state[i] = np.where((holder_state[ready] == 1) & ~lost, 1, -1)
+            pending = pending[~ready]
+
+        moved = state == 1
+        conflict |= wants & ~moved
+    return moved, conflict
@@ -1,69 +1,330 @@
-import numpy as np
-from multiprocessing import shared_memory
-from astar import astar, GRID_SIZE_X, GRID_SIZE_Y
+import os
+import time
+from astar_engine import GridAStar
+from distance_fields import DistanceFieldCache
+from components import ComponentIndex
+from path_cache import PathCache
+from shared_path_cache import SharedPathCache
+from cbs import run_task
+from cooperative import CooperativePlanner
+from assignment import assign_goals
+from wall_store import WallStore
+from result_arena import ResultArena
+from hpa import HPAGraph
+from config import HPA_CLUSTER, HPA_MIN_CELLS
 
-_WALLS = None
-_SHM = None
+_STORE = None
+_ARENA = None
+_SHAPE = None
+_FIELDS = None
+_ENGINE = None
+_COMPONENTS = None
+_CACHE = None   # searched paths (see path_cache.PathCache), None when off
+_HPA = None     # HPA* abstraction, built on first use on large maps only
+# per-process planner counters; cache.* count path cache lookups by outcome
+_STATS = {"expanded": 0, "fields": 0, "unreachable": 0,
+          "cache.hit": 0, "cache.subpath": 0, "cache.shared": 0, "cache.miss": 0}
 
-def init_worker(shm_name, shape):
+def init_worker(store_name, shape, arena=None, counter=None, cache=None):
     """
-    Called once per worker on start. Attaches to shared memory buffer
-    created by the main process and builds a numpy view on it.
-    shm_name: name of SharedMemory block
-    Walls are stored as uint8 (0/1) in shared memory
+    Called once per worker on start. Attaches to the WallStore created by the
+    main process; the worker keeps a private copy of the walls and catches up
+    with published edits at the start of every batch. Paths are written to
+    the main process's ResultArena and returned as references.
+    store_name: name of the store's SharedMemory block
+    arena: (name, regions, region_cells) of the ResultArena
+    counter: shared multiprocessing.Value handing out region numbers (None = region 0)
+    cache: (paths kept by the worker's path cache, 0 = off; shared tier as
+        (name, slots, lock) of the SharedPathCache, or None)
     """
-    global _WALLS, _SHM
-    _SHM = shared_memory.SharedMemory(name=shm_name)
+    global _STORE, _ARENA, _SHAPE, _FIELDS, _ENGINE, _COMPONENTS, _CACHE
     grid_w, grid_h = shape
-    arr = np.ndarray((grid_w, grid_h), dtype=np.uint8, buffer=_SHM.buf)
-    _WALLS = arr.view(dtype=np.uint8)
+    _SHAPE = shape
+    _STORE = WallStore(grid_w, grid_h, name=store_name)
+    if arena is not None:
+        name, regions, region_cells = arena
+        _ARENA = ResultArena(regions, region_cells, name=name)
+        region = 0
+        if counter is not None:
+            with counter.get_lock():
+                region = counter.value
+                counter.value += 1
+        _ARENA.claim(region)
+    _FIELDS = DistanceFieldCache(grid_w, grid_h)
+    _ENGINE = GridAStar(grid_w, grid_h)
+    _COMPONENTS = ComponentIndex(grid_w, grid_h)
+    if cache is not None and cache[0] > 0:
+        capacity, shared = cache
+        if shared is not None:
+            name, slots, lock = shared
+            shared = SharedPathCache(slots, lock, name=name)
+        _CACHE = PathCache(capacity, shared)
 
-def compute_best_path(args):
+def close_worker():
+    """Detach from the shared wall map (used when the worker functions ran in the main process)."""
+    global _STORE, _ARENA, _FIELDS, _ENGINE, _COMPONENTS, _CACHE, _HPA
+    _FIELDS = None
+    _ENGINE = None
+    _COMPONENTS = None
+    if _CACHE is not None and _CACHE.shared is not None:
+        _CACHE.shared.close()
+    _CACHE = None
+    _HPA = None
+    if _STORE is not None:
+        _STORE.close()
+        _STORE = None
+    if _ARENA is not None:
+        _ARENA.close()
+        _ARENA = None
+
+def run_batch(args):
+    """
+    Pool entry point: run func(batch) and report how long the worker was busy.
+    args: (func, batch) with func returning (generation, results)
+    returns: (generation, busy seconds, results, arena mark to release once the results were read,
+              (worker pid, this batch's worker counters, see metrics.Metrics.add_worker))
+    """
+    func, batch = args
+    before = dict(_STATS)
+    t0 = time.perf_counter()
+    generation, results = func(batch)
+    busy = time.perf_counter() - t0
+    stats = {"batches": 1, "items": len(results), "busy": busy}
+    stats.update((key, value - before[key]) for key, value in _STATS.items())
+    return generation, busy, results, _ARENA.mark() if _ARENA is not None else None, (os.getpid(), stats)
+
+def _prepare_walls(goals, reached_goals):
+    """
+    Sync the private wall copy once per batch, apply reached_goals and bind
+    the distance field cache to it. Fields (one reverse BFS per goal) are
+    shared by every agent planned against the same wall generation + reached
+    goals and only recomputed when those change. The component index follows
+    the plain walls, patched cell by cell from one generation to the next.
+    returns: (wall generation planned against, flat walls)
+    """
+    grid_w, grid_h = _SHAPE
+    generation, walls = _STORE.sync()
+    _COMPONENTS.sync(generation, walls)
+
+    # mark reached goals as walls in a copy
+    marked = []
+    if reached_goals:
+        for (rx, ry) in reached_goals:
+            if 0 <= rx < grid_w and 0 <= ry < grid_h and (rx, ry) not in goals:
+                marked.append(rx * grid_h + ry)
+    if marked:
+        walls = bytearray(walls)
+        for cell in marked:
+            walls[cell] = 1
+
+    _FIELDS.sync((generation, tuple(sorted(marked))), walls)
+    return generation, walls
+
+def _cached(wall_key, start, goal, signature=0):
+    """The worker's cached path (None on a miss or without a cache)."""
+    if _CACHE is None:
+        return None
+    path = _CACHE.get(wall_key, start, goal, signature)
+    _STATS["cache." + _CACHE.last] += 1
+    return path
+
+def _remember(wall_key, start, goal, path, signature=0):
+    if _CACHE is not None:
+        _CACHE.put(wall_key, start, goal, path, signature)
+
+def _large():
+    return _SHAPE[0] * _SHAPE[1] >= HPA_MIN_CELLS
+
+def _hpa_graph(walls):
+    """The HPA* abstraction for these walls; only the clusters around changed cells are repaired."""
+    global _HPA
+    if _HPA is None:
+        _HPA = HPAGraph(_SHAPE[0], _SHAPE[1], HPA_CLUSTER)
+    _HPA.sync(walls)
+    return _HPA
+
+def compute_goal_distances(args):
     """
+    Build columns of the agent-to-goal cost matrix.
     args:
-      - agent_batch: list of (ax, ay) tuples
-      - goals: list of (gx, gy)
+      - goal_batch: list of (gx, gy) to compute columns for
+      - agents: list of (ax, ay), the matrix rows
+      - goals: list of all (gx, gy)
       - reached_goals: set of (x,y) that should be treated as walls for planning
     returns:
-      list of (agent_pos, path_tuples or None)
+      (wall generation, list of (goal_pos, distances aligned with agents, -1 = unreachable))
+    """
+    goal_batch, agents, goals, reached_goals = args
+    grid_h = _SHAPE[1]
+    generation, _ = _prepare_walls(goals, reached_goals)
+    fields_before = _FIELDS.computed
+
+    agent_cells = [ax * grid_h + ay for ax, ay in agents]
+    goal_cells = [gx * grid_h + gy for gx, gy in goal_batch]
+    matrix = _FIELDS.distances(agent_cells, goal_cells)
+
+    _STATS["fields"] += _FIELDS.computed - fields_before
+    return generation, [(goal, matrix[:, j].tolist()) for j, goal in enumerate(goal_batch)]
+
+def compute_assignment(costs):
+    """
+    Exclusive optimal goal assignment (see assignment.assign_goals), run on
+    the pool so the main process stays responsive while it is solved.
+    costs: list holding one agents x goals cost matrix
+    returns:
+      (wall generation, list of (agent index, goal index))
     """
-    agent_batch, goals, reached_goals = args
+    generation, _ = _STORE.sync()
+    return generation, list(assign_goals(costs[0]).items())
+
+def compute_assigned_paths(args):
+    """
+    Shortest paths for fixed agent-goal pairs.
+    args:
+      - pairs: list of (key, (ax, ay), (gx, gy)); key is echoed back with the result
+      - goals: list of all (gx, gy)
+      - reached_goals: set of (x,y) that should be treated as walls for planning
+      - avoid_positions (optional): set of (x,y) to treat as temporary obstacles, e.g.
+        cells occupied by other agents when replanning stuck agents
+    returns:
+      (wall generation, list of (key, path reference)); see ResultArena.write
+    """
+    pairs, goals, reached_goals = args[:3]
+    avoid_positions = args[3] if len(args) > 3 else None
+    grid_h = _SHAPE[1]
+    generation, base_walls = _prepare_walls(goals, reached_goals)
+    fields_before = _FIELDS.computed
+    avoid_cells = {x * grid_h + y for x, y in avoid_positions} if avoid_positions else None
+    # on large maps a field per goal costs more than the searches, HPA* and Manhattan distance are used instead
+    hpa = _hpa_graph(base_walls) if _large() and not avoid_cells else None
+    # searched paths are cached per walls (with the reached goals marked) and set of temporary obstacles
+    wall_key = _FIELDS.key
+    signature = frozenset(avoid_cells) if avoid_cells else 0
 
     results = []
-    # make a local boolean copy once per batch and apply reached_goals
-    base_walls = _WALLS.astype(bool, copy=True)
+    for key, (ax, ay), (gx, gy) in pairs:
+        start, goal = ax * grid_h + ay, gx * grid_h + gy
+        if not _COMPONENTS.connected(start, goal):
+            # walled off: no search could find a path
+            _STATS["unreachable"] += 1
+            results.append((key, None))
+            continue
+        if avoid_cells:
+            path = _cached(wall_key, start, goal, signature)
+            if path is None:
+                # the goal's field ignores the temporary obstacles, so it is an admissible heuristic
+                heuristic = None if _large() else _FIELDS.field(goal)
+                path = _ENGINE.search(base_walls, start, goal, avoid_cells - {start}, heuristic)
+                _STATS["expanded"] += _ENGINE.expanded
+                _remember(wall_key, start, goal, path, signature)
+        elif hpa is not None:
+            path = _cached(wall_key, start, goal)
+            if path is None:
+                path = hpa.path(start, goal)
+                _STATS["expanded"] += hpa.expanded + len(path)
+                _remember(wall_key, start, goal, path)
+        else:
+            path = _FIELDS.path(start, goal)
+            _STATS["expanded"] += len(path)
+        results.append((key, _ARENA.write(path) if path else None))
 
-    # mark reached goals as walls in the local copy
-    if reached_goals:
-        for (rx, ry) in reached_goals:
-            if 0 <= rx < GRID_SIZE_X and 0 <= ry < GRID_SIZE_Y and (rx, ry) not in goals:
-                base_walls[rx][ry] = True
+    _STATS["fields"] += _FIELDS.computed - fields_before
+    return generation, results
+
+def compute_constrained_paths(tasks):
+    """
+    CBS low-level searches (see cbs.run_task) against the plain wall map.
+    tasks: list of (index, task)
+    returns:
+      (wall generation, list of (index, (path reference, lower bound, expanded states)))
+    """
+    generation, base_walls = _prepare_walls((), ())
+    fields_before = _FIELDS.computed
+
+    results = []
+    for i, task in tasks:
+        path, bound, expanded = run_task(task, base_walls, _FIELDS.neighbors, _FIELDS)
+        _STATS["expanded"] += expanded
+        results.append((i, (_ARENA.write(path), bound, expanded)))
+
+    _STATS["fields"] += _FIELDS.computed - fields_before
+    return generation, results
 
+def compute_cooperative_paths(args):
+    """
+    One pass of the cooperative planner (see cooperative.CooperativePlanner)
+    against the plain wall map, so the main process stays responsive.
+    args: list holding one (starts, goals, window); flat cells, goal None = stays put
+    returns:
+      (wall generation, list of (agent index, path reference))
+    """
+    starts, goals, window = args[0]
+    generation, base_walls = _prepare_walls((), ())
+    planner = CooperativePlanner(base_walls, _FIELDS.neighbors, _FIELDS, window)
+    paths = planner.plan(starts, goals)
+    _STATS["expanded"] += planner.expanded
+    return generation, [(i, _ARENA.write(path)) for i, path in enumerate(paths)]
+
+def compute_best_path(args):
+    """
+    Path to the nearest goal for each agent; on large maps through the HPA*
+    abstraction, otherwise down the goals' distance fields.
+    args:
+      - agent_batch: list of (key, (ax, ay)); key (e.g. the agent id) is echoed back with the result
+      - goals: list of (gx, gy)
+      - reached_goals: set of (x,y) that should be treated as walls for planning
+      - exclude (optional): set of (gx, gy) already claimed by other agents
+    returns:
+      (wall generation, list of (key, (goal_pos or None, distance, path reference)));
+      see ResultArena.write
+    """
+    agent_batch, goals, reached_goals = args[:3]
+    exclude = args[3] if len(args) > 3 else ()
+    grid_h = _SHAPE[1]
+
+    results = []
+    generation, base_walls = _prepare_walls(goals, reached_goals)
+    hpa = _hpa_graph(base_walls) if _large() else None
+    wall_key = _FIELDS.key
+    fields_before = _FIELDS.computed
 
     # For each agent in batch, find best goal
-    for agent_pos in agent_batch:
-        best_path = None
-        best_len = float('inf')
+    for key, agent_pos in agent_batch:
         ax, ay = agent_pos
 
-        if base_walls[ax][ay]:
-            results.append((agent_pos, None))
+        if base_walls[ax * grid_h + ay]:
+            results.append((key, (None, -1, None)))
             continue
 
+        # Manhattan order only decides ties between equally distant goals
         sorted_goals = sorted(goals, key=lambda g: abs(g[0] - ax) + abs(g[1] - ay))
-        for gx, gy in sorted_goals:
-            if (gx, gy) in reached_goals:
-                continue
-
-            path = astar(base_walls, (ax, ay), (gx, gy))
-            if path:
-                if len(path) < best_len:
-                    best_len = len(path)
-                    best_path = path
+        goal_cells = [gx * grid_h + gy for gx, gy in sorted_goals
+                      if (gx, gy) not in reached_goals and (gx, gy) != agent_pos and (gx, gy) not in exclude]
+        start = ax * grid_h + ay
+        # goals in other components are dropped before any field or abstract search is spent on them
+        reachable = _COMPONENTS.reachable(start, goal_cells)
+        _STATS["unreachable"] += len(goal_cells) - len(reachable)
+        goal_cells = reachable
+        if hpa is not None:
+            goal, dist, abstract = hpa.nearest(start, goal_cells)
+            path = None
+            if abstract:
+                # refining is cached: after a replan from further down the same path only its rest is copied
+                path = _cached(wall_key, start, goal)
+                if path is None:
+                    path = list(hpa.refine(abstract))
+                    _remember(wall_key, start, goal, path)
+            _STATS["expanded"] += hpa.expanded
+        else:
+            goal, dist = _FIELDS.nearest(start, goal_cells)
+            path = _FIELDS.path(start, goal) if goal is not None else None
 
-                if best_len == abs(gx - ax) + abs(gy - ay):
-                    break
+        best_path = None
+        if goal is not None and dist > 0:
+            best_path = _ARENA.write(path)
+            _STATS["expanded"] += dist
 
-        results.append((agent_pos, best_path if best_path else None))
+        results.append((key, (divmod(goal, grid_h) if goal is not None else None, dist, best_path)))
 
-    return results
\ No newline at end of file
+    _STATS["fields"] += _FIELDS.computed - fields_before
+    return generation, results
@@ -0,0 +1,112 @@
+from collections import OrderedDict
+from config import PATH_CACHE_SIZE
+
+class PathCache:
+    """
+    Bounded LRU cache of searched paths, keyed by
+
+        (wall key, start, goal, obstacle signature)
+
+    The wall key is the wall generation the path was searched on (any
+    hashable), so paths from older walls never match and simply age out.
+    The signature identifies the temporary obstacles of the search (e.g. a
+    frozenset of the cells held by other agents, 0 = none); paths are only
+    shared between searches that saw the same ones. Both are compared as
+    they are, so pass the values themselves rather than hashes of them.
+
+    A miss can still be answered from a cached path to the same goal that
+    passes through the new start: the rest of a shortest path is a shortest
+    path from any of its cells. Every cached path indexes its cells for
+    that, per (wall key, goal, signature).
+
+    An optional shared tier (shared_path_cache.SharedPathCache in the
+    parallel version) is asked on a local miss and given every new path.
+
+    Failed searches are cached too, as an empty path. get() returns None
+    only on a miss.
+    """
+
+    def __init__(self, capacity=PATH_CACHE_SIZE, shared=None):
+        self.capacity = capacity
+        self.shared = shared
+        self.entries = OrderedDict()    # (wall, start, goal, signature) -> path tuple, oldest first
+        self.through = {}               # (wall, goal, signature) -> {cell: (entry key, index its rest starts at)}
+        self.counts = {"hit": 0, "subpath": 0, "shared": 0, "miss": 0}
+        self.last = None                # how the last get() was answered, a key of counts
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+        self.through.clear()
+
+    def stats(self):
+        """Lookups by outcome so far, plus the number of cached paths."""
+        return dict(self.counts, size=len(self.entries))
+
+    def get(self, wall, start, goal, signature=0):
+        """
+        Cached path from start to goal (flat cells from start's next step to
+        goal, empty if the search failed), or None on a miss.
+        """
+        key = (wall, start, goal, signature)
+        path = self.entries.get(key)
+        if path is not None:
+            self.entries.move_to_end(key)
+            return self._answer("hit", path)
+
+        via = self.through.get((wall, goal, signature), {}).get(start)
+        if via is not None:
+            entry, index = via
+            self.entries.move_to_end(entry)
+            return self._answer("subpath", self.entries[entry][index:])
+
+        if self.shared is not None:
+            path = self.shared.get(wall, start, goal, signature)
+            if path is not None:
+                self._insert(key, path)
+                return self._answer("shared", path)
+        return self._answer("miss", None)
+
+    def put(self, wall, start, goal, path, signature=0):
+        """Cache the result of a search (path as returned by get())."""
+        path = tuple(path)
+        self._insert((wall, start, goal, signature), path)
+        if self.shared is not None:
+            self.shared.put(wall, start, goal, path, signature)
+
+    def _answer(self, outcome, path):
+        self.counts[outcome] += 1
+        self.last = outcome
+        return path
+
+    def _insert(self, key, path):
+        if self.capacity <= 0:
+            return
+        if key in self.entries:
+            self._forget(key)
+        self.entries[key] = path
+        if path:
+            wall, start, _, signature = key
+            through = self.through.setdefault((wall, path[-1], signature), {})
+            # the rest of the path from start is all of it, from path[i] it is path[i + 1:]
+            # (a cell on several paths is served by the newest)
+            through[start] = (key, 0)
+            for i, cell in enumerate(path[:-1]):
+                through[cell] = (key, i + 1)
+        while len(self.entries) > self.capacity:
+            self._forget(next(iter(self.entries)))
+
+    def _forget(self, key):
+        path = self.entries.pop(key)
+        if not path:
+            return
+        wall, start, _, signature = key
+        group = (wall, path[-1], signature)
+        through = self.through[group]
+        for cell in (start,) + path[:-1]:
+            if through.get(cell, (None,))[0] == key:
+                del through[cell]
+        if not through:
+            del self.through[group]
@@ -0,0 +1,148 @@
+import time
+from multiprocessing_worker import run_batch
+
+class _Inline:
+    """Stand-in for an AsyncResult without a pool: the batch runs when it is collected."""
+
+    def __init__(self, task):
+        self.task = task
+
+    def ready(self):
+        return True
+
+    def wait(self, timeout=None):
+        pass
+
+    def get(self):
+        return run_batch(self.task)
+
+class PlanJob:
+    """A submitted pool job: its batches still out and what to do with their results."""
+
+    def __init__(self, kind, generation, estimated, on_result, on_done):
+        self.kind = kind
+        self.generation = generation  # wall generation the job was submitted against
+        self.estimated = estimated
+        self.on_result = on_result
+        self.on_done = on_done
+        self.pending = []             # AsyncResults still out
+        self.chunks = 0
+        self.busy = 0.0
+        self.started = time.perf_counter()
+        self.cancelled = False
+        self.finished = False
+
+class PlannerService:
+    """
+    Non-blocking front end to the worker pool.
+
+    submit() splits a job into chunks (see scheduler.BatchScheduler), hands
+    them to the pool with apply_async and returns at once. poll(), called
+    once per frame, passes every batch that has come back to the job's
+    on_result callback, and calls on_done when the last batch of a job is
+    in, so a caller can start using results (and submit follow-up jobs)
+    while the rest are still being planned. wait() blocks for the headless
+    API and the benchmarks.
+
+    cancel() drops every job in flight: batches already running cannot be
+    stopped, but their results are thrown away when they arrive. Results
+    planned against another wall generation than the one the job was
+    submitted with are dropped as well and counted in stale.
+
+    With a metrics.Metrics, the time spent collecting results ("results"),
+    every job's wall time ("job.<kind>") and the workers' own counters are
+    recorded in it.
+    """
+
+    def __init__(self, pool, scheduler, arena, metrics=None):
+        """pool: multiprocessing.Pool, or None to run batches in this process when collected"""
+        self.pool = pool
+        self.scheduler = scheduler
+        self.arena = arena
+        self.metrics = metrics
+        self.jobs = []
+        self.stale = 0
+
+    @property
+    def busy(self):
+        return bool(self.jobs)
+
+    def submit(self, func, kind, items, costs, make_args, generation, on_result, on_done=None):
+        """
+        func: worker function taking make_args(chunk) and returning (generation, results)
+        items/costs: job items and their cost estimates
+        on_result: called with each batch's result list
+        on_done: called once after the last batch (not for cancelled jobs)
+        returns: the PlanJob
+        """
+        chunks = self.scheduler.split(kind, items, costs)
+        job = PlanJob(kind, generation, sum(costs), on_result, on_done)
+        job.chunks = len(chunks)
+        for chunk, _ in chunks:
+            task = (func, make_args(chunk))
+            job.pending.append(self.pool.apply_async(run_batch, (task,)) if self.pool is not None else _Inline(task))
+        self.jobs.append(job)
+        return job
+
+    def poll(self, timed=False):
+        """
+        Handle every batch that has come back, without blocking.
+        timed: the caller is waiting on the results, so the job's wall time
+            is meaningful for the scheduler's overhead estimate
+        returns: number of batches handled
+        """
+        # scan newest first: a worker finishes its batches in order, so if a later batch
+        # is ready, every earlier batch of that worker is too and arena marks are
+        # released in the order the worker wrote them
+        ready = []
+        for job in reversed(self.jobs):
+            for res in reversed(job.pending):
+                if res.ready():
+                    ready.append((job, res))
+        ready.reverse()
+
+        metrics = self.metrics
+        for job, res in ready:
+            job.pending.remove(res)
+            t0 = time.perf_counter()
+            generation, seconds, results, mark, (worker, stats) = res.get()
+            job.busy += seconds
+            if not job.cancelled:
+                if generation != job.generation:
+                    self.stale += len(results)
+                    if metrics is not None:
+                        metrics.count("stale", len(results))
+                else:
+                    job.on_result(results)
+            self.arena.release(mark)
+            if metrics is not None:
+                metrics.record("results", time.perf_counter() - t0)
+                metrics.add_worker(worker, stats)
+
+        finished = [job for job in self.jobs if not job.pending]
+        if finished:
+            self.jobs = [job for job in self.jobs if job.pending]
+            for job in finished:
+                job.finished = True
+                elapsed = time.perf_counter() - job.started
+                if metrics is not None:
+                    metrics.record("job." + job.kind, elapsed)
+                wall = elapsed if timed else None
+                self.scheduler.record(job.kind, job.estimated, job.busy, wall, job.chunks)
+                if not job.cancelled and job.on_done is not None:
+                    job.on_done()
+        return len(ready)
+
+    def wait(self, job=None):
+        """Block until job (or every job, including follow-ups submitted meanwhile) has finished."""
+        while not job.finished if job is not None else self.jobs:
+            pending = job.pending if job is not None else self.jobs[0].pending
+            if pending:
+                pending[0].wait()
+            self.poll(timed=True)
+
+    def cancel(self):
+        """Drop every job in flight; returns how many there were."""
+        for job in self.jobs:
+            job.cancelled = True
+        return len(self.jobs)
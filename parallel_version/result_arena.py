@@ -0,0 +1,95 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+MIN_REGION_CELLS = 1 << 18  # per-worker region, in int32 cells
+
+class ResultArena:
+    """
+    Shared int32 buffer the workers write path results into, so only small
+    descriptors travel back through the pool's pipe:
+
+        [ int64 released count per region | region 0 | region 1 | ... ]
+
+    Each worker owns one region and uses it as a ring: it appends paths and
+    returns (offset, length) for each, plus a mark (region, cells written so
+    far) with every batch. The main process copies paths out with read()
+    and then release()s the batch's mark, which frees everything the worker
+    wrote up to it. A worker never overwrites cells that were not released,
+    so jobs can overlap. A path that does not fit is returned inline as a
+    plain list instead.
+
+    Marks must be released in the order each worker produced them; a worker
+    finishes its batches in order, so handling batches in submission order
+    does that (see PlannerService.poll).
+    """
+
+    def __init__(self, regions, region_cells, name=None):
+        """Create the buffer (name=None, main process) or attach to an existing one by name."""
+        self.regions = max(1, regions)
+        self.region_cells = region_cells
+        header = 8 * self.regions
+        total = header + 4 * self.regions * region_cells
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=total)
+        self.released = np.ndarray((self.regions,), dtype=np.int64, buffer=self.shm.buf)
+        self.cells = np.ndarray((self.regions * region_cells,), dtype=np.int32,
+                                buffer=self.shm.buf, offset=header)
+        if self.owner:
+            self.released[:] = 0
+
+        # writer side: the region this process owns and how many cells it wrote there in total
+        self.region = 0
+        self.written = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        self.released = self.cells = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    # --- Main process ---
+    def read(self, ref):
+        """Cells of a path written by write(), or None for no path."""
+        if ref is None or isinstance(ref, list):
+            return ref
+        offset, length = ref
+        return self.cells[offset:offset + length].tolist()
+
+    def release(self, mark):
+        """Let the worker reuse its region up to mark (from mark()) once its paths were read."""
+        if mark is not None:
+            region, written = mark
+            if written > self.released[region]:
+                self.released[region] = written
+
+    # --- Workers ---
+    def claim(self, region):
+        """Bind this process to its own region (worker index modulo the region count)."""
+        self.region = region % self.regions
+        self.written = int(self.released[self.region])
+
+    def mark(self):
+        return self.region, self.written
+
+    def write(self, path):
+        """
+        path: sequence of cells, or None
+        returns: a reference for read(): None, (offset, length) or the path itself as a list
+        """
+        if path is None:
+            return None
+        size = self.region_cells
+        length = len(path)
+        pos = self.written % size
+        skip = size - pos if pos + length > size else 0  # paths do not wrap around the ring's end
+        if self.written + skip + length - int(self.released[self.region]) > size:
+            return list(path)
+        self.written += skip
+        offset = self.region * size + self.written % size
+        self.cells[offset:offset + length] = path
+        self.written += length
+        return offset, length
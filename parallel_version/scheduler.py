@@ -0,0 +1,96 @@
+import math
+
+CHUNKS_PER_WORKER = 4    # enough chunks per worker to even out the tail of a job
+OVERHEAD_SHARE = 0.1     # dispatch overhead should stay below this share of a chunk's work
+SMOOTHING = 0.3          # weight of the newest measurement in the running estimates
+
+def manhattan(a, b):
+    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+class BatchScheduler:
+    """
+    Cuts pool jobs into chunks by estimated cost instead of a fixed batch size.
+
+    Every item of a job comes with a cost estimate in units of its kind
+    ("fields", "paths", "nearest", "replans", "cbs"). Items are sorted
+    longest first and cut into consecutive chunks of about equal estimated
+    cost, so expensive items get chunks of their own and are dispatched
+    first, and the cheap ones fill in the tail (longest processing time
+    first list scheduling).
+
+    The number of chunks adapts to what was measured on earlier jobs:
+    seconds per cost unit for each kind (from the workers' busy time) and
+    the per-chunk dispatch overhead (wall time not explained by the busy
+    time). A job gets up to CHUNKS_PER_WORKER chunks per worker, fewer when
+    its chunks would be so small that overhead dominates (down to a single
+    chunk for jobs too small to be worth spreading).
+    """
+
+    def __init__(self, workers):
+        """workers: pool size; 0 (inline) or 1 always gets a single chunk."""
+        self.workers = workers
+        self.unit_time = {}      # kind -> seconds per estimated cost unit
+        self.overhead = 1e-3     # seconds of dispatch overhead per chunk
+        self.last = None         # measurements of the last job, for benchmarks
+
+    def chunk_count(self, kind, costs):
+        """Number of chunks to cut a job with these item costs into."""
+        if self.workers <= 1 or len(costs) <= 1:
+            return 1
+        balanced = self.workers * CHUNKS_PER_WORKER
+        unit = self.unit_time.get(kind)
+        if unit is not None:
+            # each chunk should carry at least overhead / OVERHEAD_SHARE seconds of work
+            work = sum(costs) * unit
+            balanced = min(balanced, int(work * OVERHEAD_SHARE / self.overhead))
+        return max(1, min(len(costs), balanced))
+
+    def split(self, kind, items, costs):
+        """
+        items/costs: job items and their cost estimates (same order)
+        returns: list of (chunk items, chunk estimated cost), longest first
+        """
+        if not items:
+            return []
+        chunks = self.chunk_count(kind, costs)
+        order = sorted(range(len(items)), key=lambda i: -costs[i])
+        unassigned = sum(costs)
+        target = unassigned / chunks
+
+        result = []
+        current, current_cost = [], 0
+        remaining = chunks
+        for k, i in enumerate(order):
+            current.append(items[i])
+            current_cost += costs[i]
+            left = len(order) - k - 1
+            # close the chunk once it is full, keeping at least one item for each chunk still to come
+            if left and remaining > 1 and (current_cost >= target or left < remaining):
+                result.append((current, current_cost))
+                unassigned -= current_cost
+                remaining -= 1
+                target = unassigned / remaining  # an oversized item shrinks the share of the rest
+                current, current_cost = [], 0
+        if current:
+            result.append((current, current_cost))
+        result.sort(key=lambda chunk: -chunk[1])
+        return result
+
+    def record(self, kind, estimated, busy, wall, chunks):
+        """
+        Update the running estimates after a job.
+        estimated: total estimated cost, busy: summed worker seconds,
+        wall: seconds from dispatch to the last result (None if unknown, e.g.
+            the results were only collected once per frame), chunks: chunks dispatched
+        """
+        if estimated > 0 and busy > 0:
+            unit = busy / estimated
+            old = self.unit_time.get(kind)
+            self.unit_time[kind] = unit if old is None else old + SMOOTHING * (unit - old)
+        workers = max(1, min(self.workers, chunks))
+        if chunks and self.workers > 1 and wall is not None:
+            # wall time beyond a perfect split of the busy time, spread over the rounds of chunks
+            rounds = math.ceil(chunks / workers)
+            overhead = max(0.0, wall - busy / workers) / rounds
+            self.overhead += SMOOTHING * (max(overhead, 1e-5) - self.overhead)
+        self.last = {"kind": kind, "chunks": chunks, "estimated": estimated, "busy": busy, "wall": wall}
@@ -0,0 +1,69 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+SLOT_CELLS = 512    # longest path a slot holds; longer ones stay in the workers' own caches
+_FIELDS = 5         # per slot: hash of the wall key, start, goal, hash of the signature, path length (-1 = empty)
+
+class SharedPathCache:
+    """
+    Path cache tier shared by every pool worker (see path_cache.PathCache),
+    one shared memory block of fixed slots:
+
+        [ int64 slot fields (slots x 5) | int32 path cells (slots x SLOT_CELLS) ]
+
+    Direct-mapped: a path goes to the slot its key hashes to and replaces
+    whatever was there, so a path one worker searched is found by the
+    others until a newer one takes its slot. A slot stores the hashes of
+    the wall key and signature (hashable, built from ints, so their hashes
+    agree across processes) next to the start and goal cells.
+
+    A multiprocessing lock, created by the main process and handed to the
+    workers with their initializer, guards each slot read and write.
+    """
+
+    def __init__(self, slots, lock, name=None, slot_cells=SLOT_CELLS):
+        """Create the block (name=None, main process) or attach to an existing one by name."""
+        self.slots = slots
+        self.slot_cells = slot_cells
+        self.lock = lock
+        header = 8 * _FIELDS * slots
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=header + 4 * slots * slot_cells)
+        self.fields = np.ndarray((slots, _FIELDS), dtype=np.int64, buffer=self.shm.buf)
+        self.cells = np.ndarray((slots, slot_cells), dtype=np.int32, buffer=self.shm.buf, offset=header)
+        if self.owner:
+            self.fields[:] = 0
+            self.fields[:, 4] = -1
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        self.fields = self.cells = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def _slot(self, key):
+        return hash(key) % self.slots
+
+    def get(self, wall, start, goal, signature=0):
+        """Path cached under the key (a tuple of cells, empty if the search failed), or None."""
+        key = (hash(wall), start, goal, hash(signature))
+        slot = self._slot(key)
+        with self.lock:
+            row = self.fields[slot].tolist()
+            if row[4] < 0 or tuple(row[:4]) != key:
+                return None
+            path = self.cells[slot, :row[4]].tolist()
+        return tuple(path)
+
+    def put(self, wall, start, goal, path, signature=0):
+        if len(path) > self.slot_cells:
+            return
+        key = (hash(wall), start, goal, hash(signature))
+        slot = self._slot(key)
+        with self.lock:
+            self.fields[slot] = key + (len(path),)
+            self.cells[slot, :len(path)] = path
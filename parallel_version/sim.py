@@ -1,73 +1,74 @@
 import time
-import multiprocessing
-from multiprocessing import shared_memory
-import numpy as np
-from config import *
-from node import Node
-from renderer import draw_grid, draw_elements, draw_text
-from multiprocessing_worker import compute_best_path, init_worker
+from config import Config
+from maps import load_scenario
+from renderer import Renderer
+from simulation import Simulation
+from agent_store import AgentStore
+from trace_log import TraceReader, EVENT_NAMES
+from timestep import Timestep
+
+HUD_TIMERS = ("frame", "render", "poll", "results", "step", "move", "plan")
+HUD_EVERY = 30  # frames between HUD refreshes (the HUD line itself is only redrawn when it changes)
+
+def run_simulation(config=None):
+    """config: Config with the grid, window, planner and pool settings (default: the constants in config.py)"""
+    config = config or Config()
+    scenario = None
+    if config.map_file:
+        scenario = load_scenario(config.map_file, config.scen_file, config.agents)
+        config.grid_size_x, config.grid_size_y = scenario["width"], scenario["height"]
 
-# batch size for each worker task
-BATCH_SIZE = 4
-
-def _build_wall_map(grid):
-    """Return a (GRID_SIZE_X, GRID_SIZE_Y) uint8 numpy array (1 = wall, 0 = free)."""
-    arr = np.zeros((GRID_SIZE_X, GRID_SIZE_Y), dtype=np.uint8)
-    for x in range(GRID_SIZE_X):
-        for y in range(GRID_SIZE_Y):
-            if grid[x][y].wall:
-                arr[x, y] = 1
-    return arr
-
-def _write_to_shm(shm, arr):
-    """Write numpy uint8 arr into shared_memory buffer."""
-    buf = np.ndarray(arr.shape, dtype=np.uint8, buffer=shm.buf)
-    np.copyto(buf, arr)
-
-def run_simulation():
     import pygame
     from pygame._sdl2 import Window
 
     pygame.init()
-    screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
+    screen = pygame.display.set_mode((config.width, config.height), pygame.RESIZABLE)
     Window.from_display_module().maximize()
     pygame.display.set_caption("Interactive Multi-Agent Parallelized Pathfinding Simulator")
     clock = pygame.time.Clock()
     font_s = pygame.font.SysFont("Calibri", 26, bold=True)
     font_m = pygame.font.SysFont("Calibri", 32, bold=True)
 
-    # build persistent Node grid
-    grid = [[Node(x, y) for y in range(GRID_SIZE_Y)] for x in range(GRID_SIZE_X)]
+    renderer = Renderer(screen, font_s, font_m, config)
+    # planning runs in the background; poll() applies results as they come in
+    sim = Simulation(blocking=False, **config.simulation_args())
+    if scenario is not None:
+        sim.load(scenario["walls"], scenario["agents"], scenario["goals"])
+    if config.record_file:
+        sim.start_trace(config.record_file)
+    # movement ticks on a fixed timestep of their own (see timestep.py); turbo spends each frame on ticks
+    timestep = Timestep(config.tick_rate, 1.0 / config.clock_rate, config.turbo_render_every, config.turbo)
+
+    def tick():
+        # replans that came back since the last tick are applied first (turbo runs many ticks per frame)
+        sim.poll()
+        sim.step()
+
+    def active():
+        # no ticks while every agent is waiting on the pool for a path: turbo would spin through thousands
+        return sim.moving and (not (sim.planning or sim.replanning) or bool(sim.agents.moving.any()))
 
-    agents = []
-    goals = []
-    moving = False
     wall_mode = True
-    total_time_taken = 0.0
-    move_counter = 0
-
-    # initial wall map and shared memory
-    wall_map = _build_wall_map(grid)  # uint8
-    shm = shared_memory.SharedMemory(create=True, size=wall_map.nbytes)
-    _write_to_shm(shm, wall_map)
-
-    # persistent pool
-    num_workers = max(1, multiprocessing.cpu_count() - 1)
-    pool = multiprocessing.Pool(
-        processes=num_workers,
-        initializer=init_worker,
-        initargs=(shm.name, (GRID_SIZE_X, GRID_SIZE_Y))
-    )
+    metrics = sim.metrics
+    show_hud = config.hud
+    hud = None
+    frames = 0
 
     running = True
     while running:
-        screen.fill(WHITE)
-        draw_grid(screen, grid)
-        draw_elements(screen, agents, goals)
-        draw_text(screen, total_time_taken, wall_mode, font_s, font_m, agents, goals)
+        frame_started = time.perf_counter()
+        if show_hud and frames % HUD_EVERY == 0:
+            hud = metrics.hud_text(HUD_TIMERS)
+        frames += 1
+        if timestep.render_due():
+            with metrics.timer("render"):
+                renderer.draw(sim.walls, sim.agents, sim.goals, sim.total_time_taken, wall_mode,
+                              hud if show_hud else None, timestep.status())
 
         # event handling
         for event in pygame.event.get():
+            if event.type in (pygame.VIDEORESIZE, pygame.WINDOWEXPOSED, pygame.WINDOWSIZECHANGED):
+                renderer.invalidate()
             if event.type == pygame.QUIT:
                 running = False
                 break
@@ -75,196 +76,110 @@ def run_simulation():
                 if event.key == pygame.K_t:
                     wall_mode = not wall_mode
                 if event.key == pygame.K_r:
-                    agents.clear()
-                    goals.clear()
-                    moving = False
-                    total_time_taken = 0.0
-                    # rebuild wall_map from grid and update shm
-                    wall_map = _build_wall_map(grid)
-                    _write_to_shm(shm, wall_map)
-                if event.key == pygame.K_SPACE and agents and goals:
-                    start_time = time.time()
-                    # prepare inputs
-                    goals_data = [(g.x, g.y) for g in goals]
-                    reached_goals = {(g.x, g.y) for g in goals if any(a["pos"] == (g.x, g.y) for a in agents)}
-
-                    # agent positions to compute for
-                    agent_positions = [(a["node"].x, a["node"].y) for a in agents if a["pos"] not in reached_goals]
-                    if agent_positions:
-                        # batching
-                        batches = []
-                        for i in range(0, len(agent_positions), BATCH_SIZE):
-                            batch = agent_positions[i:i+BATCH_SIZE]
-                            batches.append((batch, goals_data, reached_goals))
-                        
-                        results_iter = pool.imap_unordered(compute_best_path, batches)
-                        # collect results
-                        all_results = []
-                        for res in results_iter:
-                            all_results.extend(res)
-                        
-
-                        # assign results to agents (paths are tuples -> convert to Node)
-                        for agent_pos, path_coords in all_results:
-                            if path_coords:
-                                ax, ay = agent_pos
-                                for a in agents:
-                                    if a["node"].x == ax and a["node"].y == ay:
-                                        path_nodes = [grid[x][y] for (x, y) in path_coords]
-                                        a["path"] = path_nodes
-                                        break
-                    moving = True
-                    total_time_taken = time.time() - start_time
+                    sim.clear()
+                if event.key == pygame.K_SPACE:
+                    sim.plan_async()
+                if event.key == pygame.K_h:
+                    show_hud = not show_hud
+                    frames = 0
+                if event.key == pygame.K_f:
+                    timestep.toggle_turbo()
+                if event.key == pygame.K_UP:
+                    timestep.scale(2)
+                if event.key == pygame.K_DOWN:
+                    timestep.scale(0.5)
 
         # mouse handling
         if pygame.mouse.get_pressed()[0]:
             mx, my = pygame.mouse.get_pos()
-            gx, gy = mx // CELL_SIZE_X, my // CELL_SIZE_Y
-            if 0 <= gx < GRID_SIZE_X and 0 <= gy < GRID_SIZE_Y:
-                grid[gx][gy].wall = wall_mode
-                wall_map[gx, gy] = 1 if grid[gx][gy].wall else 0
-                _write_to_shm(shm, wall_map)
+            sim.set_wall(*renderer.cell_at(mx, my), wall_mode)
 
         if pygame.mouse.get_pressed()[2]:
             mx, my = pygame.mouse.get_pos()
-            gx, gy = mx // CELL_SIZE_X, my // CELL_SIZE_Y
-            if 0 <= gx < GRID_SIZE_X and 0 <= gy < GRID_SIZE_Y and not grid[gx][gy].wall:
-                if (gx, gy) not in {a["pos"] for a in agents}:
-                    node = grid[gx][gy]
-                    agents.append({"node": node, "pos": (node.x, node.y), "path": None, "wait": 0})
+            sim.add_agent(*renderer.cell_at(mx, my))
 
         if pygame.mouse.get_pressed()[1]:
             mx, my = pygame.mouse.get_pos()
-            gx, gy = mx // CELL_SIZE_X, my // CELL_SIZE_Y
-            if 0 <= gx < GRID_SIZE_X and 0 <= gy < GRID_SIZE_Y and not grid[gx][gy].wall:
-                node = grid[gx][gy]
-                if node not in goals:
-                    goals.append(node)
-
-        # movement logic
-        if moving:
-            move_counter += 1
-            if move_counter >= MOVE_DELAY:
-                occupied = {tuple(a["pos"]) for a in agents}
-                reserved = set()
-                reached_goals = set()
-
-                for goal in goals:
-                    goal_position = (goal.x, goal.y)
-
-                    for agent in agents:
-                        if agent["pos"] == goal_position:
-                            reached_goals.add(goal_position)
-                            break  # Stop checking other agents once a match is found
-
-
-                stuck_agents = []  # collect agents for parallel replanning
-                for a in agents:
-                    path = a.get("path")
-                    current_pos = tuple(a["pos"])
-
-                    if not path or len(path) == 0:
-                        a["path"] = None
-                        a["wait"] = 0
-                        reserved.add(current_pos)
-                        continue
-
-                    next_pos = (path[0].x, path[0].y)
-
-                    swap_conflict = any(
-                        other is not a and
-                        other.get("path") and len(other["path"]) > 0 and
-                        other["path"][0].x == current_pos[0] and
-                        other["path"][0].y == current_pos[1] and
-                        other["pos"] == next_pos
-                        for other in agents
-                    )
-
-                    if (next_pos in reserved or 
-                        next_pos in occupied or 
-                        next_pos in reached_goals or 
-                        swap_conflict):
-                        
-                        a["wait"] += 1
-
-                        if a["wait"] >= MAX_WAIT:
-                            stuck_agents.append(a)
-                            a["wait"] = 0
-
-                        reserved.add(current_pos)
-                        continue
-
+            sim.add_goal(*renderer.cell_at(mx, my))
 
-                    # Normal move
-                    reserved.add(next_pos)
-                    occupied.discard(current_pos)
-                    occupied.add(next_pos)
-                    a["pos"] = next_pos
-                    a["node"] = path[0]
-                    a["wait"] = 0
-                    path.pop(0)
-                    if len(path) == 0:
-                        a["path"] = None
+        # hand this frame's wall edits to the workers as one generation,
+        # then pick up whatever planning results are in
+        sim.publish()
+        sim.poll()
 
-                # --- Parallel dynamic replanning for stuck agents ---
-                if stuck_agents:
-                    # Get goals that haven't been reached yet
-                    free_goals = []
-                    for g in goals:
-                        if (g.x, g.y) not in reached_goals:
-                            free_goals.append(g)
-
-                    if free_goals:
-                        # Get positions of all stuck agents
-                        agent_positions = []
-                        for a in stuck_agents:
-                            agent_positions.append((a["pos"][0], a["pos"][1]))
-
-
-                        batches = []
-                        for i in range(0, len(agent_positions), BATCH_SIZE):
-                            batch = agent_positions[i:i + BATCH_SIZE]
-                            batches.append((batch, [(g.x, g.y) for g in free_goals], reached_goals))
-
-                        results_iter = pool.imap_unordered(compute_best_path, batches)
-                        all_results = []
-                        for res in results_iter:
-                            all_results.extend(res)
-
-                        # assign replanned paths back
-                        for agent_pos, path_coords in all_results:
-                            for a in stuck_agents:
-                                if a["pos"] == agent_pos and path_coords:
-                                   a["path"] = []
-                                   for (x, y) in path_coords:
-                                        a["path"].append(grid[x][y])
-                                   break
-
-                move_counter = 0
-            
-            if len(reached_goals) == len(goals):
-                for agent in agents:
-                    if agent["path"] is not None:
-                        agent["path"] = None
-                        agent["wait"] = 0
-
-            # stop moving when all paths done
-            all_paths_none = True
+        # movement logic
+        timestep.advance(tick, active)
+
+        # time spent on the frame, without waiting for the next one
+        metrics.record("frame", time.perf_counter() - frame_started)
+        clock.tick(config.clock_rate)
+
+    if config.metrics_file:
+        metrics.export(config.metrics_file)
+    sim.close()
+    pygame.quit()
+
+def replay(config):
+    """
+    Play back a trace recorded with --record (see trace_log.py) without running any planner.
+    SPACE pauses, RIGHT steps one tick while paused, UP/DOWN change the speed, R restarts.
+    config: Config with replay_file set; the grid size is taken from the trace
+    """
+    reader = TraceReader(config.replay_file)
+    config.grid_size_x, config.grid_size_y = reader.width, reader.height
 
-            for a in agents:
-                    if a.get("path") is not None:
-                        all_paths_none = False
-                        break
+    import pygame
+    from pygame._sdl2 import Window
 
-            if all_paths_none:
-                    moving = False
+    pygame.init()
+    screen = pygame.display.set_mode((config.width, config.height), pygame.RESIZABLE)
+    Window.from_display_module().maximize()
+    pygame.display.set_caption("IMAPPS - Replay")
+    clock = pygame.time.Clock()
+    font_s = pygame.font.SysFont("Calibri", 26, bold=True)
+    font_m = pygame.font.SysFont("Calibri", 32, bold=True)
+    renderer = Renderer(screen, font_s, font_m, config)
 
+    frames = reader.frames(config.replay_start)
+    frame = next(frames, None)
+    agents = AgentStore(reader.width, reader.height)
+    move_delay = config.move_delay
+    move_counter = 0
+    paused = False
+    advance = False
 
-        pygame.display.flip()
-        clock.tick(CLOCK_RATE)
+    running = frame is not None
+    while running:
+        agents.restore(frame.cells, frame.waits, frame.moving)
+        events = ", ".join(f"{agent} {EVENT_NAMES.get(code, code)}" for agent, code in frame.events)
+        status = f"Replay {frame.index + 1}/{len(reader)}  tick {frame.tick}" + ("  (paused)" if paused else "")
+        renderer.draw(frame.walls, agents, frame.goals, None, True, status + ("  " + events if events else ""))
 
-    pool.close()
-    pool.join()
-    shm.close()
-    shm.unlink()
-    pygame.quit()
\ No newline at end of file
+        for event in pygame.event.get():
+            if event.type in (pygame.VIDEORESIZE, pygame.WINDOWEXPOSED, pygame.WINDOWSIZECHANGED):
+                renderer.invalidate()
+            if event.type == pygame.QUIT:
+                running = False
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key == pygame.K_RIGHT:
+                    advance = True
+                elif event.key == pygame.K_UP:
+                    move_delay = max(1, move_delay // 2)
+                elif event.key == pygame.K_DOWN:
+                    move_delay = min(120, move_delay * 2)
+                elif event.key == pygame.K_r:
+                    frames = reader.frames(config.replay_start)
+                    frame = next(frames)
+                    move_counter = 0
+
+        move_counter += 1
+        if advance or (not paused and move_counter >= move_delay):
+            frame = next(frames, frame)
+            move_counter = 0
+            advance = False
+
+        clock.tick(config.clock_rate)
+
+    pygame.quit()
@@ -0,0 +1,629 @@
+import time
+import multiprocessing
+from array import array
+import numpy as np
+from config import GRID_SIZE_X, GRID_SIZE_Y, MAX_WAIT, REPLAN_MODE, PLANNER, COOP_WINDOW, \
+    CBS_SUBOPTIMALITY, CBS_TIME_LIMIT, CBS_NODE_LIMIT, HPA_MIN_CELLS, PATH_CACHE_SIZE, SHARED_PATH_CACHE
+from astar_engine import build_neighbor_table
+from dstar_lite import DStarLite
+from distance_fields import DistanceFieldCache
+from components import ComponentIndex
+from cooperative import CooperativePlanner
+from cbs import CBS
+from movement import resolve_moves
+from multiprocessing_worker import compute_goal_distances, compute_assignment, compute_assigned_paths, \
+    compute_constrained_paths, compute_cooperative_paths, compute_best_path, init_worker, close_worker
+from wall_store import WallStore
+from scheduler import BatchScheduler, manhattan
+from planner_service import PlannerService
+from result_arena import ResultArena, MIN_REGION_CELLS
+from shared_path_cache import SharedPathCache
+from hpa import settle_claims
+from metrics import Metrics
+from agent_store import AgentStore
+from trace_log import TraceWriter, EVENT_STUCK, EVENT_REPLAN_FAILED, EVENT_REACHED
+
+class Simulation:
+    """
+    Headless simulation core for the parallel version. Owns the flat wall
+    and goal maps, the shared-memory copy of the walls and the persistent worker pool, and runs
+    planning and movement without importing pygame.
+
+    Must be created under an `if __name__ == "__main__"` guard, since the
+    pool uses the spawn start method. Call close() when done.
+    num_workers=0 runs the worker functions in this process instead of a pool.
+    """
+
+    def __init__(self, num_workers=None, grid_size_x=GRID_SIZE_X, grid_size_y=GRID_SIZE_Y, replan_mode=REPLAN_MODE,
+                 planner=PLANNER, window=COOP_WINDOW, blocking=True, path_cache=PATH_CACHE_SIZE,
+                 shared_path_cache=SHARED_PATH_CACHE):
+        self.grid_size_x = grid_size_x
+        self.grid_size_y = grid_size_y
+        self.agents = AgentStore(grid_size_x, grid_size_y)
+        # goal cells in the order they were placed; goal_map marks them per cell
+        self.goals = []
+        self.goal_map = np.zeros(grid_size_x * grid_size_y, dtype=np.uint8)
+        self._goal_cells = None     # self.goals as an int64 array for step(), None after goals change
+        self.moving = False
+        self.total_time_taken = 0.0
+        self.ticks = 0
+        self.replans = 0   # stuck-agent replans since the last plan()
+        self.makespan = 0  # tick at which the last agent reached its goal
+        self.cbs_result = None  # result of the last solve_cbs()
+        self.planning = False       # a plan_async() is still waiting for results
+        self.restart_plan = False   # the plan in flight was cancelled by a wall edit; poll() starts it over
+        self.plan_started = 0.0
+        self.replanning = set()     # ids of agents with a replan in flight
+        self.failed_replans = set()  # (pos, goal) replans that found no path; they search their whole area
+
+        self.replan_mode = replan_mode
+        # large maps plan through the workers' HPA* abstraction instead of distance fields
+        self.large = grid_size_x * grid_size_y >= HPA_MIN_CELLS
+        self.blocking = blocking  # step() waits for its replans (headless); False leaves them to poll()
+        self.planner = planner
+        # flat uint8 wall map (x * grid_size_y + y, 1 = wall), the main process's only copy of
+        # the walls; wall_map is a (W, H) view over it
+        self.walls = bytearray(grid_size_x * grid_size_y)
+        self.wall_map = np.frombuffer(self.walls, dtype=np.uint8).reshape(grid_size_x, grid_size_y)
+        # bumped on every wall edit, published or not
+        self.wall_version = 0
+        # connected components of the free cells for the D* Lite replans in this process
+        # (the workers keep their own, following the published walls)
+        self.components = ComponentIndex(grid_size_x, grid_size_y)
+        self.neighbors = array("i")
+        self.neighbors.frombytes(build_neighbor_table(grid_size_x, grid_size_y).tobytes())
+        # the cooperative planner reserves space-time cells sequentially, so it runs in this process
+        self.fields = DistanceFieldCache(grid_size_x, grid_size_y)
+        self.coop = CooperativePlanner(self.walls, self.neighbors, self.fields, window)
+        # cell -> agent scratch buffer for the movement tick (all -1 between ticks)
+        self.occupancy = np.full(grid_size_x * grid_size_y, -1, dtype=np.int32)
+        self.taken_goals = np.zeros(grid_size_x * grid_size_y, dtype=bool)  # scratch for step(), all False between ticks
+        # versioned shared copy for the workers; edits are staged and published once per frame
+        self.store = WallStore(grid_size_x, grid_size_y)
+        self.store.replace(self.walls)
+
+        # persistent pool
+        if num_workers is None:
+            num_workers = max(1, multiprocessing.cpu_count() - 1)
+        self.num_workers = num_workers
+        self.scheduler = BatchScheduler(num_workers)
+        # workers write paths here and only send back (offset, length) references
+        self.arena = ResultArena(num_workers, max(MIN_REGION_CELLS, 4 * grid_size_x * grid_size_y))
+        arena = (self.arena.name, self.arena.regions, self.arena.region_cells)
+        # each worker caches the paths it searched; with a shared tier they also see each other's
+        self.shared_paths = None
+        shared = None
+        if path_cache > 0 and shared_path_cache > 0:
+            self.shared_paths = SharedPathCache(shared_path_cache, multiprocessing.Lock())
+            shared = (self.shared_paths.name, shared_path_cache, self.shared_paths.lock)
+        cache = (path_cache, shared)
+        if num_workers > 0:
+            self.pool = multiprocessing.Pool(
+                processes=num_workers,
+                initializer=init_worker,
+                initargs=(self.store.name, (grid_size_x, grid_size_y), arena, multiprocessing.Value("i", 0), cache)
+            )
+        else:
+            self.pool = None
+            init_worker(self.store.name, (grid_size_x, grid_size_y), arena, None, cache)
+        # timers and counters of planning, pool round trips and movement (see metrics.py)
+        self.metrics = Metrics()
+        self.trace = None  # TraceWriter while recording (see start_trace)
+        self.service = PlannerService(self.pool, self.scheduler, self.arena, self.metrics)
+
+    def close(self):
+        self.cancel()
+        self.stop_trace()
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+        else:
+            close_worker()
+        self.store.close()
+        self.arena.close()
+        if self.shared_paths is not None:
+            self.shared_paths.close()
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.grid_size_x and 0 <= y < self.grid_size_y
+
+    # --- Editing ---
+    def is_wall(self, x, y):
+        return bool(self.wall_map[x, y])
+
+    def set_wall(self, x, y, wall):
+        if self.in_bounds(x, y) and self.is_wall(x, y) != bool(wall):
+            self.wall_map[x, y] = 1 if wall else 0
+            self.wall_version += 1
+            # workers see the edit after the next publish()
+            cell = x * self.grid_size_y + y
+            self.store.set(cell, wall)
+            # plans in flight were made for the old walls
+            if self.service.busy:
+                if self.planning:
+                    self.restart_plan = True
+                self.cancel()
+            # incremental planners repair around the edited cell
+            for planner in self.agents.planners:
+                if planner is not None:
+                    planner.update_cells((cell,))
+
+    def add_agent(self, x, y):
+        if self.in_bounds(x, y) and not self.is_wall(x, y):
+            return self.agents.add(x * self.grid_size_y + y) >= 0
+        return False
+
+    def add_goal(self, x, y):
+        if self.in_bounds(x, y) and not self.is_wall(x, y):
+            cell = x * self.grid_size_y + y
+            if not self.goal_map[cell]:
+                self.goal_map[cell] = 1
+                self.goals.append(cell)
+                self._goal_cells = None
+                return True
+        return False
+
+    def clear(self):
+        """Remove all agents and goals and resync the shared wall map."""
+        self.cancel()
+        self.restart_plan = False
+        self.agents.clear()
+        self.goal_map[self.goals] = 0
+        self.goals.clear()
+        self._goal_cells = None
+        self.moving = False
+        self.total_time_taken = 0.0
+        self.ticks = 0
+        self.replans = 0
+        self.makespan = 0
+        # publish the whole map as a new generation
+        self.store.replace(self.walls)
+
+    def load(self, walls, agents, goals):
+        """
+        Replace the map with a scenario.
+        walls: 2D array indexed walls[x][y] (truthy = wall), same size as the grid
+        agents/goals: iterables of (x, y)
+        """
+        self.clear()
+        np.copyto(self.wall_map, np.asarray(walls, dtype=bool))
+        self.wall_version += 1
+        self.store.replace(self.walls)
+        for x, y in agents:
+            self.add_agent(x, y)
+        for x, y in goals:
+            self.add_goal(x, y)
+
+    def publish(self):
+        """Make staged wall edits visible to the workers (one generation per call). Returns the generation."""
+        return self.store.publish()
+
+    # --- Recording ---
+    def start_trace(self, path, **kwargs):
+        """
+        Record every movement tick to a trace file from now on (see trace_log.py),
+        starting with the current state. kwargs go to TraceWriter.
+        """
+        self.stop_trace()
+        self.trace = TraceWriter(path, self.grid_size_x, self.grid_size_y, **kwargs)
+        self._trace_tick()
+
+    def stop_trace(self):
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
+
+    def _trace_tick(self):
+        if self.trace is not None:
+            # walls are compared every tick: edits reach self.walls before they are published
+            self.trace.tick(self.ticks, self.agents, self.goals, self.walls)
+
+    # --- Planning ---
+    @property
+    def stale_results(self):
+        """Worker results dropped because walls changed while they were planned."""
+        return self.service.stale
+
+    def _submit(self, func, kind, items, costs, make_args, on_result, on_done=None):
+        """Hand a job to the planner service against the current walls (published first); returns the PlanJob."""
+        return self.service.submit(func, kind, items, costs, make_args, self.publish(), on_result, on_done)
+
+    def _map(self, func, kind, items, costs, make_args):
+        """Run a job on the pool (or inline without one) and wait for it; returns the concatenated result lists."""
+        results = []
+        self.service.wait(self._submit(func, kind, items, costs, make_args, results.extend))
+        return results
+
+    def _submit_paths(self, pairs, goals_data, reached_goals, avoid_positions, on_path, on_done=None):
+        """
+        Compute paths for (agent_pos, goal_pos) pairs on the pool.
+        on_path: called with (pair index, path cells or None) as batches come in
+        returns: the PlanJob
+        """
+        if avoid_positions:
+            # a replan costs about its distance, unless the same replan failed before
+            # and the search exhausted everything reachable
+            size = len(self.walls)
+            costs = [size if pair in self.failed_replans else manhattan(*pair) + 1 for pair in pairs]
+            kind = "replans"
+        elif self.large:
+            # abstract search plus refinement, both about linear in the distance
+            costs = [manhattan(*pair) + 1 for pair in pairs]
+            kind = "paths"
+        else:
+            # one distance field per goal plus the walk down it
+            costs = [len(self.walls) + manhattan(*pair) for pair in pairs]
+            kind = "paths"
+
+        def on_result(results):
+            for i, ref in results:
+                on_path(i, self.arena.read(ref))
+
+        items = [(i, start, goal) for i, (start, goal) in enumerate(pairs)]
+        return self._submit(compute_assigned_paths, kind, items, costs,
+                            lambda chunk: (chunk, goals_data, reached_goals, avoid_positions), on_result, on_done)
+
+    def plan(self):
+        """Assign goals to agents exclusively and optimally, then compute every path on the pool."""
+        self.plan_async()
+        self.service.wait()
+
+    def plan_async(self):
+        """
+        Start plan() without waiting for it. Results are applied as they come
+        in by poll(); with the "astar" planner every agent starts moving as
+        soon as its own path is in, the joint planners start once all are.
+        Replaces any plan or replans still in flight.
+        """
+        if not (len(self.agents) and self.goals):
+            return
+
+        self.cancel()
+        self.plan_started = time.perf_counter()
+        agents = self.agents
+        self.ticks = 0
+        self.replans = 0
+        self.makespan = 0
+        self.failed_replans.clear()
+        # prepare inputs
+        h = self.grid_size_y
+        goal_cells = np.array(self.goals, dtype=np.int64)
+        goals_data = [divmod(cell, h) for cell in self.goals]
+        agents.reset()
+        # agents standing on a goal keep it
+        on_goal = agents.at[goal_cells]
+        agents.goal[on_goal[on_goal >= 0]] = goal_cells[on_goal >= 0]
+        reached_goals = {divmod(c, h) for c in goal_cells[on_goal >= 0].tolist()}
+
+        # agents to compute for
+        planning = np.flatnonzero(agents.goal < 0).tolist()
+        free_goals = [g for g in goals_data if g not in reached_goals]
+        self.moving = True
+        self.planning = True
+        self._trace_tick()
+        if not (planning and free_goals):
+            self._finish_plan()
+            return
+
+        if self.large:
+            # a field per goal would cost a BFS over the whole map each, so take nearest goals instead
+            self._assign_nearest(planning, goals_data, reached_goals)
+            return
+
+        agent_positions = [agents.pos(i) for i in planning]
+        columns = {}
+        assignment = []
+
+        def assign():
+            # 2) exclusive optimal assignment (same solver as the serial version), also on the pool
+            unknown = [-1] * len(agent_positions)  # a stale column counts as unreachable this time
+            cost = np.array([columns.get(g, unknown) for g in free_goals], dtype=np.int64).T
+            self._submit(compute_assignment, "assign", [cost], [cost.size], lambda chunk: chunk,
+                         assignment.extend, route)
+
+        def route():
+            # 3) paths for the assigned pairs; each agent gets its path as soon as its batch is in
+            pairs = []
+            targets = []
+            for a_i, g_i in assignment:
+                gx, gy = free_goals[g_i]
+                agents.goal[planning[a_i]] = gx * h + gy
+                pairs.append((agent_positions[a_i], free_goals[g_i]))
+                targets.append(planning[a_i])
+
+            def on_path(i, cells):
+                if cells:
+                    agents.set_path(targets[i], cells)
+
+            self._submit_paths(pairs, goals_data, reached_goals, None, on_path, self._finish_plan)
+
+        # 1) true-distance cost matrix, one column per goal, built across the pool
+        # every column is one reverse BFS over the grid, so they cost about the same
+        self._submit(compute_goal_distances, "fields", free_goals, [1] * len(free_goals),
+                     lambda chunk: (chunk, agent_positions, goals_data, reached_goals), columns.update, assign)
+
+    def _assign_nearest(self, planning, goals_data, reached_goals):
+        """
+        Exclusive assignment for large maps, in greedy rounds on the pool:
+        every agent takes its nearest unclaimed goal through the HPA* graph
+        and gets the path to it in the same job (see hpa.settle_claims). The
+        plan is finished once no agent has to ask again.
+        planning: ids of the agents to assign
+        """
+        agents = self.agents
+        h = self.grid_size_y
+        claimed = set()
+
+        def ask(pending):
+            found = {}
+            paths = {}
+
+            def on_result(results):
+                for i, (goal, dist, ref) in results:
+                    found[i] = (goal, dist)
+                    paths[i] = self.arena.read(ref)
+
+            def done():
+                # settle in the order the agents were asked, whatever order the batches came in
+                settled, retry = settle_claims({i: found[i] for i in pending if i in found}, claimed)
+                for i, (gx, gy) in settled.items():
+                    agents.goal[i] = gx * h + gy
+                    if paths[i]:
+                        agents.set_path(i, paths[i])
+                if retry:
+                    ask(retry)
+                else:
+                    self._finish_plan()
+
+            taken = frozenset(claimed)
+            items = [(i, agents.pos(i)) for i in pending]
+            self._submit(compute_best_path, "nearest", items, [1] * len(items),
+                         lambda chunk: (chunk, goals_data, reached_goals, taken), on_result, done)
+
+        ask(planning)
+
+    def _finish_plan(self):
+        if self.planner == "cooperative":
+            # the first cooperative pass also runs on the pool; the rolling replans in step() are short
+            starts, goals = self._cooperative_inputs()
+            paths = [None] * len(goals)
+
+            def on_result(results):
+                for i, ref in results:
+                    paths[i] = self.arena.read(ref)
+
+            def done():
+                self._apply_cooperative(goals, paths)
+                self._plan_done()
+
+            self._submit(compute_cooperative_paths, "cooperative", [(starts, goals, self.coop.window)],
+                         [len(starts)], lambda chunk: chunk, on_result, done)
+            return
+        if self.planner == "cbs":
+            self.solve_cbs()
+        self._plan_done()
+
+    def _plan_done(self):
+        self.planning = False
+        self.total_time_taken = time.perf_counter() - self.plan_started
+        self.metrics.record("plan", self.total_time_taken)
+
+    def poll(self):
+        """Apply the planning results that have come back, without blocking; call once per frame."""
+        if self.restart_plan:
+            self.restart_plan = False
+            self.plan_async()
+        with self.metrics.timer("poll"):
+            return self.service.poll()
+
+    def cancel(self):
+        """Drop the plan and replans in flight; their results are ignored when they arrive."""
+        self.service.cancel()
+        self.replanning.clear()
+        self.planning = False
+
+    def _plan_cooperative(self):
+        """Replace the paths of agents still under way with collision-free space-time paths."""
+        self.fields.sync(self.wall_version, self.walls)
+        starts, goals = self._cooperative_inputs()
+        self._apply_cooperative(goals, self.coop.plan(starts, goals))
+
+    def _cooperative_inputs(self):
+        agents = self.agents
+        starts = agents.cell.tolist()
+        # agents that finished on their goal stay put; the rest (including agents
+        # crossing their goal mid-path) are planned
+        done = (agents.goal < 0) | ((agents.goal == agents.cell) & ~agents.moving)
+        goals = [None if d else goal for d, goal in zip(done.tolist(), agents.goal.tolist())]
+        return starts, goals
+
+    def _apply_cooperative(self, goals, paths):
+        agents = self.agents
+        for i, (goal, path) in enumerate(zip(goals, paths)):
+            if goal is not None and path is not None:
+                agents.set_path(i, path)
+                agents.wait[i] = 0
+
+    def _search_many(self, tasks):
+        """Run CBS low-level searches on the pool, longest first; results come back in task order."""
+        h = self.grid_size_y
+        costs = []
+        for start, goal, constraints, others, _ in tasks:
+            # search distance, plus one state per constraint and per cell of the conflict table
+            cost = manhattan(divmod(start, h), divmod(goal, h)) + len(constraints) + 1
+            if others:
+                cost += sum(len(path) + 1 for _, path in others)
+            costs.append(cost)
+        results = [(None, 0, 0)] * len(tasks)
+        for i, (ref, bound, expanded) in self._map(compute_constrained_paths, "cbs", list(enumerate(tasks)), costs,
+                                                   lambda chunk: chunk):
+            results[i] = (self.arena.read(ref), bound, expanded)
+        return results
+
+    def solve_cbs(self, suboptimality=CBS_SUBOPTIMALITY, time_limit=CBS_TIME_LIMIT, node_limit=CBS_NODE_LIMIT):
+        """
+        Replace the paths from plan() with collision-free ones found by CBS
+        (ECBS if suboptimality > 1), keeping the goal assignment. The two
+        sibling low-level searches of every split run on the pool in
+        parallel. Agents without a goal stay put unless they have to make
+        way. Paths are only replaced if a solution is found within the limits.
+        returns: the result dict of cbs.CBS.solve()
+        """
+        agents = self.agents
+        starts = agents.cell.tolist()
+        goals = np.where(agents.goal < 0, agents.cell, agents.goal).tolist()
+        result = CBS(len(self.walls), starts, goals, self._search_many, suboptimality).solve(time_limit, node_limit)
+        if result["paths"] is not None:
+            for i, path in enumerate(result["paths"]):
+                agents.set_path(i, path)
+            agents.wait[:] = 0
+        self.cbs_result = result
+        return result
+
+    # --- Movement ---
+    def step(self):
+        """
+        Advance every agent by one movement tick, replanning stuck agents on
+        the pool (waiting for the replans only if blocking).
+        """
+        if self.planning and self.planner != "astar":
+            return  # the joint planners move agents only once every path is in
+        metrics = self.metrics
+        started = time.perf_counter()
+        if self.planner == "cooperative" and self.ticks and self.ticks % max(1, self.coop.window // 2) == 0:
+            # rolling horizon: re-reserve the next window before the old one runs out
+            self._plan_cooperative()
+
+        agents = self.agents
+        goals = self.goals
+        h = self.grid_size_y
+        pos = agents.cell
+        nxt = agents.next_cells()  # cell each agent steps into, -1 if it stays put
+        # agents without a path stop waiting; a step onto their own cell is a planned wait
+        # (cooperative planner), taken without moving
+        agents.wait[nxt < 0] = 0
+        planned = np.flatnonzero(nxt == pos)
+        if planned.size:
+            agents.head[planned] += 1
+            agents.wait[planned] = 0
+            nxt[planned] = -1
+
+        # goals with an agent on them cannot be entered this tick
+        if self._goal_cells is None:
+            self._goal_cells = np.array(goals, dtype=np.int64)
+        goal_cells = self._goal_cells
+        reached_cells = goal_cells[agents.at[goal_cells] >= 0]
+
+        # vertex and swap conflicts for every agent at once
+        taken = self.taken_goals
+        taken[reached_cells] = True
+        try:
+            moved, blocked = resolve_moves(pos, nxt, self.occupancy, taken)
+        finally:
+            taken[reached_cells] = False
+        metrics.record("move", time.perf_counter() - started)
+
+        trace = self.trace
+        blocked = np.flatnonzero(blocked)
+        agents.wait[blocked] += 1
+        stuck_agents = blocked[agents.wait[blocked] >= MAX_WAIT]  # ids, replanned on the pool
+        agents.wait[stuck_agents] = 0
+
+        moved = np.flatnonzero(moved)
+        agents.move(moved)
+        arrived = moved[(agents.head[moved] == agents.end[moved]) & (agents.cell[moved] == agents.goal[moved])]
+        if arrived.size:
+            self.makespan = self.ticks + 1
+        if trace is not None:
+            for i in stuck_agents.tolist():
+                trace.event(i, EVENT_STUCK)
+            for i in arrived.tolist():
+                trace.event(i, EVENT_REACHED)
+
+        occupied = set(agents.cell.tolist()) if stuck_agents.size else set()
+        stuck_agents = [i for i in stuck_agents.tolist() if agents.goal[i] >= 0]
+
+        # --- Incremental replanning for stuck agents, in this process ---
+        if stuck_agents and self.replan_mode == "dstar":
+            for i in stuck_agents:
+                self.replans += 1
+                metrics.count("replans")
+                t0 = time.perf_counter()
+                path = self._replan_dstar(i, occupied - {int(agents.cell[i])})
+                metrics.record("replan", time.perf_counter() - t0)
+                if path:
+                    agents.set_path(i, path)
+                else:
+                    metrics.count("replans.failed")
+                    if trace is not None:
+                        trace.event(i, EVENT_REPLAN_FAILED)
+
+        # --- Parallel dynamic replanning for stuck agents ---
+        elif stuck_agents:
+            # stuck agents keep their exclusive goal and only get a new path to it
+            # (agents whose previous replan is still in flight wait for that one)
+            replanning = [i for i in stuck_agents if i not in self.replanning]
+            if replanning:
+                self.replans += len(replanning)
+                metrics.count("replans", len(replanning))
+                pairs = [(agents.pos(i), divmod(int(agents.goal[i]), h)) for i in replanning]
+                self.replanning.update(replanning)
+
+                # assign replanned paths back, unless the agent got going again meanwhile
+                def on_path(k, cells):
+                    i, pair = replanning[k], pairs[k]
+                    if agents.pos(i) != pair[0]:
+                        return
+                    if cells:
+                        agents.set_path(i, cells)
+                    else:
+                        self.failed_replans.add(pair)
+                        metrics.count("replans.failed")
+                        if self.trace is not None:
+                            self.trace.event(i, EVENT_REPLAN_FAILED)
+
+                avoid = {divmod(c, h) for c in occupied}
+                reached_goals = {divmod(c, h) for c in reached_cells.tolist()}
+                job = self._submit_paths(pairs, [divmod(cell, h) for cell in goals], reached_goals, avoid, on_path,
+                                         lambda: self.replanning.difference_update(replanning))
+                if self.blocking:
+                    self.service.wait(job)
+
+        self.ticks += 1
+
+        if reached_cells.size == len(goals):
+            under_way = agents.moving
+            agents.wait[under_way] = 0
+            agents.head[:] = agents.end[:] = 0
+
+        # stop moving when all paths done (and no more are on the way)
+        if not self.planning and not agents.moving.any():
+            self.moving = False
+        metrics.record("step", time.perf_counter() - started)
+        self._trace_tick()
+
+    def _replan_dstar(self, i, blocked):
+        """Repair agent i's D* Lite search (created on first use) and return its new path cells."""
+        agents = self.agents
+        start, goal = int(agents.cell[i]), int(agents.goal[i])
+        self.components.sync(self.wall_version, self.walls)
+        if not self.components.connected(start, goal):
+            self.metrics.count("replans.unreachable")
+            return []
+        planner = agents.planners[i]
+        if planner is None or planner.goal != goal:
+            planner = agents.planners[i] = DStarLite(self.walls, self.neighbors, self.grid_size_y, start, goal)
+        else:
+            planner.move_start(start)
+        planner.set_blocked(blocked)
+        path = planner.plan()
+        self.metrics.count("expanded", planner.expanded)
+        return path
+
+    def run(self, n_ticks):
+        """Run up to n_ticks movement ticks, stopping early once every agent is done. Returns ticks run."""
+        ran = 0
+        while ran < n_ticks and self.moving:
+            self.step()
+            ran += 1
+        return ran
@@ -0,0 +1,235 @@
+"""
+Run traces: what every agent did on every movement tick, streamed to a file
+while the simulation runs, and read back for replay without any planner.
+
+The file is a 24-byte header followed by zlib-compressed chunks of up to
+CHUNK_TICKS ticks. Each chunk starts with a keyframe (the full walls, goals
+and agent cells), so a reader can start at any chunk; within a chunk a tick
+stores how far every agent's cell moved since the previous tick (mostly
+zeros, which compress to almost nothing), its wait count and whether it
+still has a path, plus wall edits, goal changes and events since the
+previous tick. The writer holds one chunk at a time, so memory stays
+bounded however long the run is.
+
+    sim.start_trace("run.trace")     # or --record run.trace
+    ...
+    for frame in TraceReader("run.trace").frames(start=50000):
+        ...
+"""
+import struct
+import zlib
+import numpy as np
+
+TRACE_MAGIC = b"IMAPTRCE"
+TRACE_VERSION = 1
+CHUNK_TICKS = 1024
+_HEADER = struct.Struct("<8sIIII")      # magic, version, width, height, reserved
+_CHUNK = struct.Struct("<QII")          # first frame, raw length, compressed length
+_RECORD = struct.Struct("<BQI")         # kind, sim tick, count
+
+# record kinds; a tick is its WALLS/EDITS, GOALS and EVENTS records followed by KEY or MOVES
+_WALLS = 1      # uint8[count]: every cell
+_EDITS = 2      # int32[count] cells, uint8[count] new values
+_GOALS = 3      # int32[count] goal cells
+_EVENTS = 4     # int32[count] agents, uint8[count] event codes
+_KEY = 5        # int32[count] agent cells, uint8[count] waits, uint8[count] moving
+_MOVES = 6      # as _KEY, with the cells as differences to the previous tick
+
+# event codes
+EVENT_STUCK = 1            # the agent gave up waiting and asked for a new path
+EVENT_REPLAN_FAILED = 2    # no path was found for it
+EVENT_REACHED = 3          # it arrived at its goal
+EVENT_NAMES = {EVENT_STUCK: "stuck", EVENT_REPLAN_FAILED: "replan failed", EVENT_REACHED: "reached"}
+
+class TraceWriter:
+    """Streams ticks to a trace file; see the module docstring for the format."""
+
+    def __init__(self, path, width, height, chunk_ticks=CHUNK_TICKS):
+        self.width = width
+        self.height = height
+        self.chunk_ticks = chunk_ticks
+        self.file = open(path, "wb")
+        self.file.write(_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, width, height, 0))
+        self.buffer = bytearray()
+        self.frames = 0          # ticks written so far
+        self.chunk_start = 0     # first frame of the buffered chunk
+        self.walls = None        # walls as of the last tick written
+        self.version = None
+        self.goals = None
+        self.cells = None
+        self.events = []         # (agent index, code) since the last tick
+
+    def event(self, agent, code):
+        """Note an event for agent (index into the agent list); written with the next tick."""
+        self.events.append((agent, code))
+
+    def tick(self, tick, agents, goals, walls, version=None):
+        """
+        Append one tick.
+        tick: the simulation's tick counter
+        agents: the simulation's AgentStore
+        goals: flat goal cells
+        walls: flat wall map (see Simulation.walls)
+        version: optional wall generation; the walls are only compared with the
+            previous tick's when it changes (None: compared every tick)
+        """
+        key = self.frames == self.chunk_start
+
+        if key or self.walls is None:
+            self.walls = np.frombuffer(walls, dtype=np.uint8).copy()
+            self._record(_WALLS, tick, self.walls)
+        elif version is None or version != self.version:
+            current = np.frombuffer(walls, dtype=np.uint8)
+            changed = np.flatnonzero(current != self.walls)
+            if changed.size:
+                self.walls[changed] = current[changed]
+                self._record(_EDITS, tick, changed.astype(np.int32), self.walls[changed])
+        self.version = version
+
+        goal_cells = np.array(goals, dtype=np.int32)
+        if key or self.goals is None or not np.array_equal(goal_cells, self.goals):
+            self.goals = goal_cells
+            self._record(_GOALS, tick, goal_cells)
+
+        if self.events:
+            events = np.array(self.events, dtype=np.int32).reshape(-1, 2)
+            self._record(_EVENTS, tick, events[:, 0], events[:, 1].astype(np.uint8))
+            self.events.clear()
+
+        cells = agents.cell.astype(np.int32)
+        waits = np.minimum(agents.wait, 255).astype(np.uint8)
+        moving = agents.moving.astype(np.uint8)
+        if key or self.cells is None or self.cells.size != cells.size:
+            self._record(_KEY, tick, cells, waits, moving)
+        else:
+            self._record(_MOVES, tick, cells - self.cells, waits, moving)
+        self.cells = cells
+
+        self.frames += 1
+        if self.frames - self.chunk_start >= self.chunk_ticks:
+            self.flush()
+
+    def _record(self, kind, tick, *columns):
+        self.buffer += _RECORD.pack(kind, tick, len(columns[0]))
+        for column in columns:
+            self.buffer += column.tobytes()
+
+    def flush(self):
+        """Write the buffered chunk; the next tick starts a new one with a keyframe."""
+        if self.buffer:
+            data = zlib.compress(bytes(self.buffer), 6)
+            self.file.write(_CHUNK.pack(self.chunk_start, len(self.buffer), len(data)))
+            self.file.write(data)
+            self.file.flush()
+            self.buffer.clear()
+        self.chunk_start = self.frames
+
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+class TraceFrame:
+    """
+    One recorded tick.
+    walls is updated in place by the reader from frame to frame; copy it to keep it.
+    """
+    __slots__ = ("index", "tick", "walls", "goals", "cells", "waits", "moving", "events")
+
+    def __init__(self, index, tick, walls, goals, cells, waits, moving, events):
+        self.index = index      # position in the trace
+        self.tick = tick        # the simulation's tick counter
+        self.walls = walls      # uint8 flat wall map
+        self.goals = goals      # int32 goal cells
+        self.cells = cells      # int32 agent cells
+        self.waits = waits      # uint8 wait counts
+        self.moving = moving    # uint8, 1 if the agent still had a path
+        self.events = events    # list of (agent index, event code)
+
+class TraceReader:
+    """Reads a trace written by TraceWriter, one chunk in memory at a time."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, version, self.width, self.height, _ = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != TRACE_MAGIC or version != TRACE_VERSION:
+                raise ValueError(f"{path}: not a trace (version {TRACE_VERSION})")
+            # chunk index: (first frame, file offset, raw length, compressed length), headers only
+            self.chunks = []
+            while True:
+                head = f.read(_CHUNK.size)
+                if len(head) < _CHUNK.size:
+                    break
+                first, raw, packed = _CHUNK.unpack(head)
+                self.chunks.append((first, f.tell(), raw, packed))
+                f.seek(packed, 1)
+        self.frames_total = self._count_last()
+
+    def _count_last(self):
+        """Frames in the trace: the last chunk's first frame plus its ticks."""
+        if not self.chunks:
+            return 0
+        with open(self.path, "rb") as f:
+            first = self.chunks[-1][0]
+            return first + sum(1 for _ in self._decode(f, self.chunks[-1], first))
+
+    def __len__(self):
+        return self.frames_total
+
+    def frames(self, start=0):
+        """Yield TraceFrames from frame start on, decoding only the chunks from the one holding it."""
+        i = 0
+        while i + 1 < len(self.chunks) and self.chunks[i + 1][0] <= start:
+            i += 1
+        with open(self.path, "rb") as f:
+            for chunk in self.chunks[i:]:
+                for frame in self._decode(f, chunk, chunk[0]):
+                    if frame.index >= start:
+                        yield frame
+
+    def _decode(self, f, chunk, index):
+        _, offset, _, packed = chunk
+        f.seek(offset)
+        data = zlib.decompress(f.read(packed))
+        size = self.width * self.height
+        walls = None
+        goals = np.zeros(0, dtype=np.int32)
+        cells = None
+        events = []
+        pos = 0
+        while pos < len(data):
+            kind, tick, count = _RECORD.unpack_from(data, pos)
+            pos += _RECORD.size
+            if kind == _WALLS:
+                walls = np.frombuffer(data, dtype=np.uint8, count=size, offset=pos).copy()
+                pos += count
+            elif kind == _EDITS:
+                changed = np.frombuffer(data, dtype=np.int32, count=count, offset=pos)
+                walls[changed] = np.frombuffer(data, dtype=np.uint8, count=count, offset=pos + 4 * count)
+                pos += 5 * count
+            elif kind == _GOALS:
+                goals = np.frombuffer(data, dtype=np.int32, count=count, offset=pos)
+                pos += 4 * count
+            elif kind == _EVENTS:
+                agents = np.frombuffer(data, dtype=np.int32, count=count, offset=pos).tolist()
+                codes = np.frombuffer(data, dtype=np.uint8, count=count, offset=pos + 4 * count).tolist()
+                events = list(zip(agents, codes))
+                pos += 5 * count
+            else:
+                moved = np.frombuffer(data, dtype=np.int32, count=count, offset=pos)
+                cells = moved.copy() if kind == _KEY else cells + moved
+                waits = np.frombuffer(data, dtype=np.uint8, count=count, offset=pos + 4 * count)
+                moving = np.frombuffer(data, dtype=np.uint8, count=count, offset=pos + 5 * count)
+                pos += 6 * count
+                yield TraceFrame(index, tick, walls, goals, cells, waits, moving, events)
+                index += 1
+                events = []
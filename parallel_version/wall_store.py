@@ -0,0 +1,147 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+# header slots (int64)
+_SEQ = 0        # seqlock sequence: odd while the writer is publishing
+_GEN = 1        # generation: bumped once per publish
+_LOG = 2        # total number of cells ever appended to the dirty log
+_FULL = 3       # generation of the last full rewrite (log entries before it are meaningless)
+_HEADER = 8
+
+LOG_CAPACITY = 4096  # dirty-cell ring size; readers further behind copy the whole map
+
+class WallStore:
+    """
+    Versioned wall map in one shared memory block:
+
+        [ int64 header | uint8 walls (x * height + y) | int32 dirty-cell ring ]
+
+    The main process is the only writer. Edits are staged with set() and
+    made visible by publish(), which writes every staged cell, appends them
+    to the dirty log and bumps the generation in one step, so a burst of
+    mouse edits costs one publish per frame instead of one full copy per
+    edit. Readers (pool workers) keep a private copy and sync() it under a
+    seqlock: retry while the sequence number is odd or changed during the
+    read. They copy only the cells logged since their last generation, and
+    fall back to a full copy when they are too far behind.
+
+    The generation a worker planned against travels back with its results,
+    so the main process can tell plans made on an older map from current ones.
+    """
+
+    def __init__(self, width, height, name=None, log_capacity=LOG_CAPACITY):
+        """Create the block (name=None, main process) or attach to an existing one by name."""
+        self.width = width
+        self.height = height
+        size = width * height
+        walls_offset = _HEADER * 8
+        log_offset = walls_offset + (size + 7) // 8 * 8
+        total = log_offset + 4 * log_capacity
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=total)
+        buf = self.shm.buf
+        self.header = np.ndarray((_HEADER,), dtype=np.int64, buffer=buf)
+        self.walls = np.ndarray((size,), dtype=np.uint8, buffer=buf, offset=walls_offset)
+        self.log = np.ndarray((log_capacity,), dtype=np.int32, buffer=buf, offset=log_offset)
+        self.log_capacity = log_capacity
+        if self.owner:
+            self.header[:] = 0
+            self.walls[:] = 0
+        self.pending = {}  # writer side: cell -> staged value
+
+        # reader side: private copy and how far it has caught up
+        self.local = None
+        self.local_generation = -1
+        self.local_log = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def generation(self):
+        return int(self.header[_GEN])
+
+    def close(self):
+        # drop the numpy views before closing the mapping they point into
+        self.header = self.walls = self.log = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    # --- Writer (main process) ---
+    def set(self, cell, value):
+        """Stage one cell; nothing is visible to readers until publish()."""
+        self.pending[cell] = 1 if value else 0
+
+    def publish(self):
+        """Make every staged edit visible as one new generation. Returns the current generation."""
+        pending = {c: v for c, v in self.pending.items() if self.walls[c] != v}
+        self.pending.clear()
+        if not pending:
+            return self.generation
+        if len(pending) >= self.log_capacity:
+            walls = self.walls.copy()
+            walls[list(pending)] = list(pending.values())
+            return self.replace(walls)
+
+        header = self.header
+        cells = np.fromiter(pending.keys(), dtype=np.int64, count=len(pending))
+        values = np.fromiter(pending.values(), dtype=np.uint8, count=len(pending))
+        start = int(header[_LOG])
+        header[_SEQ] += 1
+        self.walls[cells] = values
+        self.log[(start + np.arange(cells.size)) % self.log_capacity] = cells
+        header[_LOG] = start + cells.size
+        header[_GEN] += 1
+        header[_SEQ] += 1
+        return int(header[_GEN])
+
+    def replace(self, walls):
+        """Publish a whole new wall map (flat, 1 = wall) as one generation. Returns it."""
+        header = self.header
+        self.pending.clear()
+        header[_SEQ] += 1
+        np.copyto(self.walls, np.asarray(walls, dtype=np.uint8).reshape(-1))
+        header[_GEN] += 1
+        header[_FULL] = header[_GEN]
+        header[_SEQ] += 1
+        return int(header[_GEN])
+
+    # --- Reader (workers) ---
+    def sync(self):
+        """
+        Bring the private copy up to the latest published generation.
+        returns: (generation, walls) with walls a flat bytearray the caller must not modify
+        """
+        header = self.header
+        while True:
+            seq = int(header[_SEQ])
+            if seq & 1:
+                continue  # writer is mid-publish
+            generation = int(header[_GEN])
+            if generation == self.local_generation:
+                if int(header[_SEQ]) == seq:
+                    return generation, self.local
+                continue
+            log_total = int(header[_LOG])
+            full = int(header[_FULL])
+
+            if (self.local is None or full > self.local_generation
+                    or log_total - self.local_log > self.log_capacity):
+                local = bytearray(self.walls.tobytes())
+                if int(header[_SEQ]) != seq:
+                    continue
+                self.local = local
+            else:
+                slots = np.arange(self.local_log, log_total) % self.log_capacity
+                cells = self.log[slots]
+                values = self.walls[cells]
+                if int(header[_SEQ]) != seq:
+                    continue
+                local = self.local
+                for cell, value in zip(cells.tolist(), values.tolist()):
+                    local[cell] = value
+            self.local_generation = generation
+            self.local_log = log_total
+            return generation, self.local
@@ -0,0 +1,213 @@
+import numpy as np
+
+class AgentStore:
+    """
+    Agents as a struct of arrays instead of a list of dicts.
+
+    An agent is an integer id, its index into every array below; ids are
+    handed out in order by add() and stay valid until clear(). Per agent:
+
+        cell    int64  flat cell it stands on (x * height + y)
+        goal    int64  flat goal cell, -1 = none
+        wait    int32  ticks it has been blocked in a row
+        head    int64  index of its next path step in steps
+        end     int64  one past its last path step; head == end: no path
+        reached bool   arrived at its goal (serial version)
+
+    Paths live back to back in one int64 buffer, steps: taking a step is
+    head += 1 for every mover at once, and next_cells() reads every agent's
+    next step with one gather. A new path is appended at the end of the
+    buffer; the space of paths that were replaced is reclaimed when the
+    buffer fills up (see _reserve).
+
+    at is the reverse index, cell -> agent id (-1 = free), kept up to date
+    by add() and move(), so looking an agent up by position is O(1).
+    """
+
+    def __init__(self, width, height, capacity=64):
+        self.width = width
+        self.height = height
+        self.count = 0
+        self._cell = np.zeros(capacity, dtype=np.int64)
+        self._goal = np.full(capacity, -1, dtype=np.int64)
+        self._wait = np.zeros(capacity, dtype=np.int32)
+        self._head = np.zeros(capacity, dtype=np.int64)
+        self._end = np.zeros(capacity, dtype=np.int64)
+        self._reached = np.zeros(capacity, dtype=bool)
+        self.planners = []      # per agent incremental planner (D* Lite), None until used
+        self.at = np.full(width * height, -1, dtype=np.int32)
+        self.steps = np.zeros(max(1024, capacity * 16), dtype=np.int64)
+        self.used = 0           # steps written so far (live or replaced)
+
+    def __len__(self):
+        return self.count
+
+    # views of the live part of each array; taken afresh after add(), which may reallocate
+    @property
+    def cell(self):
+        return self._cell[:self.count]
+
+    @property
+    def goal(self):
+        return self._goal[:self.count]
+
+    @property
+    def wait(self):
+        return self._wait[:self.count]
+
+    @property
+    def head(self):
+        return self._head[:self.count]
+
+    @property
+    def end(self):
+        return self._end[:self.count]
+
+    @property
+    def reached(self):
+        return self._reached[:self.count]
+
+    @property
+    def moving(self):
+        """Agents that still have path steps left."""
+        return self.head < self.end
+
+    # --- Agents ---
+    def add(self, cell):
+        """Add an agent on a flat cell. Returns its id, or -1 if the cell is taken."""
+        if self.at[cell] >= 0:
+            return -1
+        i = self.count
+        if i == self._cell.size:
+            self._grow(2 * i)
+        self._cell[i] = cell
+        self._goal[i] = -1
+        self._wait[i] = 0
+        self._head[i] = self._end[i] = 0
+        self._reached[i] = False
+        self.planners.append(None)
+        self.at[cell] = i
+        self.count += 1
+        return i
+
+    def _grow(self, capacity):
+        for name in ("_cell", "_goal", "_wait", "_head", "_end", "_reached"):
+            old = getattr(self, name)
+            new = np.full(capacity, -1 if name == "_goal" else 0, dtype=old.dtype)
+            new[:old.size] = old
+            setattr(self, name, new)
+
+    def clear(self):
+        self.at[self.cell] = -1
+        self.count = 0
+        self.planners.clear()
+        self.used = 0
+
+    def pos(self, i):
+        """(x, y) of agent i."""
+        return divmod(int(self._cell[i]), self.height)
+
+    def positions(self):
+        """(x, y) of every agent, in id order."""
+        return [divmod(cell, self.height) for cell in self.cell.tolist()]
+
+    def reset(self):
+        """Drop every path, goal and wait counter (before planning from scratch)."""
+        self.goal[:] = -1
+        self.wait[:] = 0
+        self.head[:] = self.end[:] = 0
+        self.reached[:] = False
+        self.planners[:] = [None] * self.count
+        self.used = 0
+
+    def move(self, ids):
+        """Advance the agents in ids (no two onto the same cell) one step along their paths."""
+        if not len(ids):
+            return
+        new = self.steps[self._head[ids]]
+        self.at[self._cell[ids]] = -1
+        self.at[new] = ids
+        self._cell[ids] = new
+        self._head[ids] += 1
+        self._wait[ids] = 0
+
+    # --- Paths ---
+    def set_path(self, i, cells):
+        """Give agent i a new path (sequence of flat cells, the next step first; empty = none)."""
+        n = len(cells)
+        if not n:
+            self._head[i] = self._end[i] = 0
+            return
+        self._reserve(n)
+        self.steps[self.used:self.used + n] = cells
+        self._head[i] = self.used
+        self._end[i] = self.used + n
+        self.used += n
+
+    def clear_path(self, i):
+        self._head[i] = self._end[i] = 0
+
+    def path(self, i):
+        """Remaining steps of agent i (a view into the buffer; copy it to keep it)."""
+        return self.steps[self._head[i]:self._end[i]]
+
+    def next_cells(self):
+        """Flat cell of every agent's next step, -1 for agents without one."""
+        head, end = self.head, self.end
+        has = head < end
+        return np.where(has, self.steps[np.where(has, head, 0)], -1)
+
+    def path_cells(self):
+        """The remaining steps of every agent, concatenated (e.g. to draw them)."""
+        head, end = self.head, self.end
+        lengths = np.maximum(end - head, 0)
+        total = int(lengths.sum())
+        if not total:
+            return np.zeros(0, dtype=np.int64)
+        # index of every remaining step: its path's head plus its position in the path
+        first = np.cumsum(lengths) - lengths
+        return self.steps[np.repeat(head - first, lengths) + np.arange(total)]
+
+    def _reserve(self, n):
+        """Make room for n more steps, reclaiming the space of replaced paths first."""
+        if self.used + n <= self.steps.size:
+            return
+        head, end = self.head, self.end
+        lengths = np.maximum(end - head, 0)
+        live = int(lengths.sum())
+        size = self.steps.size
+        while live + n > size // 2:
+            size *= 2
+        steps = np.zeros(size, dtype=np.int64)
+        steps[:live] = self.path_cells()
+        first = np.cumsum(lengths) - lengths
+        has = lengths > 0
+        head[:] = np.where(has, first, 0)
+        end[:] = np.where(has, first + lengths, 0)
+        self.steps = steps
+        self.used = live
+
+    # --- Replays ---
+    def restore(self, cells, waits, moving):
+        """
+        Replace every agent with a recorded state without paths (see trace_log):
+        agents that were moving get a one-step path onto their own cell.
+        """
+        self.clear()
+        n = len(cells)
+        if n > self._cell.size:
+            self._grow(n)
+        if n > self.steps.size:
+            self.steps = np.zeros(2 * n, dtype=np.int64)
+        self.count = n
+        self.cell[:] = cells
+        self.goal[:] = -1
+        self.wait[:] = waits
+        self.reached[:] = False
+        self.planners[:] = [None] * n
+        self.at[self.cell] = np.arange(n, dtype=np.int32)
+        self.steps[:n] = self.cell
+        moving = np.asarray(moving, dtype=bool)
+        self.head[:] = np.where(moving, np.arange(n), 0)
+        self.end[:] = np.where(moving, np.arange(n) + 1, 0)
+        self.used = n
@@ -0,0 +1,163 @@
+import heapq
+from array import array
+import numpy as np
+
+# Neighbor order matches astar(): (0,1), (1,0), (-1,0), (0,-1)
+_DIRECTIONS = ((0, 1), (1, 0), (-1, 0), (0, -1))
+
+def flatten_walls(walls):
+    """
+    Convert a walls[x][y] map (numpy array or nested lists) to a flat bytes
+    object indexed by cell index x * height + y (1 = wall, 0 = free).
+    """
+    if isinstance(walls, np.ndarray):
+        return np.ascontiguousarray(walls, dtype=np.uint8).tobytes()
+    return bytes(1 if v else 0 for column in walls for v in column)
+
+def build_neighbor_table(width, height):
+    """
+    Flat int32 table with 4 entries per cell (x * height + y), in _DIRECTIONS
+    order, -1 where the neighbor is off the grid.
+    """
+    xs, ys = np.meshgrid(np.arange(width), np.arange(height), indexing="ij")
+    table = np.full((width, height, 4), -1, dtype=np.int32)
+    for k, (dx, dy) in enumerate(_DIRECTIONS):
+        nx, ny = xs + dx, ys + dy
+        valid = (nx >= 0) & (nx < width) & (ny >= 0) & (ny < height)
+        table[..., k] = np.where(valid, nx * height + ny, -1)
+    return table.reshape(-1)
+
+class GridAStar:
+    """
+    A* on a 4-connected grid using flat cell indices (x * height + y).
+
+    The neighbor table and the g-cost / parent / closed buffers are allocated
+    once per grid size. Each search bumps a generation counter and a cell's
+    entry only counts as set if its stamp equals the current generation, so
+    nothing has to be cleared between searches.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.size = width * height
+        n = self.size
+
+        self.neighbors = array("i")
+        self.neighbors.frombytes(build_neighbor_table(width, height).tobytes())
+        cells = np.arange(n, dtype=np.int32)
+        self.xs = array("i")
+        self.xs.frombytes((cells // height).astype(np.int32).tobytes())
+        self.ys = array("i")
+        self.ys.frombytes((cells % height).astype(np.int32).tobytes())
+
+        self.g = array("i", bytes(4 * n))
+        self.parent = array("i", bytes(4 * n))
+        self.seen = array("I", bytes(4 * n))     # generation g/parent were last written
+        self.closed = array("I", bytes(4 * n))   # generation the cell was last expanded
+        self.blocked = array("I", bytes(4 * n))  # generation the cell was marked as a temporary obstacle
+        self.generation = 0
+        self.expanded = 0  # nodes expanded by the last search
+        self.pushed = 0    # heap pushes of the last search
+        self._heap = []
+
+    def index(self, x, y):
+        return x * self.height + y
+
+    def _next_generation(self):
+        self.generation += 1
+        if self.generation >= 0xFFFFFFFF:
+            # stamps would wrap: reset once every ~4 billion searches
+            n = self.size
+            self.seen = array("I", bytes(4 * n))
+            self.closed = array("I", bytes(4 * n))
+            self.blocked = array("I", bytes(4 * n))
+            self.generation = 1
+        return self.generation
+
+    def search(self, walls, start, goal, blocked=None, heuristic=None):
+        """
+        walls: flat bytes-like wall map (see flatten_walls)
+        start/goal: flat cell indices
+        blocked: optional iterable of cell indices to treat as temporary obstacles
+        heuristic: optional flat sequence of lower-bound distances to goal (e.g. a
+            distance field); negative entries mark cells that cannot reach the goal.
+            Defaults to Manhattan distance.
+        returns: list of cell indices from start's next step to goal ([] if none)
+        """
+        self.expanded = self.pushed = 0
+        if start == goal or walls[start] or walls[goal]:
+            return []
+
+        gen = self._next_generation()
+        neighbors, xs, ys = self.neighbors, self.xs, self.ys
+        g, parent, seen, closed, blocked_at = self.g, self.parent, self.seen, self.closed, self.blocked
+        if blocked:
+            for cell in blocked:
+                blocked_at[cell] = gen
+
+        gx, gy = xs[goal], ys[goal]
+        # heap entries are packed as f * size + cell: one int instead of an (f, cell) tuple,
+        # with the same ordering (lowest f first, ties broken by lowest cell index)
+        size = self.size
+        heap = self._heap
+        heap.clear()
+        heappush, heappop = heapq.heappush, heapq.heappop
+
+        g[start] = 0
+        seen[start] = gen
+        parent[start] = -1
+        h_start = heuristic[start] if heuristic is not None else abs(xs[start] - gx) + abs(ys[start] - gy)
+        if h_start < 0:
+            return []
+        heappush(heap, h_start * size + start)
+        expanded = 0
+        pushed = 1
+
+        while heap:
+            current = heappop(heap) % size
+            if closed[current] == gen:
+                continue
+            expanded += 1
+            if current == goal:
+                self.expanded, self.pushed = expanded, pushed
+                path = []
+                cur = current
+                while cur != start:
+                    path.append(cur)
+                    cur = parent[cur]
+                path.reverse()
+                return path
+
+            closed[current] = gen
+            tentative_g = g[current] + 1
+            base = current * 4
+            for k in range(base, base + 4):
+                neigh = neighbors[k]
+                if neigh < 0 or walls[neigh] or blocked_at[neigh] == gen:
+                    continue
+                # closed cells already hold an optimal g (the heuristic is consistent), so this rejects them too
+                if seen[neigh] != gen or tentative_g < g[neigh]:
+                    if heuristic is None:
+                        h = abs(xs[neigh] - gx) + abs(ys[neigh] - gy)
+                    else:
+                        h = heuristic[neigh]
+                        if h < 0:
+                            continue
+                    seen[neigh] = gen
+                    g[neigh] = tentative_g
+                    parent[neigh] = current
+                    heappush(heap, (tentative_g + h) * size + neigh)
+                    pushed += 1
+
+        self.expanded, self.pushed = expanded, pushed
+        return []  # no path found
+
+    def search_xy(self, walls, start, goal, avoid_positions=None, heuristic=None):
+        """Same as search() but with (x, y) tuples in and out."""
+        h = self.height
+        blocked = None
+        if avoid_positions:
+            blocked = [x * h + y for x, y in avoid_positions]
+        path = self.search(walls, start[0] * h + start[1], goal[0] * h + goal[1], blocked, heuristic)
+        return [divmod(cell, h) for cell in path]
@@ -0,0 +1,160 @@
+"""
+Benchmark suite for the serial version.
+
+Generates seeded scenarios (see scenarios.py) and measures:
+  - astar() and jps(): per-query latency percentiles, node expansions/sec and heap pushes
+  - Simulation.plan(): full SPACE-triggered goal assignment + planning
+  - Simulation.step(): movement tick latency and ticks/sec
+  - per path planner (PLANNER in config.py): stuck-agent replans and makespan
+
+Results are written as JSON, e.g.
+    python serial_version/benchmark.py --kinds random maze --sizes 60x30 120x60 --out bench.json
+"""
+import argparse
+import itertools
+import json
+import platform
+import time
+import numpy as np
+from astar import astar, jps, flat_walls, get_jps
+from scenarios import GENERATORS, generate
+from maps import load_scenario
+from simulation import Simulation
+
+_VERSIONS = itertools.count()  # wall versions for bench_astar(), one per call so no cached map or jump table carries over
+
+def summarize(samples):
+    """Latency summary in seconds."""
+    if not samples:
+        return {"count": 0}
+    arr = np.asarray(samples, dtype=float)
+    return {
+        "count": int(arr.size),
+        "mean": float(arr.mean()),
+        "p50": float(np.percentile(arr, 50)),
+        "p90": float(np.percentile(arr, 90)),
+        "p99": float(np.percentile(arr, 99)),
+        "max": float(arr.max()),
+    }
+
+def bench_astar(scenario, queries, rng, search=astar):
+    walls = scenario["walls"].astype(bool)
+    # the walls never change: flatten them once, before the clock starts, and let every query reuse it
+    version = next(_VERSIONS)
+    flat = flat_walls(walls, version)
+    if search is jps:
+        # likewise the jump tables, so JPS and A* are timed on the searches alone
+        get_jps(*walls.shape).sync(flat, version)
+    agents, goals = scenario["agents"], scenario["goals"]
+    latencies = []
+    stats = {"expanded": 0, "pushed": 0}
+    found = 0
+    for _ in range(queries):
+        start = agents[int(rng.integers(len(agents)))]
+        goal = goals[int(rng.integers(len(goals)))]
+        t0 = time.perf_counter()
+        path = search(walls, start, goal, stats=stats, version=version)
+        latencies.append(time.perf_counter() - t0)
+        found += bool(path)
+    total = sum(latencies)
+    return {
+        "latency": summarize(latencies),
+        "found": found,
+        "expanded": stats["expanded"],
+        "pushed": stats["pushed"],
+        "expansions_per_sec": stats["expanded"] / total if total > 0 else 0.0,
+    }
+
+def bench_simulation(scenario, repeats, max_ticks, planner):
+    sim = Simulation(scenario["width"], scenario["height"], planner=planner)
+    plan_times = []
+    tick_times = []
+    ticks = 0
+    for _ in range(repeats):
+        sim.load(scenario["walls"], scenario["agents"], scenario["goals"])
+        sim.plan()
+        plan_times.append(sim.total_time_taken)
+
+        ticks = 0
+        while sim.moving and ticks < max_ticks:
+            t0 = time.perf_counter()
+            sim.step()
+            tick_times.append(time.perf_counter() - t0)
+            ticks += 1
+
+    total_tick_time = sum(tick_times)
+    return {
+        "plan": summarize(plan_times),
+        "tick": summarize(tick_times),
+        "ticks_per_run": ticks,
+        "ticks_per_sec": len(tick_times) / total_tick_time if total_tick_time > 0 else 0.0,
+        "replans": sim.replans,
+        "makespan": sim.makespan,
+        "finished": not sim.moving,
+        "metrics": sim.metrics.report(),
+    }
+
+def iter_scenarios(args):
+    """Generated scenarios for every kind, size and seed, then the map files."""
+    for kind in args.kinds:
+        for width, height in args.sizes:
+            for seed in args.seeds:
+                yield generate(kind, width, height, args.agents, args.goals, seed=seed)
+    for path in args.maps:
+        for seed in args.seeds:
+            yield load_scenario(path, n_agents=args.agents, n_goals=args.goals, seed=seed)
+
+def parse_size(text):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serial planner benchmarks")
+    parser.add_argument("--kinds", nargs="*", default=list(GENERATORS), choices=list(GENERATORS))
+    parser.add_argument("--maps", nargs="+", default=[],
+                        help="MovingAI .map or binary map files; agents come from MAP.scen if present")
+    parser.add_argument("--sizes", nargs="+", default=[(60, 30)], type=parse_size, help="WIDTHxHEIGHT")
+    parser.add_argument("--agents", type=int, default=20)
+    parser.add_argument("--goals", type=int, default=20)
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0])
+    parser.add_argument("--queries", type=int, default=200, help="random astar queries per scenario")
+    parser.add_argument("--repeats", type=int, default=3, help="plan/run repetitions per scenario")
+    parser.add_argument("--max-ticks", type=int, default=10000)
+    parser.add_argument("--planners", nargs="+", default=["astar", "cooperative"], choices=["astar", "cooperative", "cbs"])
+    parser.add_argument("--out", default=None, help="JSON output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    results = []
+    for scenario in iter_scenarios(args):
+        rng = np.random.default_rng(scenario["seed"])
+        entry = {
+            "scenario": scenario["name"],
+            "kind": scenario["kind"],
+            "width": scenario["width"],
+            "height": scenario["height"],
+            "seed": scenario["seed"],
+            "agents": len(scenario["agents"]),
+            "goals": len(scenario["goals"]),
+            "astar": bench_astar(scenario, args.queries, rng),
+            # same queries again
+            "jps": bench_astar(scenario, args.queries, np.random.default_rng(scenario["seed"]), jps),
+        }
+        entry["simulation"] = {planner: bench_simulation(scenario, args.repeats, args.max_ticks, planner)
+                               for planner in args.planners}
+        results.append(entry)
+
+    report = {
+        "version": "serial",
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
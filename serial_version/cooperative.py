@@ -0,0 +1,177 @@
+import heapq
+from distance_fields import descend
+
+class ReservationTable:
+    """
+    Space-time reservations for cooperative planning. States are encoded as
+    t * size + cell.
+
+    Besides plain vertex reservations it forbids following: an agent may not
+    enter a cell at t + 1 that another agent held at t, nor hold a cell at t
+    that another agent enters at t + 1. The movement tick processes agents
+    one after another and only lets an agent into a cell that is already
+    empty, so a plan that relies on following would stall there.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.occupied = set()  # (t * size + cell) held by some agent
+        self.entered = set()   # (t * size + cell) some agent moved into at t
+        self.parked = {}       # cell -> time an agent stops there for good
+        self.busy_until = {}   # cell -> last time any reservation touches it
+
+    def is_free(self, cell, t, moved):
+        """Can an agent hold cell at time t (having moved in at t if moved)?"""
+        size = self.size
+        park = self.parked.get(cell)
+        if park is not None and t >= park - 1:
+            return False
+        key = t * size + cell
+        if key in self.occupied or key + size in self.entered:
+            return False
+        if moved and key - size in self.occupied:
+            return False
+        return True
+
+    def can_stay(self, cell, t):
+        """Can an agent arriving at cell at time t stay there for good?"""
+        return cell not in self.parked and t >= self.busy_until.get(cell, -1)
+
+    def reserve(self, start, path, window, park):
+        """Reserve start at t=0 and path[i] at t=i+1, up to the window; park at the end if asked."""
+        size = self.size
+        prev = start
+        states = [start] + path
+        for t, cell in enumerate(states):
+            if t > window:
+                break
+            self.occupied.add(t * size + cell)
+            if cell != prev:
+                self.entered.add(t * size + cell)
+            if t > self.busy_until.get(cell, -1):
+                self.busy_until[cell] = t
+            prev = cell
+        if park and len(states) - 1 <= window:
+            self.parked[states[-1]] = len(states) - 1
+
+class CooperativePlanner:
+    """
+    Windowed cooperative A* (WHCA*, Silver 2005) on a 4-connected grid.
+
+    Agents are planned one after another in space-time against a shared
+    ReservationTable, with wait moves allowed. Reservations are only
+    honoured for the first `window` steps; the rest of each path follows the
+    goal's distance field, which is also the search heuristic (the exact
+    distance ignoring other agents). The caller replans every window / 2
+    ticks so the reserved part always covers the near future.
+    """
+
+    def __init__(self, walls, neighbors, fields, window=16):
+        """
+        walls: flat bytes-like wall map, read live
+        neighbors: flat neighbor table with 4 entries per cell, -1 for off-grid
+        fields: DistanceFieldCache synced to walls
+        """
+        self.walls = walls
+        self.neighbors = neighbors
+        self.fields = fields
+        self.window = window
+        self.expanded = 0  # space-time states expanded by the last plan()
+
+    def plan(self, starts, goals):
+        """
+        starts: flat start cell per agent
+        goals: flat goal cell per agent, or None for agents that stay put
+        returns: per agent, a list of cells from t=1 on (repeated cells are
+        waits), [] if it can stay where it is, None if no path exists.
+        An agent standing on its goal is still planned: it may have to step
+        aside to let another agent through.
+        """
+        size = len(self.walls)
+        table = ReservationTable(size)
+        paths = [None] * len(starts)
+        self.expanded = 0
+
+        # everyone's current cell is taken at t=0, so agents planned earlier
+        # cannot walk into an agent that has not been planned yet
+        for start in starts:
+            table.occupied.add(start)
+            table.busy_until.setdefault(start, 0)
+
+        # agents without a goal hold their cell for good
+        for start, goal in zip(starts, goals):
+            if goal is None:
+                table.reserve(start, [], self.window, park=True)
+
+        # farthest agents first: they have the least room to detour
+        movers = [i for i, g in enumerate(goals) if g is not None]
+        movers.sort(key=lambda i: -self.fields.distance(starts[i], goals[i]))
+        for i in movers:
+            path = self._search(table, starts[i], goals[i])
+            if path is None:
+                table.reserve(starts[i], [], self.window, park=True)
+            else:
+                table.reserve(starts[i], path, self.window, park=True)
+            paths[i] = path
+        return paths
+
+    def _search(self, table, start, goal):
+        field = self.fields.field(goal)
+        if field[start] < 0:
+            return None
+        walls, neighbors, window = self.walls, self.neighbors, self.window
+        size = len(walls)
+
+        # heap entries: (f, -t, cell); deeper states first on equal f
+        heap = [(field[start], 0, start)]
+        parent = {start: -1}
+        closed = set()
+        expanded = 0
+        end = None
+        while heap:
+            f, neg_t, cell = heapq.heappop(heap)
+            t = -neg_t
+            key = t * size + cell
+            if key in closed:
+                continue
+            closed.add(key)
+            expanded += 1
+
+            if cell == goal and table.can_stay(cell, t):
+                end = key
+                break
+            if t >= window:
+                end = key  # reservations end here; the field does the rest
+                break
+
+            nt = t + 1
+            base = cell * 4
+            for k in range(base - 1, base + 4):
+                nxt = cell if k < base else neighbors[k]  # k == base - 1 is the wait move
+                if nxt < 0 or walls[nxt]:
+                    continue
+                h = field[nxt]
+                if h < 0:
+                    continue
+                nkey = nt * size + nxt
+                if nkey in closed or nkey in parent:
+                    continue
+                if not table.is_free(nxt, nt, nxt != cell):
+                    continue
+                parent[nkey] = key
+                heapq.heappush(heap, (nt + h, -nt, nxt))
+
+        self.expanded += expanded
+        if end is None:
+            return None
+
+        path = []
+        key = end
+        while key != start:
+            path.append(key % size)
+            key = parent[key]
+        path.reverse()
+        last = end % size
+        if last != goal:
+            path.extend(descend(field, neighbors, last))
+        return path
@@ -0,0 +1,401 @@
+import heapq
+from collections import deque
+import numpy as np
+
+ENTRANCE_SPLIT = 6        # border openings at least this wide get a transition at each end
+_BFS_ROWS = 4096          # searches per batched BFS, bounds the scratch memory
+_ATTACH_CACHE = 1 << 16   # start/goal links kept between queries until the walls change
+
+def settle_claims(found, claimed):
+    """
+    One round of greedy exclusive goal assignment: every agent asked for its
+    nearest unclaimed goal, a goal wanted by several agents goes to the
+    closest one (the first in found on ties) and the others have to ask again.
+    found: {agent: (goal, cost)}, goal None if no unclaimed goal is reachable
+    claimed: set of goals already taken, updated in place
+    returns: ({agent: goal} settled this round, list of agents to ask again)
+    """
+    winner = {}
+    for agent, (goal, cost) in found.items():
+        if goal is not None and goal not in claimed:
+            if goal not in winner or cost < found[winner[goal]][1]:
+                winner[goal] = agent
+    claimed.update(winner)
+    settled = {agent: goal for goal, agent in winner.items()}
+    retry = [agent for agent, (goal, _) in found.items() if goal is not None and agent not in settled]
+    return settled, retry
+
+class HPAGraph:
+    """
+    Hierarchical path-finding A* (HPA*, Botea et al. 2004) over a flat wall
+    map (x * height + y, 1 = wall).
+
+    The grid is cut into square clusters. Along every border between two
+    clusters, each maximal opening of free cell pairs becomes one transition
+    (its middle), or two (its ends) if it is wide. The cells of a transition
+    are the abstract nodes; they are linked across the border with cost 1
+    and, inside each cluster, to every other node of the cluster with the
+    exact in-cluster distance. A query links start and goals into the graph
+    with an in-cluster BFS, searches the abstract graph and refines the
+    abstract path one segment at a time, so only the part that is walked
+    has to be expanded.
+
+    sync() takes the current walls and repairs only the clusters around the
+    cells that changed: their borders' transitions and the in-cluster edges
+    of them and their neighbors.
+    """
+
+    def __init__(self, width, height, cluster_size=16):
+        self.width = width
+        self.height = height
+        self.c = c = cluster_size
+        self.cols = -(-width // c)
+        self.rows = -(-height // c)
+        self.walls = None
+        self.blocks = None      # (clusters, c * c) uint8 walls per cluster, padding counts as wall
+        self.transitions = {}   # border -> list of (cell, cell across the border)
+        self.refs = {}          # node cell -> number of transitions it belongs to
+        self.members = {}       # cluster -> set of node cells
+        self.edges = {}         # node cell -> {node cell: cost}
+        self.expanded = 0       # abstract nodes expanded by the last query
+        self.attached = {}      # start/goal cell -> its links into the graph, see _attach
+
+        # in-cluster neighbor table over local cells lx * c + ly, -1 outside the cluster box
+        lx, ly = np.divmod(np.arange(c * c), c)
+        table = np.full((c * c, 4), -1, dtype=np.int64)
+        for k, (dx, dy) in enumerate(((0, 1), (1, 0), (-1, 0), (0, -1))):
+            nx, ny = lx + dx, ly + dy
+            ok = (nx >= 0) & (nx < c) & (ny >= 0) & (ny < c)
+            table[:, k] = np.where(ok, nx * c + ny, -1)
+        self.local_neighbors = table
+
+    # --- Geometry ---
+    def cluster_of(self, cell):
+        x, y = divmod(cell, self.height)
+        return (x // self.c) * self.rows + y // self.c
+
+    def _borders_of(self, cluster):
+        """Borders around a cluster: (axis, cx, cy) is the border between (cx, cy) and its +x (axis 0) or +y neighbor."""
+        cx, cy = divmod(cluster, self.rows)
+        borders = []
+        if cx + 1 < self.cols:
+            borders.append((0, cx, cy))
+        if cx > 0:
+            borders.append((0, cx - 1, cy))
+        if cy + 1 < self.rows:
+            borders.append((1, cx, cy))
+        if cy > 0:
+            borders.append((1, cx, cy - 1))
+        return borders
+
+    def _border_clusters(self, border):
+        axis, cx, cy = border
+        other = (cx + 1, cy) if axis == 0 else (cx, cy + 1)
+        return cx * self.rows + cy, other[0] * self.rows + other[1]
+
+    def _scan_border(self, border):
+        """Transitions of one border under the current walls."""
+        axis, cx, cy = border
+        c, h, walls = self.c, self.height, self.walls
+        if axis == 0:
+            x = cx * c + c - 1
+            lo, hi = cy * c, min(cy * c + c, h)
+            pairs = [(x * h + y, (x + 1) * h + y) for y in range(lo, hi)]
+        else:
+            y = cy * c + c - 1
+            lo, hi = cx * c, min(cx * c + c, self.width)
+            pairs = [(x * h + y, x * h + y + 1) for x in range(lo, hi)]
+
+        transitions = []
+        run = []
+        for a, b in pairs + [(None, None)]:
+            if a is not None and not walls[a] and not walls[b]:
+                run.append((a, b))
+                continue
+            if run:
+                if len(run) >= ENTRANCE_SPLIT:
+                    transitions.append(run[0])
+                    transitions.append(run[-1])
+                else:
+                    transitions.append(run[len(run) // 2])
+                run = []
+        return transitions
+
+    # --- Building and repair ---
+    def sync(self, walls):
+        """
+        Bring the abstraction up to date with walls (flat, 1 = wall).
+        returns: number of cells that changed since the last sync
+        """
+        walls = np.frombuffer(bytes(walls), dtype=np.uint8) if not isinstance(walls, np.ndarray) \
+            else np.ascontiguousarray(walls, dtype=np.uint8).reshape(-1)
+        c = self.c
+        if self.walls is None:
+            self.walls = walls.copy()
+            padded = np.ones((self.cols * c, self.rows * c), dtype=np.uint8)
+            padded[:self.width, :self.height] = walls.reshape(self.width, self.height)
+            self.blocks = padded.reshape(self.cols, c, self.rows, c).transpose(0, 2, 1, 3) \
+                .reshape(self.cols * self.rows, c * c).copy()
+            self._build()
+            return walls.size
+        changed = np.flatnonzero(walls != self.walls)
+        if changed.size:
+            self.walls = walls.copy()
+            self.attached.clear()
+            xs, ys = np.divmod(changed, self.height)
+            self.blocks[(xs // c) * self.rows + ys // c, (xs % c) * c + ys % c] = walls[changed]
+            self.update_cells(changed.tolist())
+        return int(changed.size)
+
+    def _build(self):
+        self.transitions.clear()
+        self.refs.clear()
+        self.members.clear()
+        self.edges.clear()
+        for cx in range(self.cols):
+            for cy in range(self.rows):
+                if cx + 1 < self.cols:
+                    self._add_border((0, cx, cy))
+                if cy + 1 < self.rows:
+                    self._add_border((1, cx, cy))
+        self._link_clusters(range(self.cols * self.rows))
+
+    def update_cells(self, cells):
+        """Repair the abstraction around cells whose wall state changed (self.walls must be current)."""
+        dirty = {self.cluster_of(cell) for cell in cells}
+        borders = {border for cluster in dirty for border in self._borders_of(cluster)}
+        relink = set(dirty)
+        for border in borders:
+            relink.update(self._border_clusters(border))
+            self._remove_border(border)
+        for border in borders:
+            self._add_border(border)
+        self._link_clusters(relink)
+
+    def _add_border(self, border):
+        transitions = self._scan_border(border)
+        self.transitions[border] = transitions
+        for a, b in transitions:
+            for cell in (a, b):
+                if cell not in self.refs:
+                    self.refs[cell] = 0
+                    self.edges[cell] = {}
+                    self.members.setdefault(self.cluster_of(cell), set()).add(cell)
+                self.refs[cell] += 1
+            self.edges[a][b] = 1
+            self.edges[b][a] = 1
+
+    def _remove_border(self, border):
+        for a, b in self.transitions.pop(border, ()):
+            self.edges[a].pop(b, None)
+            self.edges[b].pop(a, None)
+            for cell in (a, b):
+                self.refs[cell] -= 1
+                if not self.refs[cell]:
+                    del self.refs[cell]
+                    for other in self.edges.pop(cell):
+                        self.edges[other].pop(cell, None)
+                    self.members[self.cluster_of(cell)].discard(cell)
+
+    def _link_clusters(self, clusters):
+        """Recompute the in-cluster edges of the given clusters."""
+        sources = []
+        for cluster in clusters:
+            nodes = self.members.get(cluster)
+            if not nodes:
+                continue
+            for u in nodes:
+                edges = self.edges[u]
+                for v in [v for v in edges if v in nodes]:
+                    del edges[v]
+            sources.extend(nodes)
+        layout = {}   # cluster -> (nodes, their local cells)
+        for u, dist in zip(sources, self._cluster_bfs(sources)):
+            cluster = self.cluster_of(u)
+            if cluster not in layout:
+                nodes = list(self.members[cluster])
+                layout[cluster] = nodes, np.array([self._local(v) for v in nodes], dtype=np.int64)
+            nodes, local = layout[cluster]
+            edges = self.edges[u]
+            for v, d in zip(nodes, dist[local].tolist()):
+                if d > 0:
+                    edges[v] = d
+
+    def _local(self, cell):
+        x, y = divmod(cell, self.height)
+        return (x % self.c) * self.c + y % self.c
+
+    def _cluster_bfs(self, sources):
+        """
+        In-cluster BFS from every source at once, one wavefront per distance
+        level for all of them together (see distance_fields.bfs_distance_fields).
+        yields: per source, an int32 array of distances over its cluster's
+            local cells (lx * c + ly), -1 where unreachable
+        """
+        c, h = self.c, self.height
+        cc = c * c
+        blocks = self.blocks.reshape(-1)
+        table = self.local_neighbors
+        for first in range(0, len(sources), _BFS_ROWS):
+            batch = sources[first:first + _BFS_ROWS]
+            n = len(batch)
+            xs, ys = np.divmod(np.asarray(batch, dtype=np.int64), h)
+            base = ((xs // c) * self.rows + ys // c) * cc   # row -> its cluster's offset in blocks
+            dist = np.full(n * cc, -1, dtype=np.int32)
+            stamp = np.empty(n * cc, dtype=np.int64)   # dedupes a wavefront without sorting it
+            frontier = np.arange(n, dtype=np.int64) * cc + (xs % c) * c + ys % c
+            dist[frontier] = 0
+            d = 0
+            while frontier.size:
+                d += 1
+                row, local = np.divmod(frontier, cc)
+                cand = table[local]                                   # (F, 4)
+                inside = cand >= 0
+                row = np.broadcast_to(row[:, None], cand.shape)[inside]
+                cand = cand[inside]
+                ok = blocks[base[row] + cand] == 0
+                keys = row[ok] * cc + cand[ok]
+                keys = keys[dist[keys] < 0]
+                order = np.arange(keys.size)
+                stamp[keys] = order
+                keys = keys[stamp[keys] == order]
+                dist[keys] = d
+                frontier = keys
+            yield from dist.reshape(n, cc)
+
+    # --- Queries ---
+    def _attach(self, cells):
+        """In-cluster costs from each cell to the nodes of its cluster: list of {node: cost}."""
+        attached = self.attached
+        missing = [cell for cell in dict.fromkeys(cells) if cell not in attached]
+        if len(attached) + len(missing) > _ATTACH_CACHE:
+            attached.clear()
+            missing = list(dict.fromkeys(cells))
+        for cell, dist in zip(missing, self._cluster_bfs(missing)):
+            nodes = self.members.get(self.cluster_of(cell), ())
+            attached[cell] = {v: int(dist[self._local(v)]) for v in nodes if dist[self._local(v)] >= 0}
+        return [attached[cell] for cell in cells]
+
+    def nearest(self, start, goals):
+        """
+        Abstract path from start to the closest reachable goal (the first
+        given wins ties between goals found at the same cost).
+        returns: (goal, cost, abstract path as cells from start to goal) or (None, -1, None)
+        """
+        walls = self.walls
+        goals = [g for g in dict.fromkeys(goals) if not walls[g]]
+        self.expanded = 0
+        if walls[start] or not goals:
+            return None, -1, None
+        if start in goals:
+            return start, 0, [start]
+
+        # link start and goals into the graph for this query only
+        start_cluster = self.cluster_of(start)
+        start_links = self._attach([start])[0] if start not in self.edges else {}
+        goal_links = {}   # node -> [(goal, cost)]
+        direct = {}       # goal in start's cluster -> in-cluster cost from start
+        outside = [g for g in goals if g not in self.edges]   # goals that are nodes are found as they are
+        for goal, links in zip(outside, self._attach(outside)):
+            for v, cost in links.items():
+                goal_links.setdefault(v, []).append((goal, cost))
+        near = [g for g in goals if self.cluster_of(g) == start_cluster]
+        if near:
+            start_dist = next(self._cluster_bfs([start]))
+            for goal in near:
+                d = start_dist[self._local(goal)]
+                if d >= 0:
+                    direct[goal] = int(d)
+        goal_set = set(goals)
+
+        # query-only edges: start to its cluster's nodes and near goals, nodes to goals
+        extra = goal_links
+        extra.setdefault(start, []).extend(list(start_links.items()) + list(direct.items()))
+
+        # Manhattan heuristic for a single goal, plain Dijkstra for several
+        h = self.height
+        single = len(goals) == 1
+        gx, gy = divmod(goals[0], h)
+        edges = self.edges
+        empty = {}
+        heappush, heappop = heapq.heappush, heapq.heappop
+
+        # entries are (f, order, cell); order keeps ties in insertion order
+        best = {start: 0}
+        parent = {start: None}
+        heap = [(0, 0, start)]
+        order = 1
+        closed = set()
+        expanded = 0
+        while heap:
+            _, _, u = heappop(heap)
+            if u in closed:
+                continue
+            closed.add(u)
+            expanded += 1
+            g = best[u]
+            if u in goal_set:
+                self.expanded = expanded
+                path = [u]
+                while parent[path[-1]] is not None:
+                    path.append(parent[path[-1]])
+                path.reverse()
+                return u, g, path
+
+            for succ in (edges.get(u, empty).items(), extra.get(u, ())):
+                for v, cost in succ:
+                    nd = g + cost
+                    if nd < best.get(v, nd + 1):
+                        best[v] = nd
+                        parent[v] = u
+                        if single:
+                            x, y = divmod(v, h)
+                            nd += abs(x - gx) + abs(y - gy)
+                        heappush(heap, (nd, order, v))
+                        order += 1
+        self.expanded = expanded
+        return None, -1, None
+
+    def refine(self, abstract):
+        """
+        Lazily expand an abstract path into grid cells, one segment at a
+        time. Yields flat cells from the start's next step to the goal.
+        """
+        for u, v in zip(abstract, abstract[1:]):
+            if self.cluster_of(u) != self.cluster_of(v):
+                yield v   # across a border: the two cells are neighbors
+            else:
+                yield from self._segment(u, v)
+
+    def _segment(self, u, v):
+        """Shortest in-cluster path from u to v (cells after u, up to v)."""
+        h, c = self.height, self.c
+        walls = self.walls
+        ux, uy = divmod(u, h)
+        x0, y0 = ux - ux % c, uy - uy % c
+        x1, y1 = min(x0 + c, self.width), min(y0 + c, h)
+        parent = {u: None}
+        queue = deque([u])
+        while queue:
+            cell = queue.popleft()
+            if cell == v:
+                break
+            x, y = divmod(cell, h)
+            for nx, ny in ((x, y + 1), (x + 1, y), (x - 1, y), (x, y - 1)):
+                if x0 <= nx < x1 and y0 <= ny < y1:
+                    nxt = nx * h + ny
+                    if nxt not in parent and not walls[nxt]:
+                        parent[nxt] = cell
+                        queue.append(nxt)
+        path = []
+        cell = v
+        while cell != u:
+            path.append(cell)
+            cell = parent[cell]
+        path.reverse()
+        return path
+
+    def path(self, start, goal):
+        """Path as flat cells from start's next step to goal ([] if unreachable or start == goal)."""
+        _, _, abstract = self.nearest(start, [goal])
+        return list(self.refine(abstract)) if abstract else []
@@ -1,4 +1,9 @@
-from sim import simulate
+from config import Config
+from sim import simulate, replay
 
 if __name__ == "__main__":
-    simulate()
+    config = Config.from_args()
+    if config.replay_file:
+        replay(config)
+    else:
+        simulate(config)
@@ -0,0 +1,157 @@
+"""
+Map files.
+
+  - MovingAI benchmark maps (.map) and scenarios (.scen), see
+    https://movingai.com/benchmarks/formats.html
+  - a native binary map: a 32-byte header followed by the walls exactly as
+    Simulation.walls holds them (uint8, x * height + y, 1 = wall), so a map
+    is np.memmap-ed instead of parsed and copied into place in one go
+
+Every loader returns a (width, height) uint8 wall map indexed walls[x, y],
+like the generators in scenarios.py. MovingAI x is the column and y the row,
+which are the simulation's x and y as well.
+
+Convert a map once with
+    python serial_version/maps.py maps/den520d.map maps/den520d.grid
+"""
+import argparse
+import os
+import struct
+import numpy as np
+from scenarios import place
+
+BINARY_MAGIC = b"IMAPGRID"
+BINARY_VERSION = 1
+_HEADER = struct.Struct("<8sIIQQ")   # magic, version, reserved, width, height
+BINARY_OFFSET = _HEADER.size         # 32, keeps the cells 8-byte aligned
+
+# MovingAI terrain: '.', 'G' (ground) and 'S' (swamp) are passable; '@', 'O'
+# (out of bounds), 'T' (trees) and 'W' (water) are walls on a 4-connected grid
+_PASSABLE = np.ones(256, dtype=np.uint8)
+for _c in b".GS":
+    _PASSABLE[_c] = 0
+
+# --- MovingAI ---
+def read_movingai_map(path):
+    """Parse a MovingAI .map file. Returns the (width, height) uint8 wall map."""
+    with open(path, "rb") as f:
+        data = f.read()
+    lines = data.replace(b"\r", b"").split(b"\n")
+    header = {}
+    for i, line in enumerate(lines):
+        if line.strip() == b"map":
+            body = lines[i + 1:]
+            break
+        key, _, value = line.strip().partition(b" ")
+        header[key.decode()] = value.decode()
+    else:
+        raise ValueError(f"{path}: no 'map' line")
+    width, height = int(header["width"]), int(header["height"])
+    rows = [line[:width].ljust(width, b"@") for line in body[:height]]
+    if len(rows) < height:
+        raise ValueError(f"{path}: {len(rows)} rows, expected {height}")
+    chars = np.frombuffer(b"".join(rows), dtype=np.uint8).reshape(height, width)
+    return np.ascontiguousarray(_PASSABLE[chars].T)
+
+def read_movingai_scen(path):
+    """
+    Parse a MovingAI .scen file.
+    returns: list of ((start x, start y), (goal x, goal y), optimal length), in file order
+    """
+    entries = []
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) < 9 or fields[0] == "version":
+                continue
+            # bucket, map, map width, map height, start x, start y, goal x, goal y, optimal length
+            sx, sy, gx, gy = (int(v) for v in fields[-5:-1])
+            entries.append(((sx, sy), (gx, gy), float(fields[-1])))
+    return entries
+
+# --- Native binary maps ---
+def write_binary_map(path, walls):
+    """Write a (width, height) wall map in the native binary format."""
+    walls = np.ascontiguousarray(walls, dtype=np.uint8)
+    width, height = walls.shape
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, 0, width, height))
+        f.write((walls != 0).astype(np.uint8).tobytes())
+
+def open_binary_map(path):
+    """Memory-map a native binary map read-only. Returns a (width, height) uint8 np.memmap."""
+    with open(path, "rb") as f:
+        magic, version, _, width, height = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError(f"{path}: not a binary map (version {BINARY_VERSION})")
+    return np.memmap(path, dtype=np.uint8, mode="r", offset=BINARY_OFFSET, shape=(width, height))
+
+def read_map(path):
+    """A MovingAI .map or a native binary map, told apart by the file's first bytes."""
+    with open(path, "rb") as f:
+        binary = f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+    return open_binary_map(path) if binary else read_movingai_map(path)
+
+# --- Scenarios ---
+def load_scenario(map_path, scen_path=None, n_agents=None, n_goals=None, seed=0):
+    """
+    Build a scenario (same dict as scenarios.generate) from a map file.
+    scen_path: MovingAI .scen; agents start at its starts and the goals are its
+        goals, in file order (None: map_path + ".scen" if that exists, otherwise
+        agents and goals are placed at random like the generators do)
+    n_agents: number of scenario entries or random agents to use (None = all
+        entries, or 20 random agents)
+    n_goals: random goals to place (default n_agents); ignored with a .scen
+    """
+    walls = read_map(map_path)
+    width, height = walls.shape
+    if scen_path is None and os.path.exists(map_path + ".scen"):
+        scen_path = map_path + ".scen"
+
+    if scen_path is not None:
+        agents, goals = [], []
+        used_starts, used_goals = set(), set()
+        for start, goal, _ in read_movingai_scen(scen_path):
+            if n_agents is not None and len(agents) >= n_agents:
+                break
+            # agents need distinct free cells, and so do goals
+            if start in used_starts or goal in used_goals or not _free(walls, start) or not _free(walls, goal):
+                continue
+            used_starts.add(start)
+            used_goals.add(goal)
+            agents.append(start)
+            goals.append(goal)
+        kind = "scen"
+    else:
+        n_agents = 20 if n_agents is None else n_agents
+        agents, goals = place(walls, n_agents, n_agents if n_goals is None else n_goals,
+                              np.random.default_rng(seed))
+        kind = "map"
+
+    name = os.path.splitext(os.path.basename(map_path))[0]
+    return {
+        "name": f"{name}-a{len(agents)}-s{seed}",
+        "kind": kind,
+        "width": width,
+        "height": height,
+        "seed": seed,
+        "walls": walls,
+        "agents": agents,
+        "goals": goals,
+    }
+
+def _free(walls, pos):
+    x, y = pos
+    return 0 <= x < walls.shape[0] and 0 <= y < walls.shape[1] and not walls[x, y]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a MovingAI .map to the native binary map format")
+    parser.add_argument("source", help=".map file")
+    parser.add_argument("target", help="binary map file to write")
+    args = parser.parse_args(argv)
+    walls = read_map(args.source)
+    write_binary_map(args.target, walls)
+    print(f"{args.target}: {walls.shape[0]}x{walls.shape[1]}, {int(np.count_nonzero(walls))} walls")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import csv
+import json
+import time
+from collections import deque
+import numpy as np
+
+WINDOW = 1024  # recent samples kept per timer for the percentiles
+
+class Metrics:
+    """
+    Timers and counters for the hot paths (planning, replanning, movement,
+    pool round trips, rendering).
+
+    A timer keeps a running count and total plus its last WINDOW samples, so
+    percentiles describe recent behavior (what the HUD shows) while the
+    totals cover the whole run. Time with
+
+        with metrics.timer("step"): ...
+
+    or, in loops where a context manager is too heavy, with
+    metrics.record(name, seconds) around time.perf_counter() calls.
+    """
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.samples = {}    # timer -> deque of recent seconds
+        self.totals = {}     # timer -> [count, total seconds, max seconds]
+        self.counters = {}   # counter -> value
+        self.workers = {}    # worker id -> {counter: value}, reported by the pool
+        self.started = time.perf_counter()
+
+    def reset(self):
+        self.samples.clear()
+        self.totals.clear()
+        self.counters.clear()
+        self.workers.clear()
+        self.started = time.perf_counter()
+
+    # --- Recording ---
+    def record(self, name, seconds):
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.window)
+            self.totals[name] = [0, 0.0, 0.0]
+        samples.append(seconds)
+        total = self.totals[name]
+        total[0] += 1
+        total[1] += seconds
+        if seconds > total[2]:
+            total[2] = seconds
+
+    def timer(self, name):
+        """Context manager recording the time spent in its block under name."""
+        return _Timer(self, name)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_worker(self, worker, stats):
+        """Add one batch's worth of a worker's counters (see multiprocessing_worker.run_batch)."""
+        totals = self.workers.setdefault(worker, {})
+        for key, value in stats.items():
+            totals[key] = totals.get(key, 0) + value
+
+    # --- Reading ---
+    def percentile(self, name, q):
+        """q-th percentile of the recent samples of a timer in seconds (None before the first)."""
+        samples = self.samples.get(name)
+        if not samples:
+            return None
+        return float(np.percentile(np.fromiter(samples, dtype=float, count=len(samples)), q))
+
+    def summary(self, name):
+        count, total, worst = self.totals[name]
+        recent = np.fromiter(self.samples[name], dtype=float, count=len(self.samples[name]))
+        return {
+            "count": count,
+            "total": total,
+            "mean": total / count,
+            "p50": float(np.percentile(recent, 50)),
+            "p99": float(np.percentile(recent, 99)),
+            "max": worst,
+        }
+
+    def hud_text(self, names):
+        """One line of "name p50/p99 ms" for the timers in names that have samples (for the HUD)."""
+        parts = []
+        for name in names:
+            samples = self.samples.get(name)
+            if samples:
+                p50, p99 = np.percentile(np.fromiter(samples, dtype=float, count=len(samples)), [50, 99])
+                parts.append(f"{name} {p50 * 1000:.2f}/{p99 * 1000:.2f}")
+        return "p50/p99 ms: " + "   ".join(parts) if parts else ""
+
+    def report(self):
+        """Everything recorded so far, as plain data."""
+        return {
+            "elapsed": time.perf_counter() - self.started,
+            "timers": {name: self.summary(name) for name in sorted(self.totals)},
+            "counters": dict(sorted(self.counters.items())),
+            "workers": {str(worker): dict(stats) for worker, stats in sorted(self.workers.items())},
+        }
+
+    # --- Export ---
+    def export(self, path):
+        """Write report() to path, as CSV if it ends in .csv and as JSON otherwise."""
+        if path.endswith(".csv"):
+            self.to_csv(path)
+        else:
+            self.to_json(path)
+
+    def to_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def to_csv(self, path):
+        """One row per timer, counter and worker counter: kind, name, then the summary fields."""
+        report = self.report()
+        fields = ["count", "total", "mean", "p50", "p99", "max"]
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["kind", "name"] + fields + ["value"])
+            for name, summary in report["timers"].items():
+                writer.writerow(["timer", name] + [summary[key] for key in fields] + [""])
+            for name, value in report["counters"].items():
+                writer.writerow(["counter", name] + [""] * len(fields) + [value])
+            for worker, stats in report["workers"].items():
+                for name, value in stats.items():
+                    writer.writerow(["worker", f"{worker}.{name}"] + [""] * len(fields) + [value])
+
+class _Timer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.name, time.perf_counter() - self.start)
+        return False
@@ -1,75 +1,188 @@
+import numpy as np
 import pygame
-from config import *
-
-def draw_grid(screen, grid):
-    for x in range(GRID_SIZE_X):
-        for y in range(GRID_SIZE_Y):
-            rect = pygame.Rect(x * CELL_SIZE_X, y * CELL_SIZE_Y, CELL_SIZE_X, CELL_SIZE_Y)
-            color = WHITE if grid[x][y].wall else BLACK
-            pygame.draw.rect(screen, color, rect)
-            pygame.draw.rect(screen, GRAY, rect, 1)
-
-def draw_elements(screen, agents, goals):
-    for goal in goals:
-        rect = pygame.Rect(goal.x * CELL_SIZE_X, goal.y * CELL_SIZE_Y, CELL_SIZE_X, CELL_SIZE_Y)
-        pygame.draw.rect(screen, GREEN, rect)
-
-    for agent in agents:
-        path = agent.get("path")
-        if path is not None:
-            for node in path:
-                node_pos = (node.x, node.y)
-                agent_positions = set(a["pos"] for a in agents)
-                goal_positions = set((g.x, g.y) for g in goals)
-                if node_pos in agent_positions or node_pos in goal_positions:
-                    continue
-                rect = pygame.Rect(node.x * CELL_SIZE_X, node.y * CELL_SIZE_Y, CELL_SIZE_X, CELL_SIZE_Y)
-                pygame.draw.rect(screen, BLUE, rect)
-
-    for agent in agents:
-        px, py = agent["pos"]
-        if any(px == g.x and py == g.y for g in goals):
-            color = GRAY
-        elif agent.get("wait", 0) > 0:
-            color = YELLOW
-        else:
-            color = RED
-
-        rect = pygame.Rect(px * CELL_SIZE_X, py * CELL_SIZE_Y, CELL_SIZE_X, CELL_SIZE_Y)
-        pygame.draw.rect(screen, color, rect)
-
-def draw_text(screen, total_time_taken, wall_mode, agents, goals):
-    if total_time_taken is not None:
-        text_surface = font_medium.render(f"Total Time: {total_time_taken:.8f} sec", True, BLACK)
-        screen.blit(text_surface, (10, HEIGHT + 20))
-
-    if wall_mode:
-        wall_text = f"Wall Mode: Place"
-    else:
-        wall_text = f"Wall Mode: Remove"
-    wall_surface = font_small.render(wall_text, True, BLACK)
-    name1 = font_small.render("Anush Bundel 2023BCS0005", True, BLACK)
-    name2 = font_small.render("Ankush 2023BCS0131", True, BLACK)
-
-    num_agents = len(agents)
-    num_goals = len(goals)
-    moving_agents = sum(1 for a in agents if a.get("path"))
-    waiting_agents = sum(1 for a in agents if a.get("wait", 0) > 0)
-
-    stats_texts = [
-        f"Agents: {num_agents}",
-        f"Goals: {num_goals}",
-        f"Moving: {moving_agents}",
-        f"Waiting: {waiting_agents}"
-    ]
-
-    x_offset = WIDTH - 1150
-    y_offset = HEIGHT + 23
-    spacing = 130
-    for i, txt in enumerate(stats_texts):
-        stat_surface = font_small.render(txt, True, BLACK)
-        screen.blit(stat_surface, (x_offset + i*spacing, y_offset))
-
-    screen.blit(name1, (WIDTH - 380, HEIGHT + 10))
-    screen.blit(name2, (WIDTH - 380, HEIGHT + 35))
-    screen.blit(wall_surface, (WIDTH - 620, HEIGHT + 23))
\ No newline at end of file
+from config import Config, WHITE, BLACK, BLUE, GREEN, RED, YELLOW, GRAY
+
+# overlay colors by code; 0 = nothing over the static surface
+_PATH, _GOAL, _AT_GOAL, _WAITING, _AGENT = 1, 2, 3, 4, 5
+_PALETTE = [None, BLUE, GREEN, GRAY, YELLOW, RED]
+
+class Renderer:
+    """
+    Frame renderer that only redraws what changed.
+
+    - Walls and grid lines are drawn once onto a cached static surface; a
+      wall edit only redraws the edited cells there.
+    - Goals, paths and agents form an overlay (a color code per cell) built
+      with a few array writes per frame; cells whose code changed since the
+      last frame are restored from the static surface and repainted.
+    - Only those cells (and the text panel, when its contents change) are
+      pushed with pygame.display.update(dirty_rects) instead of flip().
+    """
+
+    def __init__(self, screen, font_small, font_medium, config=None):
+        """config: Config with the grid and window sizes (default: the constants in config.py)"""
+        config = config or Config()
+        self.screen = screen
+        self.font_small = font_small
+        self.font_medium = font_medium
+        self.grid_w, self.grid_h = config.grid_size_x, config.grid_size_y
+        self.cell_w, self.cell_h = config.cell_size_x, config.cell_size_y
+        # the text panel starts below the grid
+        self.width, self.height = config.width, self.grid_h * self.cell_h
+        self.static = pygame.Surface((self.grid_w * self.cell_w, self.grid_h * self.cell_h))
+        self.walls = None       # wall map the static surface was drawn from
+        self.overlay = None     # color code per cell painted over the static surface last frame
+        self.text_key = None    # text panel contents drawn last frame
+        self.full_redraw = True
+
+    def invalidate(self):
+        """Repaint the whole window on the next frame (e.g. after a resize)."""
+        self.full_redraw = True
+
+    def cell_rect(self, x, y):
+        return pygame.Rect(x * self.cell_w, y * self.cell_h, self.cell_w, self.cell_h)
+
+    def cell_at(self, px, py):
+        """Grid cell under a window pixel."""
+        return px // self.cell_w, py // self.cell_h
+
+    def _draw_static_cell(self, x, y, wall):
+        rect = self.cell_rect(x, y)
+        pygame.draw.rect(self.static, WHITE if wall else BLACK, rect)
+        if self.cell_w > 2 and self.cell_h > 2:
+            pygame.draw.rect(self.static, GRAY, rect, 1)
+
+    def _draw_static(self, walls):
+        """Paint every cell at once through a pixel array (large maps have millions of cells)."""
+        cw, ch = self.cell_w, self.cell_h
+        colors = np.where(walls.reshape(self.grid_w, self.grid_h, 1) != 0,
+                          np.array(WHITE, dtype=np.uint8), np.array(BLACK, dtype=np.uint8))
+        pixels = np.repeat(np.repeat(colors, cw, axis=0), ch, axis=1)
+        if cw > 2 and ch > 2:
+            # one pixel grid line around every cell, as drawn by _draw_static_cell
+            px = np.arange(pixels.shape[0]) % cw
+            py = np.arange(pixels.shape[1]) % ch
+            edge = ((px == 0) | (px == cw - 1))[:, None] | ((py == 0) | (py == ch - 1))[None, :]
+            pixels[edge] = GRAY
+        pygame.surfarray.blit_array(self.static, pixels)
+
+    def _sync_static(self, walls):
+        """Bring the static surface up to date with walls; returns the edited (x, y) cells."""
+        walls = np.frombuffer(walls, dtype=np.uint8)
+        if self.walls is None:
+            self._draw_static(walls)
+            self.walls = walls.copy()
+            self.full_redraw = True
+            return []
+
+        changed = np.flatnonzero(walls != self.walls)
+        edited = []
+        for cell in changed.tolist():
+            x, y = divmod(cell, self.grid_h)
+            self._draw_static_cell(x, y, walls[cell])
+            edited.append((x, y))
+        self.walls[changed] = walls[changed]
+        return edited
+
+    def _build_overlay(self, agents, goals):
+        """agents: AgentStore, goals: flat goal cells; returns the uint8 color code of every cell (see _PALETTE)"""
+        h = self.grid_h
+        overlay = np.zeros(self.grid_w * h, dtype=np.uint8)
+        goal_cells = np.asarray(goals, dtype=np.int64)
+        # later layers paint over earlier ones: paths, then goals, then agents
+        overlay[agents.path_cells()] = _PATH
+        overlay[goal_cells] = _GOAL
+        cells = agents.cell
+        overlay[cells] = np.where(overlay[cells] == _GOAL, _AT_GOAL, np.where(agents.wait > 0, _WAITING, _AGENT))
+        return overlay
+
+    def _draw_text(self, total_time_taken, wall_mode, agents, goals, hud=None, speed=None):
+        """Redraw the text panel if its contents changed; returns its rect, or None if unchanged."""
+        moving_agents = int(np.count_nonzero(agents.moving))
+        waiting_agents = int(np.count_nonzero(agents.wait))
+        key = (total_time_taken, wall_mode, len(agents), len(goals), moving_agents, waiting_agents, hud, speed)
+        if key == self.text_key and not self.full_redraw:
+            return None
+        self.text_key = key
+
+        screen = self.screen
+        width, height = self.width, self.height
+        panel = pygame.Rect(0, height, screen.get_width(), max(0, screen.get_height() - height))
+        screen.fill(WHITE, panel)
+
+        if total_time_taken is not None:
+            text_surface = self.font_medium.render(f"Total Time: {total_time_taken:.8f} sec", True, BLACK)
+            screen.blit(text_surface, (10, height + 20))
+
+        wall_text = "Wall Mode: Place" if wall_mode else "Wall Mode: Remove"
+        wall_surface = self.font_small.render(wall_text, True, BLACK)
+        name1 = self.font_small.render("Anush Bundel 2023BCS0005", True, BLACK)
+        name2 = self.font_small.render("Ankush 2023BCS0131", True, BLACK)
+
+        stats_texts = [
+            f"Agents: {len(agents)}",
+            f"Goals: {len(goals)}",
+            f"Moving: {moving_agents}",
+            f"Waiting: {waiting_agents}"
+        ]
+
+        x_offset = width - 1150
+        y_offset = height + 23
+        spacing = 130
+        for i, txt in enumerate(stats_texts):
+            stat_surface = self.font_small.render(txt, True, BLACK)
+            screen.blit(stat_surface, (x_offset + i * spacing, y_offset))
+
+        screen.blit(name1, (width - 380, height + 10))
+        screen.blit(name2, (width - 380, height + 35))
+        screen.blit(wall_surface, (width - 620, height + 23))
+
+        if speed:
+            screen.blit(self.font_small.render(speed, True, BLACK), (10, height + 60))
+        if hud:
+            screen.blit(self.font_small.render(hud, True, BLACK), (10, height + 95))
+        return panel
+
+    def draw(self, walls, agents, goals, total_time_taken, wall_mode, hud=None, speed=None):
+        """
+        Draw one frame and push it to the display.
+        walls: flat wall map (x * grid height + y, 1 = wall), e.g. Simulation.walls
+        agents: AgentStore
+        goals: flat goal cells, e.g. Simulation.goals
+        hud: performance line shown under the panel (see metrics.Metrics.hud_text), None = hidden
+        speed: tick rate line shown under the panel (see timestep.Timestep.status), None = hidden
+        """
+        screen = self.screen
+        edited = self._sync_static(walls)
+        overlay = self._build_overlay(agents, goals)
+
+        if self.full_redraw:
+            screen.fill(WHITE)
+            screen.blit(self.static, (0, 0))
+            for cell in np.flatnonzero(overlay).tolist():
+                pygame.draw.rect(screen, _PALETTE[overlay[cell]], self.cell_rect(*divmod(cell, self.grid_h)))
+            self._draw_text(total_time_taken, wall_mode, agents, goals, hud, speed)
+            self.overlay = overlay
+            self.full_redraw = False
+            pygame.display.update()
+            return
+
+        changed = set(np.flatnonzero(overlay != self.overlay).tolist())
+        changed.update(x * self.grid_h + y for x, y in edited)
+
+        dirty = []
+        for cell in changed:
+            rect = self.cell_rect(*divmod(cell, self.grid_h))
+            screen.blit(self.static, rect, rect)
+            code = overlay[cell]
+            if code:
+                pygame.draw.rect(screen, _PALETTE[code], rect)
+            dirty.append(rect)
+
+        panel = self._draw_text(total_time_taken, wall_mode, agents, goals, hud, speed)
+        if panel is not None:
+            dirty.append(panel)
+
+        self.overlay = overlay
+        if dirty:
+            pygame.display.update(dirty)
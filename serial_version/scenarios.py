@@ -0,0 +1,102 @@
+import numpy as np
+
+# Seeded scenario generators used by the benchmarks.
+# Every generator returns a (width, height) uint8 wall map indexed walls[x, y]
+# (1 = wall, 0 = free), matching the layout used by astar and the workers.
+
+def random_obstacles(width, height, rng, density=0.2):
+    """Independent random walls with the given fill density."""
+    return (rng.random((width, height)) < density).astype(np.uint8)
+
+def maze(width, height, rng):
+    """Perfect maze carved by an iterative randomized depth-first search."""
+    walls = np.ones((width, height), dtype=np.uint8)
+    cells_x, cells_y = (width - 1) // 2, (height - 1) // 2
+    if cells_x < 1 or cells_y < 1:
+        return np.zeros((width, height), dtype=np.uint8)
+
+    visited = np.zeros((cells_x, cells_y), dtype=bool)
+    start = (int(rng.integers(cells_x)), int(rng.integers(cells_y)))
+    visited[start] = True
+    walls[2 * start[0] + 1, 2 * start[1] + 1] = 0
+    stack = [start]
+    while stack:
+        cx, cy = stack[-1]
+        options = [(cx + dx, cy + dy) for dx, dy in ((0, 1), (1, 0), (-1, 0), (0, -1))
+                   if 0 <= cx + dx < cells_x and 0 <= cy + dy < cells_y and not visited[cx + dx, cy + dy]]
+        if not options:
+            stack.pop()
+            continue
+        nx, ny = options[int(rng.integers(len(options)))]
+        visited[nx, ny] = True
+        walls[2 * nx + 1, 2 * ny + 1] = 0
+        walls[cx + nx + 1, cy + ny + 1] = 0  # knock down the wall between the two cells
+        stack.append((nx, ny))
+    return walls
+
+def rooms(width, height, rng, room_size=10, door_width=2):
+    """Square rooms separated by one-cell walls, with one door per wall segment."""
+    walls = np.zeros((width, height), dtype=np.uint8)
+    walls[room_size::room_size, :] = 1
+    walls[:, room_size::room_size] = 1
+
+    for wx in range(room_size, width, room_size):
+        for y0 in range(0, height, room_size):
+            y1 = min(y0 + room_size, height)
+            span = y1 - y0 - 1
+            if span > door_width:
+                d = y0 + 1 + int(rng.integers(span - door_width))
+                walls[wx, d:d + door_width] = 0
+    for wy in range(room_size, height, room_size):
+        for x0 in range(0, width, room_size):
+            x1 = min(x0 + room_size, width)
+            span = x1 - x0 - 1
+            if span > door_width:
+                d = x0 + 1 + int(rng.integers(span - door_width))
+                walls[d:d + door_width, wy] = 0
+    return walls
+
+def warehouse(width, height, rng, shelf_length=8, aisle_width=2):
+    """Rows of two-cell-deep shelf blocks separated by aisles, with a free border corridor."""
+    walls = np.zeros((width, height), dtype=np.uint8)
+    for y in range(aisle_width, height - aisle_width - 1, 2 + aisle_width):
+        for x in range(aisle_width, width - aisle_width - shelf_length + 1, shelf_length + aisle_width):
+            walls[x:x + shelf_length, y:y + 2] = 1
+    return walls
+
+GENERATORS = {
+    "random": random_obstacles,
+    "maze": maze,
+    "rooms": rooms,
+    "warehouse": warehouse,
+}
+
+def place(walls, n_agents, n_goals, rng):
+    """Pick distinct free cells for agents and goals. Returns (agents, goals) as (x, y) lists."""
+    grid_h = walls.shape[1]
+    free = np.flatnonzero(walls.ravel() == 0)
+    count = min(len(free), n_agents + n_goals)
+    chosen = rng.choice(free, size=count, replace=False)
+    cells = [(int(i) // grid_h, int(i) % grid_h) for i in chosen]
+    return cells[:n_agents], cells[n_agents:]
+
+def generate(kind, width, height, n_agents, n_goals, seed=0, **params):
+    """
+    Build a reproducible scenario.
+    kind: one of GENERATORS
+    params: extra keyword arguments for the generator (e.g. density=0.3)
+    returns: dict with name, walls, agents, goals
+    """
+    rng = np.random.default_rng(seed)
+    walls = GENERATORS[kind](width, height, rng, **params)
+    agents, goals = place(walls, n_agents, n_goals, rng)
+    return {
+        "name": f"{kind}-{width}x{height}-a{n_agents}-g{n_goals}-s{seed}",
+        "kind": kind,
+        "width": width,
+        "height": height,
+        "seed": seed,
+        "walls": walls,
+        "agents": agents,
+        "goals": goals,
+    }
@@ -1,188 +1,172 @@
 import time
 import pygame
-from config import *
-from node import Node
-from astar import astar, build_wall_map
-from renderer import draw_grid, draw_elements, draw_text
-
-def simulate():
-    move_counter = 0
-    grid = [[Node(x, y) for y in range(GRID_SIZE_Y)] for x in range(GRID_SIZE_X)]
-    agents = []
-    goals = []
-    moving = False
-    total_time_taken = 0.0
+from pygame._sdl2 import Window
+from config import Config
+from maps import load_scenario
+from simulation import Simulation
+from renderer import Renderer
+from agent_store import AgentStore
+from trace_log import TraceReader, EVENT_NAMES
+from timestep import Timestep
+
+HUD_TIMERS = ("frame", "render", "step", "move", "replan", "plan")
+HUD_EVERY = 30  # frames between HUD refreshes (the HUD line itself is only redrawn when it changes)
+
+def simulate(config=None):
+    """config: Config with the grid, window and planner settings (default: the constants in config.py)"""
+    config = config or Config()
+    scenario = None
+    if config.map_file:
+        scenario = load_scenario(config.map_file, config.scen_file, config.agents)
+        config.grid_size_x, config.grid_size_y = scenario["width"], scenario["height"]
+
+    pygame.init()
+    screen = pygame.display.set_mode((config.width, config.height), pygame.RESIZABLE)
+    Window.from_display_module().maximize()
+    pygame.display.set_caption("IMAPPS - Serial Version")
+    clock = pygame.time.Clock()
+    font_small = pygame.font.SysFont("Calibri", 26, bold=True)
+    font_medium = pygame.font.SysFont("Calibri", 32, bold=True)
+
+    renderer = Renderer(screen, font_small, font_medium, config)
+    sim = Simulation(**config.simulation_args())
+    if scenario is not None:
+        sim.load(scenario["walls"], scenario["agents"], scenario["goals"])
+    if config.record_file:
+        sim.start_trace(config.record_file)
+    # movement ticks on a fixed timestep of their own (see timestep.py); turbo spends each frame on ticks
+    timestep = Timestep(config.tick_rate, 1.0 / config.clock_rate, config.turbo_render_every, config.turbo)
     wall_mode = True
+    metrics = sim.metrics
+    show_hud = config.hud
+    hud = None
+    frames = 0
 
     running = True
     while running:
-        screen.fill(WHITE)
-        draw_grid(screen, grid)
-        draw_elements(screen, agents, goals)
-        draw_text(screen, total_time_taken, wall_mode, agents, goals)
+        frame_started = time.perf_counter()
+        if show_hud and frames % HUD_EVERY == 0:
+            hud = metrics.hud_text(HUD_TIMERS)
+        frames += 1
+        if timestep.render_due():
+            with metrics.timer("render"):
+                renderer.draw(sim.walls, sim.agents, sim.goals, sim.total_time_taken, wall_mode,
+                              hud if show_hud else None, timestep.status())
 
         # --- Input Handling ---
         for event in pygame.event.get():
+            if event.type in (pygame.VIDEORESIZE, pygame.WINDOWEXPOSED, pygame.WINDOWSIZECHANGED):
+                renderer.invalidate()
             if event.type == pygame.QUIT:
                 running = False
 
             # Mouse inputs
             if pygame.mouse.get_pressed()[0]:
                 mx, my = pygame.mouse.get_pos()
-                gx, gy = mx // CELL_SIZE_X, my // CELL_SIZE_Y
-                if 0 <= gx < GRID_SIZE_X and 0 <= gy < GRID_SIZE_Y:
-                    grid[gx][gy].wall = wall_mode
+                sim.set_wall(*renderer.cell_at(mx, my), wall_mode)
 
             if pygame.mouse.get_pressed()[2]:
                 mx, my = pygame.mouse.get_pos()
-                gx, gy = mx // CELL_SIZE_X, my // CELL_SIZE_Y
-                if 0 <= gx < GRID_SIZE_X and 0 <= gy < GRID_SIZE_Y and not grid[gx][gy].wall:
-                    if (gx, gy) not in {a["pos"] for a in agents}:
-                        agents.append({"pos": (gx, gy), "path": None, "wait": 0, "goal": None, "reached_goal": False})
+                sim.add_agent(*renderer.cell_at(mx, my))
 
             if pygame.mouse.get_pressed()[1]:
                 mx, my = pygame.mouse.get_pos()
-                gx, gy = mx // CELL_SIZE_X, my // CELL_SIZE_Y
-                if 0 <= gx < GRID_SIZE_X and 0 <= gy < GRID_SIZE_Y and not grid[gx][gy].wall:
-                    node = grid[gx][gy]
-                    if node not in goals:
-                        goals.append(node)
+                sim.add_goal(*renderer.cell_at(mx, my))
 
             # Keyboard inputs
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE:
-                    start_time = time.time()
-
-                    # Reset agents
-                    for agent in agents:
-                        agent["path"] = None
-                        agent["wait"] = 0
-                        agent["goal"] = None
-                        agent["reached_goal"] = False
-
-                    walls = build_wall_map(grid)
-                    assigned_goals = set()
-                    unassigned_agents = agents[:]
-
-                    while unassigned_agents and len(assigned_goals) < len(goals):
-                        best_assignment = None
-                        best_distance = float("inf")
-
-                        for agent in unassigned_agents:
-                            sx, sy = agent["pos"]
-                            start = (sx, sy)
-
-                            for goal in goals:
-                                if goal in assigned_goals:
-                                    continue
-                                g_pos = (goal.x, goal.y)
-                                path_coords = astar(walls, start, g_pos)
-                                if path_coords and len(path_coords) < best_distance:
-                                    best_assignment = (agent, goal, path_coords)
-                                    best_distance = len(path_coords)
-
-                        if best_assignment:
-                            agent, goal, path_coords = best_assignment
-                            agent["path"] = [grid[x][y] for x, y in path_coords]
-                            agent["goal"] = goal
-                            assigned_goals.add(goal)
-                            unassigned_agents.remove(agent)
-                        else:
-                            break
-
-                    total_time_taken = time.time() - start_time
-                    moving = True
+                    sim.plan()
 
                 elif event.key == pygame.K_t:
                     wall_mode = not wall_mode
 
                 elif event.key == pygame.K_r:
-                    agents.clear()
-                    goals.clear()
-                    moving = False
-                    total_time_taken = 0.0
+                    sim.clear()
+
+                elif event.key == pygame.K_h:
+                    show_hud = not show_hud
+                    frames = 0
+
+                elif event.key == pygame.K_f:
+                    timestep.toggle_turbo()
+
+                elif event.key == pygame.K_UP:
+                    timestep.scale(2)
+
+                elif event.key == pygame.K_DOWN:
+                    timestep.scale(0.5)
 
         # --- Movement Logic ---
-        if moving:
-            move_counter += 1
-            if move_counter >= MOVE_DELAY:
-                occupied = {tuple(a["pos"]) for a in agents}
-                reserved = set()
-                agents_at_goal = {tuple(a["pos"]) for a in agents if a.get("reached_goal")}
-
-                stuck_agents = []
-
-                for agent in agents:
-                    if agent.get("reached_goal"):
-                        reserved.add(agent["pos"])
-                        continue
-
-                    path = agent.get("path")
-                    current_pos = tuple(agent["pos"])
-
-                    if not path or len(path) == 0:
-                        agent["path"] = None
-                        agent["wait"] = 0
-                        reserved.add(current_pos)
-                        continue
-
-                    next_pos = (path[0].x, path[0].y)
-
-                    # Swap conflict
-                    swap_conflict = any(
-                        other is not agent and
-                        other.get("path") and len(other["path"]) > 0 and
-                        other["path"][0].x == current_pos[0] and
-                        other["path"][0].y == current_pos[1] and
-                        other["pos"] == next_pos
-                        for other in agents
-                    )
-
-                    occupied_block = next_pos in reserved or next_pos in occupied or next_pos in agents_at_goal
-
-                    if occupied_block or swap_conflict:
-                        agent["wait"] += 1
-                        if agent["wait"] >= MAX_WAIT:
-                            agent["wait"] = 0
-                            stuck_agents.append(agent)
-                        reserved.add(current_pos)
-                        continue
-
-                    # Move agent
-                    reserved.add(next_pos)
-                    occupied.discard(current_pos)
-                    occupied.add(next_pos)
-                    agent["pos"] = next_pos
-                    agent["wait"] = 0
-                    path.pop(0)
-                    if len(path) == 0:
-                        agent["path"] = None
-
-                    # Check if reached goal
-                    goal = agent.get("goal")
-                    if goal and agent["pos"] == (goal.x, goal.y):
-                        agent["reached_goal"] = True
-                        agent["path"] = None
-
-                # Dynamic replanning for stuck agents
-                if stuck_agents:
-                    walls = build_wall_map(grid)
-                    for agent in stuck_agents:
-                        goal = agent.get("goal")
-                        if goal:
-                            start = agent["pos"]
-                            temp_avoid = occupied - {start}
-                            path_coords = astar(walls, start, (goal.x, goal.y), avoid_positions=temp_avoid)
-                            if path_coords:
-                                agent["path"] = [grid[x][y] for x, y in path_coords]
-
-                move_counter = 0
-
-            # Stop moving if all agents finished
-            if all(a.get("reached_goal") or a.get("path") is None for a in agents):
-                moving = False
-
-        pygame.display.flip()
-        clock.tick(CLOCK_RATE)
+        timestep.advance(sim.step, lambda: sim.moving)
+
+        # time spent on the frame, without waiting for the next one
+        metrics.record("frame", time.perf_counter() - frame_started)
+        clock.tick(config.clock_rate)
+
+    if config.metrics_file:
+        metrics.export(config.metrics_file)
+    sim.stop_trace()
+    pygame.quit()
+
+def replay(config):
+    """
+    Play back a trace recorded with --record (see trace_log.py) without running any planner.
+    SPACE pauses, RIGHT steps one tick while paused, UP/DOWN change the speed, R restarts.
+    config: Config with replay_file set; the grid size is taken from the trace
+    """
+    reader = TraceReader(config.replay_file)
+    config.grid_size_x, config.grid_size_y = reader.width, reader.height
+
+    pygame.init()
+    screen = pygame.display.set_mode((config.width, config.height), pygame.RESIZABLE)
+    Window.from_display_module().maximize()
+    pygame.display.set_caption("IMAPPS - Replay")
+    clock = pygame.time.Clock()
+    font_small = pygame.font.SysFont("Calibri", 26, bold=True)
+    font_medium = pygame.font.SysFont("Calibri", 32, bold=True)
+    renderer = Renderer(screen, font_small, font_medium, config)
+
+    frames = reader.frames(config.replay_start)
+    frame = next(frames, None)
+    agents = AgentStore(reader.width, reader.height)
+    move_delay = config.move_delay
+    move_counter = 0
+    paused = False
+    advance = False
+
+    running = frame is not None
+    while running:
+        agents.restore(frame.cells, frame.waits, frame.moving)
+        events = ", ".join(f"{agent} {EVENT_NAMES.get(code, code)}" for agent, code in frame.events)
+        status = f"Replay {frame.index + 1}/{len(reader)}  tick {frame.tick}" + ("  (paused)" if paused else "")
+        renderer.draw(frame.walls, agents, frame.goals, None, True, status + ("  " + events if events else ""))
+
+        for event in pygame.event.get():
+            if event.type in (pygame.VIDEORESIZE, pygame.WINDOWEXPOSED, pygame.WINDOWSIZECHANGED):
+                renderer.invalidate()
+            if event.type == pygame.QUIT:
+                running = False
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key == pygame.K_RIGHT:
+                    advance = True
+                elif event.key == pygame.K_UP:
+                    move_delay = max(1, move_delay // 2)
+                elif event.key == pygame.K_DOWN:
+                    move_delay = min(120, move_delay * 2)
+                elif event.key == pygame.K_r:
+                    frames = reader.frames(config.replay_start)
+                    frame = next(frames)
+                    move_counter = 0
+
+        move_counter += 1
+        if advance or (not paused and move_counter >= move_delay):
+            frame = next(frames, frame)
+            move_counter = 0
+            advance = False
+
+        clock.tick(config.clock_rate)
 
     pygame.quit()
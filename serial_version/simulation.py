@@ -0,0 +1,399 @@
+import time
+import numpy as np
+from config import GRID_SIZE_X, GRID_SIZE_Y, MAX_WAIT, REPLAN_MODE, PLANNER, COOP_WINDOW, \
+    CBS_SUBOPTIMALITY, CBS_TIME_LIMIT, CBS_NODE_LIMIT, HPA_CLUSTER, HPA_MIN_CELLS, PATH_CACHE_SIZE
+from astar import get_engine
+from distance_fields import DistanceFieldCache
+from components import ComponentIndex
+from path_cache import PathCache
+from assignment import assign_goals
+from dstar_lite import DStarLite
+from cooperative import CooperativePlanner
+from cbs import CBS, local_search_many
+from hpa import HPAGraph, settle_claims
+from movement import resolve_moves
+from metrics import Metrics
+from agent_store import AgentStore
+from trace_log import TraceWriter, EVENT_STUCK, EVENT_REPLAN_FAILED, EVENT_REACHED
+
+class Simulation:
+    """
+    Headless simulation core. Holds the grid, agents and goals and runs
+    planning and movement without touching pygame, so it can be driven by
+    the pygame frontend in sim.py or stepped directly from a script.
+    """
+
+    def __init__(self, grid_size_x=GRID_SIZE_X, grid_size_y=GRID_SIZE_Y, replan_mode=REPLAN_MODE,
+                 planner=PLANNER, window=COOP_WINDOW, path_cache=PATH_CACHE_SIZE):
+        self.grid_size_x = grid_size_x
+        self.grid_size_y = grid_size_y
+        self.agents = AgentStore(grid_size_x, grid_size_y)
+        # goal cells in the order they were placed; goal_map marks them per cell
+        self.goals = []
+        self.goal_map = np.zeros(grid_size_x * grid_size_y, dtype=np.uint8)
+        self.moving = False
+        self.total_time_taken = 0.0
+        self.ticks = 0
+        self.replan_mode = replan_mode
+        self.planner = planner
+        self.replans = 0   # stuck-agent replans since the last plan()
+        self.makespan = 0  # tick at which the last agent reached its goal
+        self.cbs_result = None  # result of the last solve_cbs()
+        # flat uint8 wall map (x * grid_size_y + y, 1 = wall), the only copy of the walls;
+        # wall_map is a (W, H) view over it
+        self.walls = bytearray(grid_size_x * grid_size_y)
+        self.wall_map = np.frombuffer(self.walls, dtype=np.uint8).reshape(grid_size_x, grid_size_y)
+        # bumped on every wall edit; distance fields are only recomputed when it changes
+        self.wall_version = 0
+        self.fields = DistanceFieldCache(grid_size_x, grid_size_y)
+        # connected components of the free cells, patched as walls are edited: unreachable
+        # goals are skipped without a search
+        self.components = ComponentIndex(grid_size_x, grid_size_y)
+        # searched paths by wall version and cells held by agents (None = off): an agent stuck
+        # in a jam replans from the same cell around the same agents again and again
+        self.path_cache = PathCache(path_cache) if path_cache > 0 else None
+        # large maps plan through the HPA* abstraction instead (built on first use)
+        self.large = grid_size_x * grid_size_y >= HPA_MIN_CELLS
+        self.hpa = None
+        self.hpa_version = -1
+        # timers and counters of planning, replanning and movement (see metrics.py)
+        self.metrics = Metrics()
+        self.trace = None  # TraceWriter while recording (see start_trace)
+        # cell -> agent scratch buffer for the movement tick (all -1 between ticks)
+        self.occupancy = np.full(grid_size_x * grid_size_y, -1, dtype=np.int32)
+        self.coop = CooperativePlanner(self.walls, self.fields.neighbors, self.fields, window)
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.grid_size_x and 0 <= y < self.grid_size_y
+
+    # --- Editing ---
+    def is_wall(self, x, y):
+        return bool(self.walls[x * self.grid_size_y + y])
+
+    def set_wall(self, x, y, wall):
+        if self.in_bounds(x, y) and self.is_wall(x, y) != bool(wall):
+            cell = x * self.grid_size_y + y
+            self.walls[cell] = 1 if wall else 0
+            self.wall_version += 1
+            # incremental planners repair around the edited cell
+            for planner in self.agents.planners:
+                if planner is not None:
+                    planner.update_cells((cell,))
+
+    def add_agent(self, x, y):
+        if self.in_bounds(x, y) and not self.is_wall(x, y):
+            return self.agents.add(x * self.grid_size_y + y) >= 0
+        return False
+
+    def add_goal(self, x, y):
+        if self.in_bounds(x, y) and not self.is_wall(x, y):
+            cell = x * self.grid_size_y + y
+            if not self.goal_map[cell]:
+                self.goal_map[cell] = 1
+                self.goals.append(cell)
+                return True
+        return False
+
+    def clear(self):
+        """Remove all agents and goals (walls are kept)."""
+        self.agents.clear()
+        self.goal_map[self.goals] = 0
+        self.goals.clear()
+        self.moving = False
+        self.total_time_taken = 0.0
+        self.ticks = 0
+        self.replans = 0
+        self.makespan = 0
+
+    def load(self, walls, agents, goals):
+        """
+        Replace the map with a scenario.
+        walls: 2D array indexed walls[x][y] (truthy = wall), same size as the grid
+        agents/goals: iterables of (x, y)
+        """
+        self.clear()
+        np.copyto(self.wall_map, np.asarray(walls, dtype=bool))
+        self.wall_version += 1
+        for x, y in agents:
+            self.add_agent(x, y)
+        for x, y in goals:
+            self.add_goal(x, y)
+
+    # --- Recording ---
+    def start_trace(self, path, **kwargs):
+        """
+        Record every movement tick to a trace file from now on (see trace_log.py),
+        starting with the current state. kwargs go to TraceWriter.
+        """
+        self.stop_trace()
+        self.trace = TraceWriter(path, self.grid_size_x, self.grid_size_y, **kwargs)
+        self._trace_tick()
+
+    def stop_trace(self):
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
+
+    def _trace_tick(self):
+        if self.trace is not None:
+            self.trace.tick(self.ticks, self.agents, self.goals, self.walls, self.wall_version)
+
+    # --- Planning ---
+    def plan(self):
+        """Assign goals to agents exclusively and optimally, then compute their paths."""
+        start_time = time.perf_counter()
+        agents = self.agents
+        agents.reset()
+
+        self.ticks = 0
+        self.replans = 0
+        self.makespan = 0
+
+        h = self.grid_size_y
+        agent_cells = agents.cell.tolist()
+        goal_cells = list(self.goals)
+
+        if agent_cells and goal_cells:
+            if self.large:
+                # a field per goal would cost a BFS over the whole map each, so take nearest goals instead
+                assignment = self._assign_nearest(agent_cells, goal_cells)
+            else:
+                self.fields.sync(self.wall_version, self.walls)
+                # true-distance cost matrix from one distance field per goal
+                pairs = assign_goals(self.fields.distances(agent_cells, goal_cells))
+                assignment = {a_i: (g_i, self.fields.path(agent_cells[a_i], goal_cells[g_i]))
+                              for a_i, g_i in pairs.items()}
+            for a_i, (g_i, path_cells) in assignment.items():
+                agents.goal[a_i] = goal_cells[g_i]
+                if path_cells:
+                    agents.set_path(a_i, path_cells)
+                else:
+                    agents.reached[a_i] = True  # already standing on its goal
+
+        self.metrics.record("plan.assign", time.perf_counter() - start_time)
+
+        if self.planner == "cooperative":
+            with self.metrics.timer("plan.cooperative"):
+                self._plan_cooperative()
+        elif self.planner == "cbs":
+            with self.metrics.timer("plan.cbs"):
+                self.solve_cbs()
+
+        self.total_time_taken = time.perf_counter() - start_time
+        self.metrics.record("plan", self.total_time_taken)
+        self.moving = True
+        self._trace_tick()
+
+    def _hpa_graph(self):
+        """The HPA* abstraction, repaired around the wall edits since it was last used."""
+        if self.hpa is None:
+            self.hpa = HPAGraph(self.grid_size_x, self.grid_size_y, HPA_CLUSTER)
+        if self.hpa_version != self.wall_version:
+            self.hpa.sync(self.walls)
+            self.hpa_version = self.wall_version
+        return self.hpa
+
+    def _assign_nearest(self, agent_cells, goal_cells):
+        """
+        Exclusive assignment for large maps, in greedy rounds: every agent
+        takes its nearest unclaimed goal through the HPA* graph (see
+        hpa.settle_claims). Not optimal like assign_goals, but it never needs
+        more than a query per agent and round.
+        returns: {agent index: (goal index, path cells)}
+        """
+        hpa = self._hpa_graph()
+        self.components.sync(self.wall_version, self.walls)
+        labels = self.components.labels
+        agent_labels = labels[agent_cells].tolist()
+        goal_index = {cell: j for j, cell in enumerate(goal_cells)}
+        claimed = set()
+        assignment = {}
+        pending = list(range(len(agent_cells)))
+        while pending:
+            # unclaimed goals by component: an agent only searches for the goals it can reach
+            free = {}
+            for g, label in zip(goal_cells, labels[goal_cells].tolist()):
+                if g not in claimed:
+                    free.setdefault(label, []).append(g)
+            found, abstract = {}, {}
+            for i in pending:
+                goal, cost, abstract[i] = hpa.nearest(agent_cells[i], free.get(agent_labels[i], []))
+                found[i] = (goal, cost)
+            settled, pending = settle_claims(found, claimed)
+            for i, goal in settled.items():
+                assignment[i] = (goal_index[goal], self._refine(hpa, agent_cells[i], goal, abstract[i]))
+        return assignment
+
+    def _refine(self, hpa, start, goal, abstract):
+        """Cells of an abstract HPA* path; cached, so planning again from further down the path only copies its rest."""
+        cache = self.path_cache
+        if cache is None:
+            return list(hpa.refine(abstract))
+        path = cache.get(self.wall_version, start, goal)
+        self.metrics.count("path_cache." + cache.last)
+        if path is None:
+            path = list(hpa.refine(abstract))
+            cache.put(self.wall_version, start, goal, path)
+        return list(path)
+
+    def _plan_cooperative(self):
+        """Replace the paths of agents still under way with collision-free space-time paths."""
+        self.fields.sync(self.wall_version, self.walls)
+        agents = self.agents
+        starts = agents.cell.tolist()
+        goals = np.where(agents.reached | (agents.goal < 0), -1, agents.goal).tolist()
+        goals = [None if goal < 0 else goal for goal in goals]
+        for i, (goal, path) in enumerate(zip(goals, self.coop.plan(starts, goals))):
+            if goal is None or path is None:
+                continue
+            agents.set_path(i, path)
+            agents.wait[i] = 0
+            if not path:
+                agents.reached[i] = True  # on its goal and nobody needs it to move
+
+    def solve_cbs(self, suboptimality=CBS_SUBOPTIMALITY, time_limit=CBS_TIME_LIMIT, node_limit=CBS_NODE_LIMIT):
+        """
+        Replace the paths from plan() with collision-free ones found by CBS
+        (ECBS if suboptimality > 1), keeping the goal assignment. Agents
+        without a goal stay put unless they have to make way. Paths are only
+        replaced if a solution is found within the limits.
+        returns: the result dict of cbs.CBS.solve()
+        """
+        self.fields.sync(self.wall_version, self.walls)
+        agents = self.agents
+        starts = agents.cell.tolist()
+        goals = np.where(agents.goal < 0, agents.cell, agents.goal).tolist()
+        search_many = local_search_many(self.walls, self.fields.neighbors, self.fields)
+        result = CBS(len(self.walls), starts, goals, search_many, suboptimality).solve(time_limit, node_limit)
+        if result["paths"] is not None:
+            for i, path in enumerate(result["paths"]):
+                agents.set_path(i, path)
+                agents.reached[i] = agents.goal[i] >= 0 and not path
+            agents.wait[:] = 0
+        self.cbs_result = result
+        return result
+
+    # --- Movement ---
+    def step(self):
+        """Advance every agent by one movement tick."""
+        metrics = self.metrics
+        started = time.perf_counter()
+        if self.planner == "cooperative" and self.ticks and self.ticks % max(1, self.coop.window // 2) == 0:
+            # rolling horizon: re-reserve the next window before the old one runs out
+            with metrics.timer("plan.cooperative"):
+                self._plan_cooperative()
+
+        agents = self.agents
+        pos = agents.cell
+        nxt = agents.next_cells()  # cell each agent steps into, -1 if it stays put
+        nxt[agents.reached] = -1
+        # agents without a path stop waiting; a step onto their own cell is a planned wait
+        # (cooperative planner), taken without moving
+        agents.wait[(nxt < 0) & ~agents.reached] = 0
+        planned = np.flatnonzero(nxt == pos)
+        if planned.size:
+            agents.head[planned] += 1
+            agents.wait[planned] = 0
+            nxt[planned] = -1
+
+        # vertex and swap conflicts for every agent at once
+        moved, blocked = resolve_moves(pos, nxt, self.occupancy)
+        metrics.record("move", time.perf_counter() - started)
+
+        trace = self.trace
+        blocked = np.flatnonzero(blocked)
+        agents.wait[blocked] += 1
+        stuck_agents = blocked[agents.wait[blocked] >= MAX_WAIT]
+        agents.wait[stuck_agents] = 0
+
+        moved = np.flatnonzero(moved)
+        agents.move(moved)
+        # (a cooperative path may cross its goal to make way and come back later)
+        arrived = moved[(agents.head[moved] == agents.end[moved]) & (agents.cell[moved] == agents.goal[moved])]
+        if arrived.size:
+            agents.reached[arrived] = True
+            self.makespan = self.ticks + 1
+        if trace is not None:
+            for i in stuck_agents.tolist():
+                trace.event(i, EVENT_STUCK)
+            for i in arrived.tolist():
+                trace.event(i, EVENT_REACHED)
+
+        # Dynamic replanning for stuck agents
+        if stuck_agents.size:
+            occupied = set(agents.cell.tolist())
+            signature = frozenset(occupied)
+            for i in stuck_agents.tolist():
+                goal = int(agents.goal[i])
+                if goal >= 0:
+                    start = int(agents.cell[i])
+                    self.replans += 1
+                    t0 = time.perf_counter()
+                    path = self._replan(i, start, goal, occupied, signature)
+                    metrics.record("replan", time.perf_counter() - t0)
+                    metrics.count("replans")
+                    if path:
+                        agents.set_path(i, path)
+                    else:
+                        metrics.count("replans.failed")
+                        if trace is not None:
+                            trace.event(i, EVENT_REPLAN_FAILED)
+
+        self.ticks += 1
+
+        # Stop moving if all agents finished
+        if not (agents.moving & ~agents.reached).any():
+            self.moving = False
+        metrics.record("step", time.perf_counter() - started)
+        self._trace_tick()
+
+    def _replan(self, i, start_cell, goal_cell, occupied, signature=0):
+        """
+        New path for stuck agent i, treating the cells occupied by the other agents as temporary obstacles.
+        occupied: cells held by agents (start_cell among them)
+        signature: identifies occupied for the path cache (frozenset(occupied), 0 = none)
+        returns: list of path cells ([] if none)
+        """
+        h = self.grid_size_y
+        self.components.sync(self.wall_version, self.walls)
+        if not self.components.connected(start_cell, goal_cell):
+            self.metrics.count("replans.unreachable")
+            return []
+        if self.replan_mode == "dstar":
+            # keep one incremental planner per agent and only repair what changed
+            planners = self.agents.planners
+            planner = planners[i]
+            if planner is None or planner.goal != goal_cell:
+                planner = planners[i] = DStarLite(self.walls, self.fields.neighbors, h, start_cell, goal_cell)
+            else:
+                planner.move_start(start_cell)
+            planner.set_blocked(occupied - {start_cell})
+            path = planner.plan()
+            self.metrics.count("expanded", planner.expanded)
+        else:
+            cache = self.path_cache
+            if cache is not None:
+                path = cache.get(self.wall_version, start_cell, goal_cell, signature)
+                self.metrics.count("path_cache." + cache.last)
+                if path is not None:
+                    return list(path)
+            # the goal's distance field ignores other agents, so it is an admissible heuristic here;
+            # on large maps a field costs more than the search itself and Manhattan distance is used
+            heuristic = None
+            if not self.large:
+                self.fields.sync(self.wall_version, self.walls)
+                heuristic = self.fields.field(goal_cell)
+            engine = get_engine(self.grid_size_x, self.grid_size_y)
+            path = engine.search(self.walls, start_cell, goal_cell, occupied - {start_cell}, heuristic)
+            self.metrics.count("expanded", engine.expanded)
+            if cache is not None:
+                cache.put(self.wall_version, start_cell, goal_cell, path, signature)
+        return path
+
+    def run(self, n_ticks):
+        """Run up to n_ticks movement ticks, stopping early once every agent is done. Returns ticks run."""
+        ran = 0
+        while ran < n_ticks and self.moving:
+            self.step()
+            ran += 1
+        return ran
@@ -0,0 +1,22 @@
+from astar import astar, jps
+
+def empty_map(width, height):
+    return [[False] * height for _ in range(width)]
+
+def test_jps_rebuilds_for_another_map_with_the_same_version():
+    # two maps of the same size passed with the same version: the second one's wall must not be crossed
+    open_map = empty_map(5, 5)
+    walled = empty_map(5, 5)
+    for y in range(4):
+        walled[2][y] = True
+    assert jps(open_map, (0, 0), (4, 0), version=0) == [(1, 0), (2, 0), (3, 0), (4, 0)]
+    path = jps(walled, (0, 0), (4, 0), version=0)
+    assert len(path) == len(astar(walled, (0, 0), (4, 0)))
+    assert not any(walled[x][y] for x, y in path)
+
+def test_jps_matches_astar_lengths():
+    walls = empty_map(8, 6)
+    for x, y in ((1, 1), (2, 1), (3, 1), (5, 2), (5, 3), (5, 4), (2, 4), (3, 4)):
+        walls[x][y] = True
+    for goal in ((7, 5), (0, 5), (6, 0), (4, 3)):
+        assert len(jps(walls, (0, 0), goal, version=1)) == len(astar(walls, (0, 0), goal))
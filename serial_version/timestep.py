@@ -0,0 +1,91 @@
+import time
+
+MAX_CATCH_UP = 5  # ticks one frame may run to catch up after a stall; a longer backlog is dropped
+MEASURE_EVERY = 0.5  # seconds between updates of the achieved tick rate
+MIN_RATE, MAX_RATE = 0.5, 960.0  # bounds of the tick rate set with scale()
+
+class Timestep:
+    """
+    Fixed-timestep clock for the movement ticks, independent of the frame rate.
+
+    Every frame adds the real time that passed to an accumulator, and one
+    tick runs per 1 / rate seconds in it: agents move at rate ticks per
+    second whatever the frame rate is (several ticks in a slow frame, none
+    in most frames of a fast one). At most MAX_CATCH_UP ticks run in one
+    frame, so a stall (e.g. a long plan) is not replayed all at once.
+
+    In turbo (fast-forward) mode the rate is ignored: every frame runs
+    ticks until its time budget is spent, and only one frame in
+    render_every is drawn, so a run goes as fast as the ticks allow.
+    """
+
+    def __init__(self, rate, budget, render_every, turbo=False):
+        """
+        rate: ticks per second outside turbo mode
+        budget: seconds of ticks per frame in turbo mode (e.g. one frame at the clock rate)
+        render_every: frames per drawn frame in turbo mode
+        """
+        self.rate = rate
+        self.budget = budget
+        self.render_every = max(1, render_every)
+        self.turbo = turbo
+        self.accumulator = 0.0
+        self.frames = 0
+        self.achieved = 0.0     # measured ticks per second
+        self._last = time.perf_counter()
+        self._since = self._last
+        self._ticks = 0
+
+    def toggle_turbo(self):
+        self.turbo = not self.turbo
+        self.accumulator = 0.0
+
+    def scale(self, factor):
+        """Multiply the tick rate by factor, within MIN_RATE..MAX_RATE."""
+        self.rate = min(MAX_RATE, max(MIN_RATE, self.rate * factor))
+
+    def render_due(self):
+        """True if this frame should be drawn (always, outside turbo mode)."""
+        return not self.turbo or self.frames % self.render_every == 0
+
+    def advance(self, tick, active):
+        """
+        Run this frame's ticks; call once per frame. Returns how many ran.
+        tick: runs one movement tick, e.g. Simulation.step
+        active: returns False once there is nothing left to move; no ticks
+                run (and no time builds up) while it does
+        """
+        now = time.perf_counter()
+        elapsed, self._last = now - self._last, now
+        self.frames += 1
+        ran = 0
+        if not active():
+            self.accumulator = 0.0
+        elif self.turbo:
+            end = now + self.budget
+            while active():
+                tick()
+                ran += 1
+                if time.perf_counter() >= end:
+                    break
+        else:
+            period = 1.0 / self.rate
+            self.accumulator = min(self.accumulator + elapsed, MAX_CATCH_UP * period)
+            while self.accumulator >= period and active():
+                tick()
+                ran += 1
+                self.accumulator -= period
+        self._measure(now, ran)
+        return ran
+
+    def _measure(self, now, ran):
+        self._ticks += ran
+        if now - self._since >= MEASURE_EVERY:
+            self.achieved = self._ticks / (now - self._since)
+            self._ticks = 0
+            self._since = now
+
+    def status(self):
+        """One line with the tick rate and the achieved ticks per second (for the text panel)."""
+        target = "turbo" if self.turbo else f"{self.rate:g}/s"
+        return f"Tick rate: {target}   achieved: {self.achieved:.1f} ticks/s"